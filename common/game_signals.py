@@ -11,4 +11,8 @@ SIG_BUILD    = 9
 SIG_OUTOFJAIL= 10
 SIG_NOJTL    = 11
 SIG_NOBUYABLE= 12
-SIG_AUC      = 13
\ No newline at end of file
+SIG_AUC      = 13
+SIG_BANKRUPT = 14
+
+# Signals whose handler must decide something. Fast-forwarding stops at them
+DECISION_SIGNALS = (SIG_BUY, SIG_INJAIL, SIG_BUILD, SIG_AUC)
@@ -1,11 +1,61 @@
+from common.errors import GameError
+from data.cards import CHANCE_CARD, COMMUNITY_CHEST_CARD
+
+# Bump whenever a change to the engine changes simulation results. Part of the sweep cache key
+ENGINE_VERSION = 3
+
 AUTO = False
 STARTING_SLOT = 0
+STARTING_MONEY = 1500
 SALARY = 200
 BAIL = 50
+LUXURY_TAX = 75
+INCOME_TAX_CAP = 200
+INCOME_TAX_RATE = 10
 AUTH = True
 BUILDING_COUNT = ((0,0),
                   (1,0),
                   (2,0),
                   (3,0),
                   (4,0),
-                  (0,1))
\ No newline at end of file
+                  (0,1))
+
+
+class Rules:
+    """
+    Rules of a game. Every rule defaults to the constant above, and can be overridden by keyword,
+    e.g. Rules(salary=150, bail=100)
+    """
+    __slots__ = ("startingSlot", "startingMoney", "salary", "bail", "luxuryTax", "incomeTaxCap", "incomeTaxRate",
+                 "buildingCount", "chanceCards", "communityCards")
+
+    def __init__(self, **kwargs):
+        self.startingSlot = STARTING_SLOT
+        self.startingMoney = STARTING_MONEY
+        self.salary = SALARY
+        self.bail = BAIL
+        self.luxuryTax = LUXURY_TAX
+        # Income tax is incomeTaxRate percent of the net worth, up to incomeTaxCap
+        self.incomeTaxCap = INCOME_TAX_CAP
+        self.incomeTaxRate = INCOME_TAX_RATE
+        self.buildingCount = BUILDING_COUNT
+        self.chanceCards = CHANCE_CARD
+        self.communityCards = COMMUNITY_CHEST_CARD
+        for key, val in kwargs.items():
+            if key not in self.__slots__:
+                raise GameError(key + " is not a rule")
+            setattr(self, key, val)
+
+    def getData(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __getstate__(self):
+        # Only the rules that differ from the defaults, so that the card tables are not pickled with every game
+        return {key: getattr(self, key) for key in self.__slots__
+                if getattr(self, key) != getattr(DEFAULT_RULES, key)}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+DEFAULT_RULES = Rules()
@@ -6,5 +6,7 @@ BUILDING_STAGE_VALUE = ((0, 50, 100, 150, 200, 50),
                         (0, 200, 400, 600, 800, 200))
 BUILDING_PRICE = (50, 100, 150, 200)
 TRAIN_PRICE = 200
-TRAIN_RENT = [25, 50, 100, 200]
-UTIL_PRICE = 150
\ No newline at end of file
+TRAIN_RENT = (25, 50, 100, 200)
+UTIL_PRICE = 150
+# Average of a double dice roll, used to price the rent of a utility
+AVG_ROLL = 7
@@ -1,5 +1,5 @@
 from common.game_signals import *
-from config import AUTO, BAIL
+from config import AUTO
 
 def confirm():
     if not AUTO:
@@ -28,7 +28,8 @@ sig_name = {
         SIG_LAND: "SIG_LAND",
         SIG_GOTOJAIL: "SIG_GOTOJAIL",
         SIG_PAY: "SIG_PAY",
-        SIG_INJAIL: "SIG_INJAIL"
+        SIG_INJAIL: "SIG_INJAIL",
+        SIG_BANKRUPT: "SIG_BANKRUPT"
 }
 
 def handlers(signo, arg=()):
@@ -114,12 +115,12 @@ def handlers(signo, arg=()):
             except KeyError:
                 print("Invalid Choice")
 
-    def sigInJail(jtl):
+    def sigInJail(jtl, bail):
         print("You are currently in jail.")
         print("You have", jtl, "jail throw(s) left.")
         print("What would you like to do?")
         print("(1) Try rolling a double")
-        print("(2) Pay", BAIL, "dollars to get out")
+        print("(2) Pay", bail, "dollars to get out")
         if AUTO:
             return 0
         while 1:
@@ -143,6 +144,10 @@ def handlers(signo, arg=()):
     def sigAuc(pname):
         print(pname + ", what price would you buy this at:")
 
+    def sigBankrupt(pname, creditor):
+        print(pname, "went bankrupt! All assets go to", creditor)
+        confirm()
+
     def default():
         print("default handler for", sig_name[signo])
         return 1
@@ -161,7 +166,8 @@ def handlers(signo, arg=()):
         SIG_OUTOFJAIL: sigOutOfJail,
         SIG_NOJTL: sigNoJTL,
         SIG_NOBUYABLE: sigNoBuyable,
-        SIG_AUC : default
+        SIG_AUC : default,
+        SIG_BANKRUPT: sigBankrupt
     }
     if signo in handlers:
         return handlers[signo](*arg)
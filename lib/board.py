@@ -1,38 +1,175 @@
-from lib.board_slots import BoardSlot, PropertySlot, RailroadSlot, UtilitySlot, ChargeSlot, CardSlot, GoToJailSlot
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+from lib.board_slots import BoardSlot, PropertySlot, RailroadSlot, UtilitySlot, ChargeSlot, CardSlot, GoToJailSlot, \
+    PropertyGroup
 from lib.card import CardDeck
+from lib.rng import getStream, STREAM_CHANCE, STREAM_COMMUNITY
+from lib.trace import EV_MOVE, MOVE_BITS
 from lib.utils import *
 from common.errors import BoardError
-from data.slots import *
+from common.flags import SLOT_PROP, SLOT_PROP_RAIL, SLOT_PROP_UTIL
+import data.slots
+from config import Rules
 
-# Number of slots on board
+# Number of slots on the standard board
 BOARD_SIZE = 40
+# Keys of a board layout, named after the variables of data/slots.py. A layout may also give its "SIZE", which
+# defaults to the highest index used plus one
+LAYOUT_KEYS = ("PROPERTY", "RAILROAD", "UTILITY", "CHANCE_IDX", "COMMUNITY_IDX", "JAIL_IDX", "GTJ_IDX",
+               "INCOME_TAX_IDX", "LUXURY_TAX_IDX", "FREE_PARKING_IDX")
+# Key of a prepared layout holding the index of the next slot of a type, for every slot
+NEXT_KEYS = {SLOT_PROP_RAIL: "NEXT_RAIL", SLOT_PROP_UTIL: "NEXT_UTIL"}
+# Prepared layouts by "ID", so that a board pickles the id of its layout rather than the layout. See prepareLayout()
+LAYOUTS = {}
+
+
+def nextIndices(size, indices):
+    """
+    For every index of the board, find the first of indices strictly after it, wrapping around the board
+
+    :param size: An Integer. Number of slots
+    :param indices: An Array of Integers
+    :return: A Tuple of size Integers, or None if indices is empty
+    """
+    if not indices:
+        return None
+    marked = [False] * size
+    for i in indices:
+        marked[i] = True
+    ret = [0] * size
+    nxt = min(indices)
+    for i in range(size - 1, -1, -1):
+        ret[i] = nxt
+        if marked[i]:
+            nxt = i
+    return tuple(ret)
+
+
+def prepareLayout(layout):
+    """
+    Check a board layout and add what the boards built from it share: its size, for every slot, the index of
+    the next railroad and utility, and its "ID", a hash of its content. Prepared layouts are registered in LAYOUTS
+    under their id, so preparing the same layout twice returns the first copy
+
+    :param layout: A dict object with the LAYOUT_KEYS, shaped like the variables of data/slots.py
+    :return: A dict object
+    """
+    missing = [key for key in LAYOUT_KEYS if key not in layout]
+    if missing:
+        raise BoardError("board layout is missing " + ", ".join(missing))
+    ret = {key: layout[key] for key in LAYOUT_KEYS}
+    # Every board built from the layout shares its rents, so they are made immutable
+    ret["PROPERTY"] = tuple(tuple((name, price, block, tuple(rents), index)
+                                  for name, price, block, rents, index in group) for group in ret["PROPERTY"])
+    indices = [p[-1] for group in ret["PROPERTY"] for p in group]
+    indices += [p[-1] for p in ret["RAILROAD"]] + [p[-1] for p in ret["UTILITY"]]
+    indices += list(ret["CHANCE_IDX"]) + list(ret["COMMUNITY_IDX"])
+    indices += [ret[key] for key in ("JAIL_IDX", "GTJ_IDX", "INCOME_TAX_IDX", "LUXURY_TAX_IDX", "FREE_PARKING_IDX")]
+    ret["SIZE"] = layout.get("SIZE", max(indices) + 1)
+    if len(set(indices)) != len(indices) or 0 in indices or max(indices) >= ret["SIZE"]:
+        raise BoardError("board layout has slots outside of the board, on GO or on the same index")
+    ret["NEXT_RAIL"] = nextIndices(ret["SIZE"], [p[-1] for p in ret["RAILROAD"]])
+    ret["NEXT_UTIL"] = nextIndices(ret["SIZE"], [p[-1] for p in ret["UTILITY"]])
+    ret["ID"] = hashlib.sha256(json.dumps(ret, sort_keys=True).encode()).hexdigest()[:16]
+    return LAYOUTS.setdefault(ret["ID"], ret)
+
+
+@lru_cache(maxsize=32)
+def _slotIndex(names):
+    """
+    Return the index of every slot name, shared by every board whose slots have the same names. A name used by
+    several slots gives the last of them
+    """
+    return {name: i for i, name in enumerate(names)}
+
+
+@lru_cache(maxsize=32)
+def _parseLayout(path, mtime, size):
+    if path.endswith(".toml"):
+        if not tomllib:
+            raise BoardError("reading TOML boards requires Python 3.11 or later")
+        with open(path, "rb") as f:
+            return prepareLayout(tomllib.load(f))
+    with open(path) as f:
+        return prepareLayout(json.load(f))
+
+
+def loadLayout(path):
+    """
+    Load a board layout from a JSON or TOML file
+
+    Parsed layouts are cached, keyed by the file's path, modification time and size, so every game on the same
+    board shares one copy.
+
+    :param path: A String. Path of a .json or .toml file with the LAYOUT_KEYS
+    :return: A dict object
+    """
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    return _parseLayout(path, stat.st_mtime_ns, stat.st_size)
+
+
+DEFAULT_LAYOUT = prepareLayout({key: getattr(data.slots, key) for key in LAYOUT_KEYS})
+
 
 class Board:
-    def __init__(self):
-        self.slots = [None for _ in range(BOARD_SIZE)]
+    def __init__(self, rules=None, seed=None, layout=None):
+        """
+        :param rules: A Rules object. Default rules if None
+        :param seed: An Integer. Seed of the card decks' streams. The decks use the global stream if None
+        :param layout: The board layout. A dict object from loadLayout() or prepareLayout(), the "ID" of a layout
+        already prepared in this process, or the path of a file to load it from. The standard board of data/slots.py
+        if None
+        """
+        self.rules = rules if rules else Rules()
+        # What the layout is pickled as: None for the standard board, the path of a file, or else the layout's id
+        self.layoutId = layout
+        if layout is None:
+            layout = DEFAULT_LAYOUT
+        elif type(layout) == str:
+            layout = LAYOUTS.get(layout) or loadLayout(layout)
+        else:
+            if "ID" not in layout:
+                layout = prepareLayout(layout)
+            self.layoutId = layout["ID"]
+        self.layout = layout
+        # Zobrist hash of the game, kept up to date by the slots and moves. See lib/zobrist.py
+        self.zobrist = None
+        # The game played on this board, if any
+        self.game = None
+        # The game's FlightRecorder, which moves are recorded in. See lib/trace.py
+        self.trace = None
+        self.slots = [None for _ in range(layout["SIZE"])]
         self.slots[0] = BoardSlot("GO")
-        self.lookup = {"GO":self.slots}
 
-        self.chance_deck = CardDeck(0)
-        self.community_deck = CardDeck(1)
+        self.chance_deck = CardDeck(self.rules.chanceCards, getStream(seed, STREAM_CHANCE, True))
+        self.community_deck = CardDeck(self.rules.communityCards, getStream(seed, STREAM_COMMUNITY, True))
         # #Add normal property
-        for group in PROPERTY:
+        for group in layout["PROPERTY"]:
             self.genProp(group, PropertySlot)
 
-        self.genProp(RAILROAD, RailroadSlot)
-        self.genProp(UTILITY, UtilitySlot)
+        self.genProp(layout["RAILROAD"], RailroadSlot)
+        self.genProp(layout["UTILITY"], UtilitySlot)
 
-        for index in CHANCE_IDX:
+        for index in layout["CHANCE_IDX"]:
             self.slots[index] = CardSlot("Chance!", self.chance_deck)
-        for index in COMMUNITY_IDX:
+        for index in layout["COMMUNITY_IDX"]:
             self.slots[index] = CardSlot("Community Chest", self.community_deck)
 
         # TODO: Dynamically populate these slots. Generalize the types of slot.
-        self.slots[FREE_PARKING_IDX] = BoardSlot("Free Parking")
-        self.slots[INCOME_TAX_IDX] = ChargeSlot("Income Tax", incomeTax)
-        self.slots[JAIL_IDX] = BoardSlot("Jail")
-        self.slots[LUXURY_TAX_IDX] = ChargeSlot("Luxury Tax", 75)
-        self.slots[GTJ_IDX] = GoToJailSlot("Go To Jail")
+        self.slots[layout["FREE_PARKING_IDX"]] = BoardSlot("Free Parking")
+        self.slots[layout["INCOME_TAX_IDX"]] = ChargeSlot("Income Tax", incomeTax)
+        self.slots[layout["JAIL_IDX"]] = BoardSlot("Jail")
+        self.slots[layout["LUXURY_TAX_IDX"]] = ChargeSlot("Luxury Tax", self.rules.luxuryTax)
+        self.slots[layout["GTJ_IDX"]] = GoToJailSlot("Go To Jail")
 
         # Check to see if there is any empty slot.
         if None in self.slots:
@@ -40,10 +177,10 @@ class Board:
 
         # Lock the slots down before connecting all slots to board.
         self.slots = tuple(self.slots)
-        for slot in self.slots:
-            if slot:
-                self.lookup[slot.getName()] = slot
-                slot.connectBoard(self)
+        for index, slot in enumerate(self.slots):
+            slot.connectBoard(self, index)
+        self.index = _slotIndex(tuple(slot.getName() for slot in self.slots))
+        self.jail = self.slots[layout["JAIL_IDX"]]
 
     def __len__(self):
         return len(self.slots)
@@ -56,7 +193,7 @@ class Board:
                 raise BoardError("index of " + str(item) + " is out of bound")
         elif type(item) == str:
             try:
-                return self.lookup[item]
+                return self.slots[self.index[item]]
             except KeyError:
                 raise BoardError(item + " is not a slot in this board")
         else:
@@ -65,8 +202,25 @@ class Board:
     def getSlots(self):
         return self.slots
 
+    @property
+    def props(self):
+        """
+        The property slots, in board order
+        """
+        return tuple(slot for slot in self.slots if slot.isType(SLOT_PROP))
+
     def getJail(self):
-        return self.slots[JAIL_IDX]
+        return self.jail
+
+    def getNextIndex(self, index, typeFlag):
+        """
+        Get the index of the first slot of a type after index, wrapping around the board
+        :param index: An Integer. The index to start from
+        :param typeFlag: SLOT_PROP_RAIL or SLOT_PROP_UTIL
+        :return: An Integer, or None if the board has no such slot
+        """
+        table = self.layout[NEXT_KEYS[typeFlag]]
+        return table[index] if table else None
 
     def moveToIndex(self, player, index):
         return self.moveTo(player, self.slots[index])
@@ -76,8 +230,12 @@ class Board:
         curIndex = curSlot.getIndex()
         curSlot.unputPlayer(player)
         newSlot.putPlayer(player)
-        newIndex = self.slots.index(newSlot)
+        newIndex = newSlot.getIndex()
         player.setSlot(newSlot)
+        if self.zobrist:
+            self.zobrist.move(player.seat, curIndex, newIndex)
+        if self.trace is not None and self.trace.on:
+            self.trace.add(EV_MOVE, player.seat, curIndex << MOVE_BITS | newIndex)
         return newIndex, curIndex
 
     def move(self, player, step):
@@ -87,15 +245,17 @@ class Board:
         nextIndex = (curIndex + step) % len(self)
         self.slots[nextIndex].putPlayer(player)
         player.setSlot(self.slots[nextIndex])
+        if self.zobrist:
+            self.zobrist.move(player.seat, curIndex, nextIndex)
+        if self.trace is not None and self.trace.on:
+            self.trace.add(EV_MOVE, player.seat, curIndex << MOVE_BITS | nextIndex)
         return nextIndex, curIndex
 
     def genProp(self, params, SlotObject):
-        temp = []
-        for p in params:
-            temp.append((SlotObject(*p[:-1]), p[-1]))
+        temp = sorted(((SlotObject(*p[:-1]), p[-1]) for p in params), key=lambda t: t[1])
         for prop, idx in temp:
-            prop.addSibs([t[0] for t in temp if t != prop])
             self.slots[idx] = prop
+        PropertyGroup(self, tuple(idx for _, idx in temp))
 
     def build(self, propName):
         self[propName].incrStage()
@@ -108,6 +268,108 @@ class Board:
             ret["slots"][slot.getName()] = slot.getData()
         return ret
 
+    # Pickling methods
+
+    def __reduce__(self):
+        """
+        Pickle the board as the arguments to build it again plus a compact record of its mutable state. The board
+        of a game is pickled as a reference to the game
+        """
+        if self.game:
+            return getattr, (self.game, "board")
+        return Board, (self.rules, None, self.layoutId), self.__getstate__()
+
+    def __getstate__(self):
+        """
+        Return the mutable state of the board: the stage of every property, one byte each with the mortgage in the
+        high bit, then the state of both decks. Owners are part of the players' state
+        """
+        props = bytes(slot.stage | slot.mortgaged << 7 for slot in self.props)
+        return props, self.chance_deck.__getstate__(), self.community_deck.__getstate__()
+
+    def __setstate__(self, state):
+        """
+        Restore the state of a board that has just been created
+        """
+        props, chance, community = state
+        self.chance_deck.__setstate__(chance)
+        self.community_deck.__setstate__(community)
+        for slot, stage in zip(self.props, props):
+            if stage & 0x7F:
+                slot.updateStage(stage & 0x7F)
+            if stage & 0x80:
+                slot.setMortgage(True)
+
+
+
+
+
+if __name__ == "__main__":
+    import gc
+    import tempfile
+    import time
+    from handlers import silent
+    from lib.monopoly import Monopoly
+
+    def tiledLayout(size, groupSize=3):
+        """
+        The standard board followed by groups of groupSize properties, with a Chance slot every tenth slot
+        """
+        layout = {key: getattr(data.slots, key) for key in LAYOUT_KEYS}
+        layout["PROPERTY"] = list(layout["PROPERTY"])
+        layout["CHANCE_IDX"] = list(layout["CHANCE_IDX"])
+        layout["SIZE"] = size
+        standard = [p for group in data.slots.PROPERTY for p in group]
+        group = []
+        for index in range(BOARD_SIZE, size):
+            if index % 10 == 0:
+                layout["CHANCE_IDX"].append(index)
+                continue
+            name, price, block, rents, _ = standard[index % len(standard)]
+            group.append((name + " #" + str(index), price, block, rents, index))
+            if len(group) == groupSize:
+                layout["PROPERTY"].append(group)
+                group = []
+        if group:
+            layout["PROPERTY"].append(group)
+        return layout
 
+    with tempfile.TemporaryDirectory() as tmp:
+        for size, groupSize in ((40, 3), (1000, 3), (10000, 3), (10000, 1000)):
+            path = os.path.join(tmp, "board-%d-%d.json" % (size, groupSize))
+            with open(path, "w") as f:
+                json.dump(tiledLayout(size, groupSize), f)
+            start = time.perf_counter()
+            loadLayout(path)
+            parse = time.perf_counter() - start
+            start = time.perf_counter()
+            loadLayout(path)
+            cached = time.perf_counter() - start
+            start = time.perf_counter()
+            Monopoly(["P1", "P2", "P3", "P4"], silent, seed=0, layout=path)
+            build = time.perf_counter() - start
 
+            # Build the games first and leave them out of the collector's way, so that only turns are timed
+            games = [Monopoly(["P1", "P2", "P3", "P4"], silent, seed=seed, layout=path) for seed in range(20)]
+            gc.collect()
+            gc.freeze()
+            turns = 0
+            start = time.perf_counter()
+            for game in games:
+                for _ in range(500):
+                    if game.isOver():
+                        break
+                    game.turn()
+                    game.check()
+                    game.updateNextPlayer()
+                    turns += 1
+            elapsed = time.perf_counter() - start
+            gc.unfreeze()
+            print("%5d slots, groups of %4d: parse %7.2f ms, cached %.3f ms, new game %6.2f ms, %5.1f us per turn"
+                  % (size, groupSize, parse * 1e3, cached * 1e3, build * 1e3, elapsed / turns * 1e6))
 
+    # A game on a dict layout pickles the id of the layout, so its size does not grow with the board
+    import pickle
+    for size in (40, 1040):
+        game = Monopoly(["P1", "P2", "P3", "P4"], silent, seed=0, layout=tiledLayout(size))
+        print("%5d slots, dict layout: pickled game %d B" % (size, len(pickle.dumps(game))))
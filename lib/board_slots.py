@@ -1,14 +1,20 @@
+from operator import getitem
+
 from common.flags import SLOT_PROP, SLOT_PROP_UTIL, SLOT_PROP_RAIL, SLOT_CHARGE, SLOT_CARD, SLOT_GOTOJAIL
-from data.price import TRAIN_PRICE, TRAIN_RENT, UTIL_PRICE
+from data.price import TRAIN_PRICE, TRAIN_RENT, UTIL_PRICE, BUILDING_STAGE_VALUE
 
 
 class BoardSlot:
+    __slots__ = ("name", "board", "players", "index")
+    # The SLOT_* flags of the slot, which only depend on its class
+    type = 0
+
     def __init__(self, name):
         # Slot's parameter
         self.name = name
         self.board = None
-        self.players = []
-        self.type = 0
+        # Players on this slot, in arrival order. A Tuple takes less room than a set and a slot holds a few players
+        self.players = ()
         self.index = None
 
     def getName(self):
@@ -33,35 +39,121 @@ class BoardSlot:
         return ret
 
     def putPlayer(self, player):
-        self.players.append(player)
+        self.players += (player,)
 
     def unputPlayer(self, player):
-        self.players.remove(player)
+        players = self.players
+        if players[0] is player:
+            self.players = players[1:]
+        else:
+            i = players.index(player)
+            self.players = players[:i] + players[i + 1:]
 
-    def connectBoard(self, board):
+    def connectBoard(self, board, index=None):
         self.board = board
         # TODO: Catch ValueError and AttributeError for illegal slot connection
-        self.index = self.board.getSlots().index(self)
+        self.index = self.board.getSlots().index(self) if index is None else index
+
+    def __reduce__(self):
+        # A slot is pickled as a reference to its board, which carries the state of every slot
+        return getitem, (self.board, self.index)
+
+
+# The indices and names of the members of every group built so far, so that the groups of every board built from
+# the same layout share them
+_shared = {}
+
+
+class PropertyGroup:
+    """
+    Properties that are owned and developed together (a color block, the railroads or the utilities)
+
+    The group counts how many of its properties each owner holds, so checking whether one player owns all of them
+    and moving a property from one owner to another take constant time whatever the size of the group. The counts
+    are packed by seat into one Integer, a field of as many bits as the size of the group needs per seat, with the
+    unowned properties in the first field. The group also counts its properties that have buildings.
+    """
+    __slots__ = ("board", "indices", "names", "width", "counts", "developed")
+
+    def __init__(self, board, indices):
+        """
+        :param board: A Board object, whose slots at indices are already in place
+        :param indices: A Tuple of Integers. The indices of the members, in board order
+        """
+        self.board = board
+        self.indices = _shared.setdefault(indices, indices)
+        names = tuple(board.slots[i].getName() for i in indices)
+        self.names = _shared.setdefault(names, names)
+        self.width = len(indices).bit_length()
+        # Every member starts unowned
+        self.counts = len(indices)
+        # Number of members with buildings. Railroads use their stage for something else and are never counted
+        self.developed = 0
+        for i in indices:
+            board.slots[i].group = self
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        """
+        Iterate over the PropertySlots of the group, in board order, looked up on the board
+        """
+        slots = self.board.slots
+        for i in self.indices:
+            yield slots[i]
+
+    @property
+    def members(self):
+        """
+        The PropertySlots of the group, in board order, as a Tuple
+        """
+        return tuple(self)
+
+    def transfer(self, old_owner, new_owner):
+        """
+        Count a property of the group changing hands
+        """
+        width = self.width
+        self.counts += (1 << width * (new_owner.seat + 1 if new_owner else 0)) - \
+            (1 << width * (old_owner.seat + 1 if old_owner else 0))
+
+    def count(self, owner):
+        """
+        Return how many properties of the group owner holds. None counts the unowned ones
+        """
+        width = self.width
+        return self.counts >> width * (owner.seat + 1 if owner else 0) & (1 << width) - 1
+
+    def isOwnedBy(self, owner):
+        """
+        Check whether owner holds every property of the group. None checks that none is owned
+        """
+        width = self.width
+        return self.counts >> width * (owner.seat + 1 if owner else 0) & (1 << width) - 1 == len(self.indices)
 
 
 class PropertySlot(BoardSlot):
+    __slots__ = ("owner", "price", "block", "stage", "rents", "mortgaged", "group")
+    type = SLOT_PROP
+
     def __init__(self, name, price, block=None, rents=None):
         """
         Initialize a Property slot
         :param name: The name of the property
         :param price: The price of the property
         :param block: The block the property is on (optional for Railroad and Utility)
-        :param rents: The list of rent amount according to the property's stage of development
+        :param rents: The Tuple of rent amounts according to the property's stage of development
         """
         super().__init__(name)
         self.owner = None
         self.price = price
         self.block = block
-        self.type |= SLOT_PROP
         self.stage = 0
         self.rents = rents
         self.mortgaged = False
-        self.siblings = []
+        # The PropertyGroup this property belongs to
+        self.group = None
 
     # Properties methods
 
@@ -85,6 +177,48 @@ class PropertySlot(BoardSlot):
         """
         return self.rents[self.stage]
 
+    def getWorth(self):
+        """
+        Return the value of the property to its owner: the price (halved if mortgaged)
+        plus the value of its buildings
+        """
+        ret = self.price // 2 if self.mortgaged else self.price
+        if self.type == SLOT_PROP:
+            ret += BUILDING_STAGE_VALUE[self.block][self.stage]
+        return ret
+
+    def setOwner(self, new_owner):
+        """
+        Set the new owner of this property
+        :param new_owner: A Player object. The new owner of this property
+        """
+        if self.board.zobrist:
+            self.board.zobrist.setOwner(self.index, self.owner, new_owner)
+        old_owner = self.owner
+        self.owner = new_owner
+        if self.group:
+            self.group.transfer(old_owner, new_owner)
+
+    def updateStage(self, new_stage):
+        """
+        Change the development stage, keeping the owner's net worth and the game's hash up to date
+        """
+        before = self.getWorth()
+        if self.board.zobrist:
+            self.board.zobrist.setStage(self.index, self.stage, new_stage)
+        if self.type == SLOT_PROP and self.group and (self.stage > 0) != (new_stage > 0):
+            self.group.developed += 1 if new_stage else -1
+        self.stage = new_stage
+        self.updateWorth(before)
+
+    def updateWorth(self, before):
+        """
+        Report a change of value to the owner's net worth
+        :param before: The value of the property before the change
+        """
+        if self.owner:
+            self.owner.adjustWorth(self.getWorth() - before)
+
     def getData(self):
         ret = super().getData()
         ret["price"] = self.getPrice()
@@ -92,7 +226,7 @@ class PropertySlot(BoardSlot):
             ret["owner"] = self.getOwner().getName()
         else:
             ret["owner"] = None
-        ret["siblings"] = [s.getName() for s in self.getSibs()]
+        ret["siblings"] = self.group.names if self.group else ()
         if self.isType(SLOT_PROP_UTIL):
             ret["multiplier"] = self.getMultiplier()
         else:
@@ -102,29 +236,26 @@ class PropertySlot(BoardSlot):
 
     # Ownership and relationship with other properties
 
-    def addSibs(self, sibs):
+    def getGroup(self):
         """
-        Add a sibling property
-        :param sibs: The sibling property to be added
+        Get the group of this property
+        :return: A PropertyGroup object, or None if the property is on its own
         """
-        self.siblings += sibs
+        return self.group
 
     def getSibs(self):
         """
         Get all siblings property
-        :return: A List of siblings PropertySlots
+        :return: A List of the other PropertySlots of the group
         """
-        return self.siblings
+        return [sib for sib in self.group if sib is not self] if self.group else []
 
     def isSibOwned(self):
         """
         Check whether all siblings are owned by the same player
         :return: A Boolean value
         """
-        ret = True
-        for sib in self.getSibs():
-            ret &= sib.getOwner() == self.getOwner()
-        return ret
+        return self.group.isOwnedBy(self.owner) if self.group else True
 
     def isLeastDeveloped(self):
         if self.isSibOwned():
@@ -147,13 +278,6 @@ class PropertySlot(BoardSlot):
         """
         return self.owner
 
-    def setOwner(self, new_owner):
-        """
-        Set the new owner of this property
-        :param new_owner: A Player object. The new owner of this property
-        """
-        self.owner = new_owner
-
     # Mortgage methods
 
     def isMortgage(self):
@@ -168,7 +292,11 @@ class PropertySlot(BoardSlot):
         Set the mortgage status of this property
         :param val: A Boolean value
         """
-        self.mortgaged = True
+        before = self.getWorth()
+        if self.board.zobrist and val != self.mortgaged:
+            self.board.zobrist.toggleMortgage(self.index)
+        self.mortgaged = val
+        self.updateWorth(before)
 
     # Stage methods
 
@@ -176,13 +304,13 @@ class PropertySlot(BoardSlot):
         """
         Increment the development stage of this property.
         """
-        self.stage += 1
+        self.updateStage(self.stage + 1)
 
     def decrStage(self):
         """
         Decrement the development stage of this property
         """
-        self.stage -= 1
+        self.updateStage(self.stage - 1)
 
     def getStage(self):
         """
@@ -195,36 +323,44 @@ class PropertySlot(BoardSlot):
         """
         Reset the development stage of this property to 0
         """
-        self.stage = 0
+        self.updateStage(0)
 
     def setStage(self, new_stage):
         """
         Set the development stage of this property
         :param new_stage: The new value of the development stage
         """
-        self.stage = new_stage
+        self.updateStage(new_stage)
 
 
 class RailroadSlot(PropertySlot):
+    __slots__ = ()
+    type = SLOT_PROP | SLOT_PROP_RAIL
+
     def __init__(self, name):
         super().__init__(name, TRAIN_PRICE, None, TRAIN_RENT)
-        self.type |= SLOT_PROP_RAIL
 
     def build(self):
         return # disable this method since you don't "build" on railroad slots
 
     def setOwner(self, new_owner):
-        self.owner = new_owner
-        self.setStage(self.owner.getCount(SLOT_PROP_RAIL)-1)
-        for sib in self.getSibs():
-            if sib.getOwner() == new_owner:
-                sib.setStage(self.owner.getCount(SLOT_PROP_RAIL)-1)
+        old_owner = self.owner
+        super().setOwner(new_owner)
+        if not new_owner:
+            self.resetStage()
+        # The stage of a railroad is the number of railroads its owner has, minus one
+        for owner in (old_owner, new_owner):
+            if owner:
+                for rail in owner.getOwned(SLOT_PROP|SLOT_PROP_RAIL):
+                    rail.setStage(owner.getCount(SLOT_PROP_RAIL)-1)
 
 
 class UtilitySlot(PropertySlot):
+    __slots__ = ()
+    type = SLOT_PROP | SLOT_PROP_UTIL
+
     def __init__(self, name):
         super().__init__(name, UTIL_PRICE)
-        self.type |= SLOT_PROP_UTIL
 
     def build(self):
         return # disable this method since you don't "build" on utility slots
@@ -238,20 +374,24 @@ class UtilitySlot(PropertySlot):
 
 
 class ChargeSlot(BoardSlot):
+    __slots__ = ("amount",)
+    type = SLOT_CHARGE
+
     def __init__(self, name, amount, payee=None):
         super().__init__(name)
         self.amount = amount
-        self.type |= SLOT_CHARGE
 
     def getAmount(self, player=None):
         return self.amount(player) if callable(self.amount) else self.amount
 
 
 class CardSlot(BoardSlot):
+    __slots__ = ("deck",)
+    type = SLOT_CARD
+
     def __init__(self, name, deck=None):
         super().__init__(name)
         self.deck = deck
-        self.type |= SLOT_CARD
 
     def drawCard(self, player):
         if self.deck:
@@ -262,6 +402,5 @@ class CardSlot(BoardSlot):
 
 
 class GoToJailSlot(BoardSlot):
-    def __init__(self, name):
-        super().__init__(name)
-        self.type |= SLOT_GOTOJAIL
\ No newline at end of file
+    __slots__ = ()
+    type = SLOT_GOTOJAIL
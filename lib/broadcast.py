@@ -0,0 +1,228 @@
+import json
+import struct
+import threading
+from collections import deque
+
+from lib.encoder import StateEncoder
+
+# Frame header: sequence number and frame kind
+HEADER = struct.Struct(">QB")
+KEYFRAME = 0
+DELTA = 1
+# A keyframe is published every KEYFRAME_INTERVAL frames so that late joiners converge even without a resync
+KEYFRAME_INTERVAL = 64
+# Frames a spectator may fall behind before it is dropped or resynced
+QUEUE_LIMIT = 256
+
+# What to do with spectators that fall QUEUE_LIMIT frames behind
+POLICY_RESYNC = 0
+POLICY_DROP = 1
+
+
+def encodeFrame(seq, kind, data):
+    """
+    Encode a frame: the header followed by the JSON payload
+    """
+    return HEADER.pack(seq, kind) + json.dumps(data, separators=(",", ":")).encode()
+
+
+def decodeFrame(frame):
+    """
+    Decode a frame into its sequence number, kind and payload
+    """
+    seq, kind = HEADER.unpack_from(frame)
+    return seq, kind, json.loads(bytes(frame[HEADER.size:]))
+
+
+def diff(old, new):
+    """
+    Return the entries of the slots and players of new that differ from old
+    """
+    ret = {}
+    for section in ("slots", "players"):
+        before = old.get(section, {})
+        changed = {k: v for k, v in new[section].items() if before.get(k) != v}
+        if changed:
+            ret[section] = changed
+    return ret
+
+
+class SpectatorQueue:
+    """
+    Frames waiting to be read by one spectator. Every frame is a memoryview on a buffer shared by all spectators.
+    """
+    def __init__(self, limit=QUEUE_LIMIT):
+        self.frames = deque()
+        self.limit = limit
+        self.ready = threading.Event()
+        self.closed = False
+        self.resyncs = 0
+
+    def push(self, frame):
+        """
+        Queue a frame
+        :return: A Boolean value. False if the spectator is too far behind to take it
+        """
+        if len(self.frames) >= self.limit:
+            return False
+        self.frames.append(frame)
+        self.ready.set()
+        return True
+
+    def reset(self, keyframe):
+        """
+        Throw away the pending frames and restart from a keyframe
+        """
+        self.frames.clear()
+        self.frames.append(keyframe)
+        self.resyncs += 1
+        self.ready.set()
+
+    def get(self, timeout=None):
+        """
+        Pop the next frame, waiting up to timeout seconds for one
+        :return: A memoryview, or None if no frame arrived in time or the spectator was dropped
+        """
+        if not self.frames and not self.closed:
+            self.ready.wait(timeout)
+        try:
+            frame = self.frames.popleft()
+        except IndexError:
+            return None
+        if not self.frames:
+            self.ready.clear()
+        return frame
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+    def isClosed(self):
+        return self.closed
+
+
+class Broadcaster:
+    """
+    Spectator fan-out for a game
+
+    Every state update is encoded once, as a delta from the previous update, and the same buffer is queued for
+    every spectator. A spectator that falls behind never blocks the game: depending on the policy it is either
+    dropped or its queue is reset to a keyframe of the current state.
+    """
+    def __init__(self, game, policy=POLICY_RESYNC, limit=QUEUE_LIMIT):
+        self.game = game
+        self.policy = policy
+        self.limit = limit
+        self.spectators = []
+        self.seq = 0
+        self.last = {}
+        self.keyframe = None
+        self.encoder = StateEncoder(game)
+        self.lock = threading.Lock()
+
+    def subscribe(self):
+        """
+        Add a spectator. Its first frame is a keyframe of the current state.
+        :return: A SpectatorQueue object
+        """
+        queue = SpectatorQueue(self.limit)
+        with self.lock:
+            queue.push(self.getKeyframe())
+            self.spectators.append(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        with self.lock:
+            if queue in self.spectators:
+                self.spectators.remove(queue)
+        queue.close()
+
+    def getKeyframe(self):
+        """
+        Return a keyframe of the last published state, encoding it if not done yet
+
+        The game may have moved on since the last publish, so the keyframe is built from the state the next delta
+        is based on rather than from the live game. Otherwise a spectator joining between two publishes would start
+        ahead of the delta base and keep any field that reverts in the next delta.
+        """
+        if self.keyframe is None:
+            if not self.last:
+                self.last = self.game.getData()
+            self.keyframe = memoryview(encodeFrame(self.seq, KEYFRAME, self.last))
+        return self.keyframe
+
+    def publish(self):
+        """
+        Encode the current state of the game and queue it for every spectator
+        :return: An Integer. The sequence number of the frame
+        """
+        with self.lock:
+            data = self.game.getData()
+            self.seq += 1
+            if self.seq % KEYFRAME_INTERVAL == 0:
+                # The live game is the state just taken, so the encoder can skip the dict
+                self.last = data
+                self.keyframe = frame = memoryview(HEADER.pack(self.seq, KEYFRAME) + self.encoder.encode())
+            else:
+                frame = memoryview(encodeFrame(self.seq, DELTA, diff(self.last, data)))
+                self.last = data
+                self.keyframe = None
+
+            behind = [queue for queue in self.spectators if not queue.push(frame)]
+            for queue in behind:
+                if self.policy == POLICY_DROP:
+                    self.spectators.remove(queue)
+                    queue.close()
+                else:
+                    queue.reset(self.getKeyframe())
+            return self.seq
+
+    def wrap(self, handler):
+        """
+        Wrap a signal handler so that the state is published after every signal
+        :param handler: A signal handler, such as handlers.handlers
+        :return: A signal handler
+        """
+        def wrapped(signo, args=()):
+            ret = handler(signo, args)
+            self.publish()
+            return ret
+        return wrapped
+
+
+def applyFrame(state, frame):
+    """
+    Apply a frame to a spectator's copy of the state
+
+    :param state: A dict object. The state built from previous frames, updated in place
+    :param frame: A frame as returned by SpectatorQueue.get()
+    :return: An Integer. The sequence number of the frame
+    """
+    seq, kind, data = decodeFrame(frame)
+    if kind == KEYFRAME:
+        state.clear()
+        state.update(data)
+    else:
+        for section, changed in data.items():
+            state.setdefault(section, {}).update(changed)
+    return seq
+
+
+if __name__ == "__main__":
+    import time
+    from handlers import silent
+    from lib.monopoly import Monopoly
+
+    for count in (1, 10, 100, 1000):
+        game = Monopoly(["P1", "P2", "P3", "P4"], silent)
+        broadcaster = Broadcaster(game, limit=1 << 20)
+        queues = [broadcaster.subscribe() for _ in range(count)]
+        updates = 2000
+        start = time.process_time()
+        for _ in range(updates):
+            game.turn()
+            game.check()
+            game.updateNextPlayer()
+            broadcaster.publish()
+        elapsed = time.process_time() - start
+        print(count, "spectators:", round(elapsed / updates * 1e6, 1), "us CPU per update (game included)")
@@ -0,0 +1,132 @@
+from functools import lru_cache
+
+from data.price import BUILDING_PRICE
+from lib.utils import pay
+
+# Highest development stage of a property (hotel)
+MAX_STAGE = 5
+# Every building price is a multiple of this, so budgets are planned in these units
+PRICE_UNIT = 50
+
+
+def getMonopolies(player):
+    """
+    Get the groups of properties the player can build on
+
+    A group is buildable if the player owns every property in it and none of them is mortgaged.
+
+    :param player: A Player object
+    :return: A List of Tuples of PropertySlots, each ordered by board index
+    """
+    ret = []
+    seen = set()
+    for prop in player.getOwned():
+        group = prop.getGroup()
+        if group in seen:
+            continue
+        seen.add(group)
+        if prop.isSibOwned() and not any(p.isMortgage() for p in group):
+            ret.append(group.members)
+    return ret
+
+
+@lru_cache(maxsize=4096)
+def _groupTable(rents, stages, weights):
+    """
+    Best expected rent gain for every number of houses added to a group
+
+    Houses always go to the least developed property (the even-building rule). Among equally developed
+    properties the one with the largest weighted rent increase is built first, which makes every prefix of
+    the build order optimal for its size.
+
+    :param rents: A Tuple of rent Tuples, one per property
+    :param stages: A Tuple of current stages, one per property
+    :param weights: A Tuple of landing weights, one per property
+    :return: A Tuple of (gains, order). gains[k] is the gain of adding k houses, order is the build order as
+    positions in the group
+    """
+    stages = list(stages)
+    gains = [0]
+    order = []
+    while True:
+        low = min(stages)
+        if low >= MAX_STAGE:
+            break
+        best = max((i for i, s in enumerate(stages) if s == low),
+                   key=lambda i: weights[i] * (rents[i][low + 1] - rents[i][low]))
+        gains.append(gains[-1] + weights[best] * (rents[best][low + 1] - rents[best][low]))
+        order.append(best)
+        stages[best] += 1
+    return tuple(gains), tuple(order)
+
+
+def planBuild(player, budget=None, reserve=0, weights=None):
+    """
+    Plan the buildings that maximize the player's expected rent
+
+    Each buildable group gets a table of the best gain for every house count (see _groupTable), then a
+    memoized dynamic program picks how many houses each group gets within the budget. Ties are broken
+    towards the cheaper plan.
+
+    :param player: A Player object. The player who is building
+    :param budget: An Integer. Cash available for building. Defaults to the player's balance
+    :param reserve: An Integer. Cash that must be left over after building
+    :param weights: A dict object mapping slot index to landing probability. Every property weighs 1 if omitted
+    :return: A dict object. "build" is the List of property names to pass to Board.build, in order, "cost" is
+    the total price and "gain" is the expected rent gained per landing
+    """
+    if budget is None:
+        budget = player.getBalance()
+    units = max(0, budget - reserve) // PRICE_UNIT
+
+    groups = []
+    for group in getMonopolies(player):
+        price = BUILDING_PRICE[group[0].getBlock()]
+        gains, order = _groupTable(tuple(tuple(p.rents) for p in group),
+                                   tuple(p.getStage() for p in group),
+                                   tuple(weights.get(p.getIndex(), 0) if weights else 1 for p in group))
+        if len(gains) > 1:
+            groups.append((group, price // PRICE_UNIT, gains, order))
+
+    memo = {}
+
+    def best(i, left):
+        """
+        Best gain using groups i onward with left units of cash, and the house count for group i
+        """
+        if i == len(groups):
+            return 0, 0
+        key = (i, left)
+        if key not in memo:
+            _, cost, gains, _ = groups[i]
+            ret = (best(i + 1, left)[0], 0)
+            for k in range(1, min(len(gains) - 1, left // cost) + 1):
+                gain = gains[k] + best(i + 1, left - k * cost)[0]
+                if gain > ret[0]:
+                    ret = (gain, k)
+            memo[key] = ret
+        return memo[key]
+
+    total, _ = best(0, units)
+    build = []
+    cost = 0
+    left = units
+    for i, (group, unit, _, order) in enumerate(groups):
+        k = best(i, left)[1]
+        build += [group[pos].getName() for pos in order[:k]]
+        cost += k * unit * PRICE_UNIT
+        left -= k * unit
+    return {"build": build, "cost": cost, "gain": total}
+
+
+def applyBuildPlan(player, plan):
+    """
+    Build a plan returned by planBuild and charge the player for it
+
+    :param player: A Player object. The player who is building
+    :param plan: A dict object returned by planBuild
+    """
+    board = player.getBoard()
+    for name in plan["build"]:
+        board.build(name)
+        pay(player, BUILDING_PRICE[board[name].getBlock()], None)
@@ -1,7 +1,11 @@
-from random import shuffle
-from data.cards import CHANCE_CARD, COMMUNITY_CHEST_CARD
+import random as rd
+from functools import lru_cache
+
+from lib.rng import shuffle
 
 class Card:
+    __slots__ = ("desc", "action")
+
     def __init__(self, desc, actionTuple):
         self.desc = desc
         self.action = actionTuple
@@ -16,6 +20,8 @@ class Card:
         return False
 
 class JailFreeCard(Card):
+    __slots__ = ("owner", "deck")
+
     def __init__(self, deck):
         super().__init__("Get out of Jail Free.", None)
         self.owner = None
@@ -32,32 +38,81 @@ class JailFreeCard(Card):
     def isJFC(self):
         return True
 
+@lru_cache(maxsize=32)
+def _sharedCards(cards):
+    """
+    Return the Cards of a deck and their positions in it, shared by every deck built from the same cards since they
+    never change
+    """
+    ret = tuple(Card(*card) for card in cards)
+    return ret, {card: i for i, card in enumerate(ret)}
+
+
 class CardDeck():
-    def __init__(self, type):
-        self.cards = []
-        self.used = []
-        if type == 0:
-            for card in CHANCE_CARD:
-                self.cards.append(Card(*card))
-        elif type == 1:
-            for card in COMMUNITY_CHEST_CARD:
-                self.cards.append(Card(*card))
-        self.cards.append(JailFreeCard(self))
-        shuffle(self.cards)
+    __slots__ = ("rng", "source", "cards", "used", "jailFree", "shared", "positions")
+
+    def __init__(self, cards, rng=rd):
+        """
+        :param cards: A Tuple of (description, actions) pairs, such as data.cards.CHANCE_CARD
+        :param rng: The random stream shuffling the deck, which may be parked (see lib/rng.py). Defaults to the random
+        module
+        """
+        self.source = cards
+        try:
+            self.shared, self.positions = _sharedCards(cards)
+        except TypeError:
+            # Cards given as lists can't be cached
+            self.shared, self.positions = _sharedCards.__wrapped__(cards)
+        self.jailFree = JailFreeCard(self)
+        # Both piles hold the positions of their cards (see getPosition()), one byte each
+        self.cards = bytearray(range(len(self.shared) + 1))
+        self.used = bytearray()
+        self.rng = shuffle(rng, self.cards)
 
     def draw(self, player):
         if len(self.cards):
-            ret = self.cards.pop()
+            position = self.cards.pop()
+            ret = self.getCard(position)
             if type(ret) == JailFreeCard:
                 ret.setOwner(player)
                 return 0
-            self.used.append(ret)
+            self.used.append(position)
             return ret
         else:
             self.cards = self.used
-            shuffle(self.cards)
-            self.used = []
+            self.rng = shuffle(self.rng, self.cards)
+            self.used = bytearray()
             return self.draw(player)
 
     def addToUsed(self, card):
-        self.used.append(card)
\ No newline at end of file
+        self.used.append(self.getPosition(card))
+
+    def getPosition(self, card):
+        """
+        Return the position of a card in the order of the cards the deck was built from. The Jail Free card comes
+        last
+        """
+        return len(self.positions) if card is self.jailFree else self.positions[card]
+
+    def getCard(self, position):
+        """
+        Return the card at a position, as given by getPosition()
+        """
+        shared = self.shared
+        return shared[position] if position < len(shared) else self.jailFree
+
+    def __reduce__(self):
+        return CardDeck, (self.source,), self.__getstate__()
+
+    def __getstate__(self):
+        """
+        Return the state of the deck: its random stream and both piles. The Jail Free card is in neither pile while a
+        player holds it
+        """
+        return None if self.rng is rd else self.rng, bytes(self.cards), bytes(self.used)
+
+    def __setstate__(self, state):
+        rng, cards, used = state
+        self.rng = rng or rd
+        self.cards = bytearray(cards)
+        self.used = bytearray(used)
@@ -0,0 +1,216 @@
+import math
+import random as rd
+from statistics import NormalDist
+
+from lib.simulation import playGame, MAX_TURNS
+
+# Outcome of a game for strategy A: +1 if A won, -1 if B won, 0 if nobody did
+A_WINS = 1
+B_WINS = -1
+DRAW = 0
+# Largest bet of the empirical Bernstein confidence sequence, in (0, 1)
+MAX_BET = 0.5
+
+
+def fixedSampleSize(delta, alpha=0.05, beta=0.2):
+    """
+    Number of games a fixed-size two-sided test needs to detect a win rate difference of delta
+
+    :param delta: A Float. The smallest difference in win rate worth detecting
+    :param alpha: A Float. The type I error rate
+    :param beta: A Float. The type II error rate
+    :return: An Integer
+    """
+    z = NormalDist().inv_cdf
+    return math.ceil(((z(1 - alpha / 2) + z(1 - beta)) / delta) ** 2)
+
+
+class ConfidenceSequence:
+    """
+    Always-valid confidence sequence for the mean of outcomes in [-1, 1]
+
+    Uses the two-sided normal mixture boundary for 1-sub-Gaussian increments, which holds at every number of games
+    simultaneously with probability 1 - alpha. It can therefore be checked after every game and the comparison
+    stopped as soon as it is conclusive, without inflating the error rate.
+
+    With empirical set, the predictable plug-in empirical Bernstein confidence sequence is used instead (Waudby-Smith
+    and Ramdas, "Estimating means of bounded random variables by betting"). Every outcome is weighted by a bet
+    chosen from the outcomes before it, larger when their variance is small, and the interval shrinks with the
+    variance of the outcomes, which is what makes paired games pay off. It holds at every count, from the first
+    outcome on, without any asymptotic argument.
+    """
+    def __init__(self, alpha=0.05, target=1000, empirical=False):
+        """
+        :param alpha: A Float. The error rate
+        :param target: An Integer. Number of games around which the normal mixture boundary is tightest
+        :param empirical: A Boolean value. True for the empirical Bernstein boundary
+        """
+        self.alpha = alpha
+        log = -2 * math.log(alpha / 2)
+        self.rho = target / (log + math.log(log + 1))
+        self.empirical = empirical
+        self.count = 0
+        self.total = 0
+        self.totalSq = 0
+        # Empirical Bernstein state, over the outcomes mapped to [0, 1]: their sum, the sum of their squared
+        # deviations from the running mean, the sum of the bets, of the bets times outcomes and of the penalties
+        self.sumY = 0
+        self.sumDev = 0
+        self.sumBet = 0
+        self.sumBetY = 0
+        self.sumPenalty = 0
+
+    def add(self, x):
+        if self.empirical:
+            y = (x + 1) / 2
+            n = self.count + 1
+            # Running mean and variance of the previous outcomes, starting from 1/2 and 1/4
+            mean = (0.5 + self.sumY) / n
+            variance = (0.25 + self.sumDev) / n
+            bet = min(math.sqrt(2 * math.log(2 / self.alpha) / (variance * n * math.log(1 + n))), MAX_BET)
+            self.sumBet += bet
+            self.sumBetY += bet * y
+            self.sumPenalty += (y - mean) ** 2 * (-math.log(1 - bet) - bet)
+            self.sumY += y
+            self.sumDev += (y - (0.5 + self.sumY) / (n + 1)) ** 2
+        self.count += 1
+        self.total += x
+        self.totalSq += x * x
+
+    def getMean(self):
+        return self.total / self.count if self.count else 0
+
+    def getVariance(self):
+        if self.count < 2:
+            return 1
+        return max(0, (self.totalSq - self.total * self.total / self.count) / (self.count - 1))
+
+    def getInterval(self):
+        if not self.count:
+            return -math.inf, math.inf
+        if self.empirical:
+            # Bet-weighted mean and radius on [0, 1], mapped back to [-1, 1]
+            center = self.sumBetY / self.sumBet
+            radius = (math.log(2 / self.alpha) + self.sumPenalty) / self.sumBet
+            return max(2 * (center - radius) - 1, -1), min(2 * (center + radius) - 1, 1)
+        v = self.count + self.rho
+        radius = math.sqrt(v * (math.log(v / self.rho) + 2 * math.log(2 / self.alpha))) / self.count
+        mean = self.getMean()
+        return mean - radius, mean + radius
+
+
+def playMatch(strategyA, strategyB, i, players=2, maxTurns=MAX_TURNS, seed=None):
+    """
+    Play game i between two strategies
+
+    Seats alternate between A and B, and the seating is rotated from one game to the next so that neither strategy
+    keeps the first seat.
+
+    :param seed: An Integer. If given, the game's luck comes from the streams addressed by seed (see lib/rng.py)
+    :return: A_WINS, B_WINS or DRAW
+    """
+    seats = [(seat + i) % 2 == 0 for seat in range(players)]
+    strategies = [strategyA if isA else strategyB for isA in seats]
+    game = playGame(["P" + str(seat + 1) for seat in range(players)], maxTurns=maxTurns, strategies=strategies,
+                    seed=seed or 0, crn=seed is not None)
+    winner = game.getWinner()
+    if not winner:
+        return DRAW
+    return A_WINS if seats[game.players.index(winner)] else B_WINS
+
+
+def playPair(strategyA, strategyB, i, seed=0, players=2, maxTurns=MAX_TURNS):
+    """
+    Play game i twice with common random numbers, the second time with the seats of A and B swapped
+
+    Both games draw their dice, cards and first player from the streams of seed + i, so A and B face the same luck
+    from the same seats. Whatever the luck alone decides cancels out of the paired difference.
+
+    :return: A Float in [-1, 1]. The paired difference, i.e. the mean outcome of the two games for A
+    """
+    ret = 0
+    for j in (0, 1):
+        rd.seed(seed + i)
+        ret += playMatch(strategyA, strategyB, j, players, maxTurns, seed + i)
+    return ret / 2
+
+
+def compare(strategyA, strategyB, delta=0.05, alpha=0.05, beta=0.2, maxGames=None, players=2, seed=0,
+            maxTurns=MAX_TURNS, outcomes=None, paired=False):
+    """
+    Compare two strategies, stopping as soon as the difference in win rate is settled
+
+    The outcomes stream into a ConfidenceSequence on the difference in win rate (A minus B). The comparison stops
+    when the interval excludes 0 (one strategy is better), when it fits within (-delta, delta) (the strategies are
+    equivalent up to delta) or after maxGames games.
+
+    In paired mode every outcome is a pair of games played by playPair() and the confidence sequence adapts to the
+    variance of the paired differences, which common random numbers make much smaller than that of single games.
+
+    :param strategyA: A signal handler. The first strategy
+    :param strategyB: A signal handler. The second strategy
+    :param delta: A Float. The smallest difference in win rate worth detecting
+    :param alpha: A Float. The error rate
+    :param beta: A Float. The type II error rate of the fixed-size test the comparison is measured against
+    :param maxGames: An Integer. Games after which the comparison gives up. Defaults to four times the fixed size
+    :param players: An Integer. Number of seats per game
+    :param seed: An Integer. Game i is seeded with seed + i
+    :param maxTurns: An Integer. Turn limit of each game
+    :param outcomes: A function of the game number (or pair number in paired mode) returning its outcome. Defaults
+    to playing it with playMatch() or playPair()
+    :param paired: A Boolean value. True to play pairs of games with common random numbers
+    :return: A dict object with the "winner" ("A", "B", "equivalent" or None), the "diff" in win rate and its
+    "interval", the number of "games" played, the "fixedGames" an unpaired fixed-size test needs, the games
+    "saved" and the "variance" of the outcomes
+    """
+    fixed = fixedSampleSize(delta, alpha, beta)
+    if maxGames is None:
+        maxGames = 4 * fixed
+    if outcomes is None:
+        if paired:
+            def outcomes(i):
+                return playPair(strategyA, strategyB, i, seed, players, maxTurns)
+        else:
+            def outcomes(i):
+                rd.seed(seed + i)
+                return playMatch(strategyA, strategyB, i, players, maxTurns)
+
+    perOutcome = 2 if paired else 1
+    cs = ConfidenceSequence(alpha, fixed // perOutcome, paired)
+    winner = None
+    while cs.count * perOutcome < maxGames:
+        cs.add(outcomes(cs.count))
+        low, high = cs.getInterval()
+        if low > 0:
+            winner = "A"
+        elif high < 0:
+            winner = "B"
+        elif -delta < low and high < delta:
+            winner = "equivalent"
+        if winner:
+            break
+
+    return {
+        "winner": winner,
+        "diff": cs.getMean(),
+        "interval": cs.getInterval(),
+        "games": cs.count * perOutcome,
+        "fixedGames": fixed,
+        "saved": fixed - cs.count * perOutcome,
+        "variance": cs.getVariance()
+    }
+
+
+if __name__ == "__main__":
+    from common.game_signals import SIG_BUY
+    from handlers import silent
+
+    def neverBuy(signo, args=()):
+        return 0 if signo == SIG_BUY else silent(signo, args)
+
+    def buyCheap(signo, args=()):
+        return args[0]["price"] <= 200 if signo == SIG_BUY else silent(signo, args)
+
+    print(compare(silent, neverBuy, delta=0.1, maxTurns=300))
+    for paired in (False, True):
+        print("paired" if paired else "unpaired", compare(silent, buyCheap, delta=0.1, maxTurns=300, paired=paired))
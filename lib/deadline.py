@@ -0,0 +1,309 @@
+import threading
+import time
+
+from common.game_signals import SIG_BUY, SIG_INJAIL, SIG_BUILD
+
+# Resolution of the timer wheel, in seconds
+TICK = 0.001
+# Buckets per level of the wheel. Level l covers delays up to WHEEL_SIZE^(l+1) ticks
+WHEEL_SIZE = 256
+WHEEL_BITS = 8
+WHEEL_LEVELS = 4
+# Seconds a player has to answer a decision
+DECISION_TIMEOUT = 30
+
+# What a player who does not answer in time decides: decline the buy, roll in jail, skip the build
+DEFAULT_ACTIONS = {
+    SIG_BUY: 0,
+    SIG_INJAIL: 0,
+    SIG_BUILD: 0
+}
+
+
+class Timer:
+    """
+    A deadline armed on a TimerWheel
+    """
+    __slots__ = ("due", "callback", "bucket")
+
+    def __init__(self, due, callback):
+        self.due = due
+        self.callback = callback
+        self.bucket = None
+
+    def isArmed(self):
+        return self.bucket is not None
+
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel shared by every game of a process
+
+    Level 0 has one bucket per tick. A timer due further than a level covers waits in a bucket of the next level
+    and is moved down when the wheel reaches that bucket's range. Arming and cancelling a timer are a dict insert and
+    delete, and every tick only visits the timers due on it, plus the occasional cascade of one bucket. One thread
+    drives the wheel and calls the callbacks of expired timers, so callbacks must return quickly.
+    """
+    def __init__(self, tick=TICK):
+        self.tick = tick
+        self.wheels = [[{} for _ in range(WHEEL_SIZE)] for _ in range(WHEEL_LEVELS)]
+        self.origin = time.monotonic()
+        # Last tick processed
+        self.now = 0
+        self.count = 0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.thread = None
+        self.stopped = False
+
+    def _place(self, timer):
+        delta = timer.due - self.now
+        for level in range(WHEEL_LEVELS):
+            if delta < 1 << WHEEL_BITS * (level + 1):
+                bucket = self.wheels[level][timer.due >> WHEEL_BITS * level & WHEEL_SIZE - 1]
+                break
+        else:
+            # Beyond the range of the wheel: wait in the last bucket of the top level and be placed again from there
+            level = WHEEL_LEVELS - 1
+            bucket = self.wheels[level][(self.now >> WHEEL_BITS * level) - 1 & WHEEL_SIZE - 1]
+        bucket[timer] = None
+        timer.bucket = bucket
+
+    def arm(self, delay, callback):
+        """
+        Arm a deadline
+        :param delay: A Float. Seconds until the deadline
+        :param callback: A function called without arguments by the wheel's thread when the deadline passes
+        :return: A Timer object, to pass to cancel()
+        """
+        elapsed = time.monotonic() - self.origin
+        due = -(-(elapsed + delay) // self.tick)
+        with self.lock:
+            if not self.count:
+                # Nothing is pending: skip the idle ticks instead of walking them
+                self.now = max(self.now, int(elapsed // self.tick))
+            timer = Timer(max(int(due), self.now + 1), callback)
+            self._place(timer)
+            self.count += 1
+            if self.count == 1:
+                self.wakeup.notify()
+        if not self.thread:
+            self.start()
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancel a deadline
+        :return: A Boolean value. False if the deadline already fired or was cancelled
+        """
+        with self.lock:
+            if timer.bucket is None:
+                return False
+            del timer.bucket[timer]
+            timer.bucket = None
+            self.count -= 1
+            return True
+
+    def advance(self, until):
+        """
+        Process every tick up to until, and call the callbacks of the timers that expired
+        :param until: An Integer. The tick to advance to
+        :return: An Integer. Number of timers fired
+        """
+        expired = []
+        with self.lock:
+            while self.now < until:
+                self.now += 1
+                now = self.now
+                # Move down the timers of the higher level buckets whose range starts now, top level first
+                for level in range(WHEEL_LEVELS - 1, 0, -1):
+                    if now & (1 << WHEEL_BITS * level) - 1 == 0:
+                        bucket = self.wheels[level][now >> WHEEL_BITS * level & WHEEL_SIZE - 1]
+                        if bucket:
+                            timers = list(bucket)
+                            bucket.clear()
+                            if level == 1:
+                                # Everything in a level 1 bucket is now due within the level 0 range
+                                wheel = self.wheels[0]
+                                for timer in timers:
+                                    timer.bucket = wheel[timer.due & WHEEL_SIZE - 1]
+                                    timer.bucket[timer] = None
+                            else:
+                                for timer in timers:
+                                    self._place(timer)
+                bucket = self.wheels[0][now & WHEEL_SIZE - 1]
+                if bucket:
+                    for timer in bucket:
+                        timer.bucket = None
+                    expired += bucket
+                    self.count -= len(bucket)
+                    bucket.clear()
+                if not self.count:
+                    self.now = max(self.now, until)
+                    break
+        for timer in expired:
+            timer.callback()
+        return len(expired)
+
+    def run(self):
+        while not self.stopped:
+            with self.lock:
+                while not self.count and not self.stopped:
+                    self.wakeup.wait()
+            self.advance(int((time.monotonic() - self.origin) // self.tick))
+            time.sleep(self.tick)
+
+    def start(self):
+        with self.lock:
+            if not self.thread:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+        return self
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            self.wakeup.notify()
+
+    def __len__(self):
+        return self.count
+
+
+_wheel = None
+_wheelLock = threading.Lock()
+
+
+def getWheel():
+    """
+    Return the timer wheel shared by every game of the process, creating it if needed
+    """
+    global _wheel
+    with _wheelLock:
+        if _wheel is None:
+            _wheel = TimerWheel()
+        return _wheel
+
+
+class Decision:
+    """
+    A decision a player has to make before a deadline
+
+    The player answers with answer(), usually from another thread such as a network handler. If the deadline passes
+    first, the default action is taken instead. Whichever comes first wins, and wait() returns it.
+    """
+    def __init__(self, signo, args=(), timeout=DECISION_TIMEOUT, default=None, wheel=None):
+        """
+        :param signo: The signal number of the decision, e.g. SIG_BUY
+        :param args: The arguments of the signal
+        :param timeout: A Float. Seconds the player has to answer
+        :param default: The default answer. Defaults to DEFAULT_ACTIONS[signo]
+        :param wheel: A TimerWheel object. Defaults to the process' wheel
+        """
+        self.signo = signo
+        self.args = args
+        self.default = DEFAULT_ACTIONS.get(signo) if default is None else default
+        self.value = None
+        self.expired = False
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+        self.wheel = wheel or getWheel()
+        self.timer = self.wheel.arm(timeout, self.expire)
+
+    def answer(self, value):
+        """
+        Answer the decision
+        :return: A Boolean value. False if it was already answered or expired
+        """
+        with self.lock:
+            if self.done.is_set():
+                return False
+            self.value = value
+            self.done.set()
+        self.wheel.cancel(self.timer)
+        return True
+
+    def expire(self):
+        with self.lock:
+            if self.done.is_set():
+                return
+            self.value = self.default
+            self.expired = True
+            self.done.set()
+
+    def wait(self):
+        """
+        Wait for the answer or the deadline
+        :return: The answer, or the default action if the deadline passed
+        """
+        self.done.wait()
+        return self.value
+
+
+class DeadlineHandlers:
+    """
+    Signal handlers that put a deadline on the player's decisions
+
+    Decision signals (the keys of DEFAULT_ACTIONS) are sent to prompt, which must not block: it only tells the
+    player what to decide, e.g. by sending a message. The game then waits for answer() or the deadline. Every other
+    signal goes to handler.
+    """
+    def __init__(self, prompt, handler, timeout=DECISION_TIMEOUT, wheel=None):
+        """
+        :param prompt: A function taking the signal number and arguments of a decision
+        :param handler: A signal handler for every other signal, such as handlers.silent
+        :param timeout: A Float. Seconds the player has to answer each decision
+        :param wheel: A TimerWheel object. Defaults to the process' wheel
+        """
+        self.prompt = prompt
+        self.handler = handler
+        self.timeout = timeout
+        self.wheel = wheel
+        self.pending = None
+
+    def answer(self, value):
+        """
+        Answer the pending decision
+        :return: A Boolean value. False if no decision is pending or it already expired
+        """
+        decision = self.pending
+        return decision.answer(value) if decision else False
+
+    def __call__(self, signo, args=()):
+        if signo not in DEFAULT_ACTIONS:
+            return self.handler(signo, args)
+        self.pending = Decision(signo, args, self.timeout, wheel=self.wheel)
+        self.prompt(signo, args)
+        ret = self.pending.wait()
+        self.pending = None
+        return ret
+
+
+if __name__ == "__main__":
+    import random as rd
+
+    # Arm 50k deadlines due between 0.5 and 2.5 seconds from now, after arming is over, and measure how late each one
+    # fires. Deadlines due while another thread holds the GIL are late by up to sys.getswitchinterval()
+    wheel = TimerWheel()
+    n = 50000
+    late = []
+
+    def fire(due):
+        late.append(time.monotonic() - due)
+
+    for _ in range(n):
+        delay = rd.uniform(0.5, 2.5)
+        due = time.monotonic() + delay
+        wheel.arm(delay, lambda due=due: fire(due))
+    cancelled = [wheel.arm(1, lambda: late.append(None)) for _ in range(n)]
+    start = time.perf_counter()
+    for timer in cancelled:
+        wheel.cancel(timer)
+    cancel = time.perf_counter() - start
+    while len(late) < n:
+        time.sleep(0.1)
+    time.sleep(0.5)
+    late.sort()
+    print(len(late), "deadlines fired,", late.count(None), "cancelled ones fired;",
+          "cancel %.2f us each;" % (cancel / n * 1e6),
+          "late by: median %.2f ms, p99 %.2f ms, max %.2f ms" % (late[n // 2] * 1e3, late[n * 99 // 100] * 1e3,
+                                                                   late[-1] * 1e3))
@@ -0,0 +1,262 @@
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+
+from config import Rules
+from lib.simulation import simulate, MAX_TURNS
+from lib.stats import GameStats, loadStats
+
+# Seconds a worker may go without a heartbeat before its shard is leased to someone else
+LEASE_TIMEOUT = 10
+# Seconds between two heartbeats of a worker
+HEARTBEAT_INTERVAL = 2
+# Seconds a worker waits before asking again when every remaining shard is leased
+RETRY_INTERVAL = 0.5
+CAMPAIGN_FILE = "campaign.json"
+
+
+def send(sock, msg):
+    sock.sendall(json.dumps(msg).encode() + b"\n")
+
+
+def recv(reader):
+    line = reader.readline()
+    if not line:
+        raise ConnectionError("connection closed")
+    return json.loads(line)
+
+
+class Coordinator:
+    """
+    Coordinator of a distributed simulation campaign
+
+    The campaign's games are split into shards of consecutive seeds. Workers lease a shard, heartbeat while they
+    play it and send back its GameStats state. A shard whose worker stops heartbeating is leased again. Finished
+    shards are checkpointed in the campaign directory, so a coordinator restarted on the same directory only
+    hands out the shards that are left.
+
+    The protocol is one JSON object per line over TCP:
+    - {"op": "lease", "worker": W} is answered with a shard, {"wait": seconds} or {"done": true}
+    - {"op": "heartbeat", "worker": W, "shard": S} is answered with {"ok": false} if the lease was lost
+    - {"op": "result", "worker": W, "shard": S, "stats": state} is answered with {"ok": true}
+    """
+    def __init__(self, path, games, shardSize=1000, seed=0, point=None, pnames=("P1", "P2", "P3", "P4"),
+                 maxTurns=MAX_TURNS, host="127.0.0.1", port=0):
+        """
+        :param path: A String. The campaign directory
+        :param games: An Integer. Number of games in the campaign
+        :param shardSize: An Integer. Number of games per shard
+        :param seed: An Integer. Game i is seeded with seed + i
+        :param point: A dict object of rule overrides, as in a sweep point
+        :param pnames: An Array. Name of the players as Strings
+        :param maxTurns: An Integer. Turn limit of each game
+        """
+        self.path = path
+        self.campaign = {"games": games, "shardSize": shardSize, "seed": seed, "point": point or {},
+                         "pnames": list(pnames), "maxTurns": maxTurns}
+        os.makedirs(path, exist_ok=True)
+        campaignPath = os.path.join(path, CAMPAIGN_FILE)
+        if os.path.exists(campaignPath):
+            with open(campaignPath) as f:
+                if json.load(f) != self.campaign:
+                    raise ValueError(path + " holds a different campaign")
+        else:
+            with open(campaignPath, "w") as f:
+                json.dump(self.campaign, f)
+
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.results = {}
+        self.leases = {}
+        self.pending = deque()
+        for shard in range(-(-games // shardSize)):
+            shardPath = self._shardPath(shard)
+            if os.path.exists(shardPath):
+                with open(shardPath) as f:
+                    self.results[shard] = loadStats(json.load(f))
+            else:
+                self.pending.append(shard)
+        if not self.pending:
+            self.finished.set()
+
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    while True:
+                        send(self.connection, coordinator.handle(recv(self.rfile)))
+                except (ConnectionError, OSError, ValueError):
+                    return
+
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def _shardPath(self, shard):
+        return os.path.join(self.path, "shard-" + str(shard) + ".json")
+
+    def getAddress(self):
+        return self.server.server_address
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def expire(self):
+        """
+        Put the shards of workers that stopped heartbeating back in the queue
+        """
+        now = time.monotonic()
+        for shard, (worker, deadline) in list(self.leases.items()):
+            if deadline < now:
+                del self.leases[shard]
+                self.pending.appendleft(shard)
+
+    def handle(self, msg):
+        """
+        Answer a message from a worker
+        """
+        with self.lock:
+            op = msg.get("op")
+            if op == "lease":
+                self.expire()
+                if self.pending:
+                    shard = self.pending.popleft()
+                    self.leases[shard] = (msg["worker"], time.monotonic() + LEASE_TIMEOUT)
+                    size = self.campaign["shardSize"]
+                    start = shard * size
+                    return {"shard": shard, "start": self.campaign["seed"] + start,
+                            "count": min(size, self.campaign["games"] - start), "campaign": self.campaign}
+                if self.leases:
+                    return {"wait": RETRY_INTERVAL}
+                return {"done": True}
+            elif op == "heartbeat":
+                lease = self.leases.get(msg["shard"])
+                if lease and lease[0] == msg["worker"]:
+                    self.leases[msg["shard"]] = (lease[0], time.monotonic() + LEASE_TIMEOUT)
+                    return {"ok": True}
+                return {"ok": False}
+            elif op == "result":
+                shard = msg["shard"]
+                if shard not in self.results:
+                    shardPath = self._shardPath(shard)
+                    with open(shardPath + ".tmp", "w") as f:
+                        json.dump(msg["stats"], f)
+                    os.replace(shardPath + ".tmp", shardPath)
+                    self.results[shard] = loadStats(msg["stats"])
+                    self.leases.pop(shard, None)
+                    if shard in self.pending:
+                        self.pending.remove(shard)
+                    if not self.pending and not self.leases:
+                        self.finished.set()
+                return {"ok": True}
+            return {"error": "unknown op " + str(op)}
+
+    def getProgress(self):
+        with self.lock:
+            return len(self.results), len(self.results) + len(self.leases) + len(self.pending)
+
+    def wait(self, timeout=None):
+        """
+        Wait for every shard to finish
+        :return: A GameStats object merging every shard, or None if the campaign did not finish in time
+        """
+        if not self.finished.wait(timeout):
+            return None
+        with self.lock:
+            stats = GameStats(maxSeats=len(self.campaign["pnames"]), maxTurns=self.campaign["maxTurns"])
+            for shard in sorted(self.results):
+                stats.merge(self.results[shard])
+            return stats
+
+
+def runWorker(host, port, worker=None):
+    """
+    Lease and play shards from a coordinator until the campaign is done
+
+    :param host: A String. The coordinator's host
+    :param port: An Integer. The coordinator's port
+    :param worker: A String. Name of the worker. Defaults to the host name and process id
+    :return: An Integer. Number of shards played
+    """
+    worker = worker or socket.gethostname() + "-" + str(os.getpid())
+    played = 0
+    with socket.create_connection((host, port)) as sock:
+        reader = sock.makefile("rb")
+        lock = threading.Lock()
+
+        def call(msg):
+            with lock:
+                send(sock, msg)
+                return recv(reader)
+
+        while True:
+            lease = call({"op": "lease", "worker": worker})
+            if lease.get("done"):
+                return played
+            if "wait" in lease:
+                time.sleep(lease["wait"])
+                continue
+
+            campaign = lease["campaign"]
+            stopped = threading.Event()
+
+            def heartbeat():
+                while not stopped.wait(HEARTBEAT_INTERVAL):
+                    call({"op": "heartbeat", "worker": worker, "shard": lease["shard"]})
+
+            beat = threading.Thread(target=heartbeat, daemon=True)
+            beat.start()
+            try:
+                stats = simulate(lease["count"], campaign["pnames"], lease["start"], maxTurns=campaign["maxTurns"],
+                                 rules=Rules(**campaign["point"]))
+            finally:
+                stopped.set()
+                beat.join()
+            call({"op": "result", "worker": worker, "shard": lease["shard"], "stats": stats.getState()})
+            played += 1
+
+
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(description="Distributed Monopoly simulation")
+    parser.add_argument("mode", choices=("coordinator", "worker", "local"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--dir", default="campaign")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--shard", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if args.mode == "worker":
+        print(runWorker(args.host, args.port), "shards played")
+    else:
+        coordinator = Coordinator(args.dir, args.games, args.shard, args.seed, host=args.host, port=args.port).start()
+        host, port = coordinator.getAddress()
+        print("coordinator listening on", host, port)
+        start = time.time()
+        if args.mode == "local":
+            procs = [multiprocessing.Process(target=runWorker, args=(host, port)) for _ in range(args.workers)]
+            for proc in procs:
+                proc.start()
+        stats = coordinator.wait()
+        elapsed = time.time() - start
+        print(stats.games, "games in", round(elapsed, 2), "s:", round(stats.games / elapsed, 1), "games/s")
+        if args.mode == "local":
+            for proc in procs:
+                proc.join()
+        coordinator.stop()
@@ -0,0 +1,89 @@
+import json
+
+from common.flags import SLOT_PROP, SLOT_PROP_UTIL
+
+dumps = json.dumps
+
+
+def _bool(val):
+    return "true" if val else "false"
+
+
+class StateEncoder:
+    """
+    Direct JSON encoder for Monopoly.getData() snapshots
+
+    Everything that never changes during a game (slot names, types, indices, prices, siblings, player names and
+    ids) is encoded once when the encoder is created. encode() only formats the dynamic fields and splices them
+    between the pre-encoded fragments. The output parses to the same content as Monopoly.getData().
+    """
+    def __init__(self, game):
+        self.game = game
+        self.players = game.players
+        self.names = {p: dumps(p.getName()) for p in self.players}
+        self.slotNames = {}
+        self.slots = []
+        for slot in game.getBoard().getSlots():
+            name = dumps(slot.getName())
+            self.slotNames[slot] = name
+            head = name + ':{"name":' + name + ',"type":' + str(slot.getType()) + ',"index":' + str(slot.getIndex())
+            if slot.isType(SLOT_PROP):
+                siblings = slot.group.names if slot.group else ()
+                head += ',"price":' + str(slot.getPrice()) + ',"siblings":' + dumps(list(siblings))
+            self.slots.append((slot, head + ',"players":[', slot.isType(SLOT_PROP), slot.isType(SLOT_PROP_UTIL)))
+        self.playerHeads = {p: self.names[p] + ':{"name":' + self.names[p] + ',"id":' + dumps(str(p.getId()))
+                            for p in self.players}
+
+    def encode(self):
+        """
+        Encode the current state of the game
+        :return: A bytes object. The JSON encoding of Monopoly.getData()
+        """
+        names = self.names
+        out = ['{"slots":{']
+        for slot, head, isProp, isUtil in self.slots:
+            if slot.players:
+                out.append(head + ",".join([names[p] for p in slot.players]) + "]")
+            else:
+                out.append(head + "]")
+            if isProp:
+                owner = slot.owner
+                if isUtil:
+                    out.append(',"owner":%s,"multiplier":%d},' % (names[owner] if owner else "null",
+                                                                  slot.getMultiplier()))
+                else:
+                    out.append(',"owner":%s,"rent":%d},' % (names[owner] if owner else "null", slot.getRent()))
+            else:
+                out.append("},")
+        out[-1] = out[-1][:-1]
+        out.append('},"players":{')
+        slotNames = self.slotNames
+        for p in self.players:
+            out.append(self.playerHeads[p])
+            out.append(',"balance":%d,"netWorth":%d,"jailfree":%d,"inJail":%s,"bankrupt":%s,"slotName":%s,'
+                       '"ownedLookup":[%s]},' % (p.money, p.getNetWorth(), len(p.jailFreeCard), _bool(p.inJail),
+                                                 _bool(p.bankrupt), slotNames[p.curSlot],
+                                                 ",".join([slotNames[s] for s in p.getOwnedList()])))
+        out[-1] = out[-1][:-1]
+        out.append("}}")
+        return "".join(out).encode()
+
+
+if __name__ == "__main__":
+    import timeit
+    from handlers import silent
+    from lib.monopoly import Monopoly
+
+    game = Monopoly(["P1", "P2", "P3", "P4"], silent)
+    for _ in range(200):
+        game.turn()
+        game.check()
+        game.updateNextPlayer()
+    encoder = StateEncoder(game)
+    assert json.loads(encoder.encode()) == json.loads(json.dumps(game.getData()))
+    n = 2000
+    slow = timeit.timeit(lambda: json.dumps(game.getData()).encode(), number=n) / n
+    fast = timeit.timeit(encoder.encode, number=n) / n
+    print("getData + json.dumps:", round(slow * 1e6, 1), "us")
+    print("StateEncoder.encode:", round(fast * 1e6, 1), "us")
+    print("speedup:", round(slow / fast, 1), "x")
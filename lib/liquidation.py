@@ -0,0 +1,165 @@
+from common.flags import SLOT_PROP, SLOT_PROP_UTIL
+from data.price import BUILDING_PRICE, AVG_ROLL
+
+
+def _rentLoss(prop, weights):
+    """
+    Expected rent lost per landing if the property is mortgaged, once every house of its group is sold. The rent
+    of the houses is already counted by the sales, so a color property only loses its rent at stage 0
+    """
+    weight = weights.get(prop.getIndex(), 0) if weights else 1
+    if prop.isType(SLOT_PROP_UTIL):
+        return weight * AVG_ROLL * prop.getMultiplier()
+    if prop.getType() == SLOT_PROP:
+        return weight * prop.rents[0]
+    return weight * prop.getRent()
+
+
+def _groupOptions(group, weights):
+    """
+    The ways to raise cash from one group of properties worth considering
+
+    Houses are sold from the most developed property first (the even-building rule in reverse), picking the
+    cheapest loss among equally developed properties. Properties can only be mortgaged once every house in the
+    group is sold.
+
+    :param group: A List of unmortgaged PropertySlots owned by the same player
+    :param weights: A dict object mapping slot index to landing probability, or None
+    :return: A List of Tuples (cash, loss, actions)
+    """
+    # Railroads use their stage to count siblings owned, they have no houses to sell
+    stages = {prop: prop.getStage() if prop.getType() == SLOT_PROP else 0 for prop in group}
+    weight = (lambda p: weights.get(p.getIndex(), 0)) if weights else (lambda p: 1)
+    ret = [(0, 0, ())]
+    cash = 0
+    loss = 0
+    actions = []
+    while max(stages.values()) > 0:
+        high = max(stages.values())
+        prop = min((p for p in group if stages[p] == high),
+                   key=lambda p: weight(p) * (p.rents[high] - p.rents[high - 1]))
+        stages[prop] -= 1
+        cash += BUILDING_PRICE[prop.getBlock()] // 2
+        loss += weight(prop) * (prop.rents[high] - prop.rents[high - 1])
+        actions.append(("sell", prop.getName()))
+        ret.append((cash, loss, tuple(actions)))
+
+    # Mortgaging is a 0/1 knapsack over the group. Extending the Pareto front one property at a time gives the same
+    # front as trying every subset, without enumerating 2^n subsets on large groups
+    front = [(cash, loss, tuple(actions))]
+    for p in group:
+        price = p.getPrice() // 2
+        rentLoss = _rentLoss(p, weights)
+        front = _pareto(front + [(c + price, l + rentLoss, a + (("mortgage", p.getName()),)) for c, l, a in front])
+    return ret + [option for option in front if option[2] != tuple(actions)]
+
+
+def _pareto(options):
+    """
+    Drop every option that raises less cash than another option with no more loss
+
+    :param options: A List of Tuples (cash, loss, actions)
+    :return: A List of the remaining options, by decreasing cash
+    """
+    ret = []
+    lowest = None
+    for cash, loss, actions in sorted(options, key=lambda o: (-o[0], o[1])):
+        if lowest is None or loss < lowest:
+            lowest = loss
+            ret.append((cash, loss, actions))
+    return ret
+
+
+def planLiquidation(player, amount, weights=None):
+    """
+    Plan the house sales and mortgages that raise cash with the least loss of future rent
+
+    Each group of properties offers a bounded set of options (see _groupOptions), and a knapsack over the
+    cash raised, capped at the amount needed, keeps the smallest loss for every reachable amount.
+
+    :param player: A Player object. The player who needs cash
+    :param amount: An Integer. The cash to be raised
+    :param weights: A dict object mapping slot index to landing probability. Every property weighs 1 if omitted
+    :return: A dict object with the "actions" to take in order, the "cash" they raise and the rent "loss", or
+    None if the player cannot raise that much
+    """
+    groups = {}
+    for prop in player.getOwnedList():
+        if prop.isMortgage():
+            continue
+        if prop.isType(SLOT_PROP) and prop.getType() == SLOT_PROP:
+            key = prop.getGroup()
+        else:
+            key = prop
+        groups.setdefault(key, []).append(prop)
+
+    # best holds (cash raised capped at amount, loss, actions). Only the Pareto front is kept: raising more
+    # cash for no more loss makes an entry useless
+    best = [(0, 0, ())]
+    for group in groups.values():
+        options = _pareto(_groupOptions(sorted(group, key=lambda p: p.getIndex()), weights))
+        nextBest = {}
+        for raised, loss, actions in best:
+            for cash, optLoss, optActions in options:
+                key = min(amount, raised + cash)
+                if key not in nextBest or loss + optLoss < nextBest[key][1]:
+                    nextBest[key] = (key, loss + optLoss, actions + optActions)
+        best = _pareto(nextBest.values())
+
+    raised, loss, actions = best[0]
+    if raised < amount:
+        return None
+    cash = 0
+    for action, name in actions:
+        prop = player.getBoard()[name]
+        cash += BUILDING_PRICE[prop.getBlock()] // 2 if action == "sell" else prop.getPrice() // 2
+    return {"actions": list(actions), "cash": cash, "loss": loss}
+
+
+def applyLiquidation(player, plan):
+    """
+    Carry out a plan returned by planLiquidation. The Bank pays the player for every sale and mortgage.
+
+    :param player: A Player object. The player raising cash
+    :param plan: A dict object returned by planLiquidation
+    """
+    board = player.getBoard()
+    for action, name in plan["actions"]:
+        prop = board[name]
+        if action == "sell":
+            prop.decrStage()
+            player.adjustBalance(BUILDING_PRICE[prop.getBlock()] // 2)
+        else:
+            prop.setMortgage(True)
+            player.adjustBalance(prop.getPrice() // 2)
+
+
+def declareBankruptcy(player, creditor=None):
+    """
+    Declare the player bankrupt and hand the assets over to the creditor
+
+    Buildings are sold back to the Bank first. Properties and Get Out of Jail Free cards go to the creditor,
+    or back to the Bank (unowned and unmortgaged) if the creditor is the Bank. The cash is left for the caller
+    to collect.
+
+    :param player: A Player object. The bankrupt player
+    :param creditor: A Player object, or None if the debt is owed to the Bank
+    """
+    for prop in player.getOwned():
+        while prop.getStage() > 0:
+            prop.decrStage()
+            player.adjustBalance(BUILDING_PRICE[prop.getBlock()] // 2)
+    for prop in player.getOwnedList():
+        player.unown(prop)
+        if creditor:
+            creditor.own(prop)
+            prop.setOwner(creditor)
+        else:
+            prop.setOwner(None)
+            prop.setMortgage(False)
+    while player.hasJFC():
+        if creditor:
+            player.takeJFC().setOwner(creditor)
+        else:
+            player.popJFC()
+    player.setBankrupt(True)
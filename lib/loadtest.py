@@ -0,0 +1,188 @@
+import contextlib
+import os
+import threading
+import time
+
+import lib.monopoly as monopoly
+from lib.memory import measureGameMemory, GAME_MEMORY_BUDGET
+from lib.stats import LatencyHistogram
+
+# Commands each client sends in turn, as (command, args) pairs
+DEFAULT_SCRIPT = (("INPUT", (True,)), ("SITREP", ()))
+# Seconds the engines are watched without traffic before the test, to catch busy waits
+IDLE_WINDOW = 0.5
+# Share of a core an idle engine may use before it is reported as busy-waiting
+IDLE_CPU_SHARE = 0.05
+# Share of the target rate the clients must reach
+MIN_THROUGHPUT = 0.9
+# Context switches per command above which threads are reported as convoying on a lock
+MAX_SWITCHES = 10
+# Seconds to wait for an engine to stop
+JOIN_TIMEOUT = 2
+
+
+def threadStats(nativeId):
+    """
+    Read the CPU time and context switches of a thread of this process from /proc
+
+    :param nativeId: An Integer. The thread's native id, as in Thread.native_id
+    :return: A Tuple of the CPU seconds and the number of context switches, or None where /proc is unavailable
+    """
+    try:
+        with open("/proc/self/task/%d/stat" % nativeId) as f:
+            # Fields after the command name, which may contain spaces: utime and stime are the 12th and 13th
+            fields = f.read().rsplit(")", 1)[1].split()
+        switches = 0
+        with open("/proc/self/task/%d/status" % nativeId) as f:
+            for line in f:
+                if "ctxt_switches:" in line:
+                    switches += int(line.split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK"), switches
+
+
+def sampleThreads(threads):
+    """
+    :param threads: A List of started Thread objects
+    :return: A List of threadStats() Tuples, or None if any is unavailable
+    """
+    ret = [threadStats(thread.native_id) for thread in threads]
+    return None if None in ret else ret
+
+
+def runClient(index, shells, script, interval, start, end, histograms):
+    """
+    Send script to the engines from one client, one command every interval seconds from start to end
+
+    Commands are sent on a fixed schedule and their latency is measured from the time they were due, not from the
+    time they were sent, so that a stalled engine shows in the latency of every command it delayed instead of
+    slowing the clients down (coordinated omission).
+    """
+    k = 0
+    due = start
+    while due < end:
+        now = time.perf_counter()
+        if due > now:
+            time.sleep(due - now)
+        shell = shells[(index + k) % len(shells)]
+        cmd, args = script[k % len(script)]
+        shell(cmd, *args)
+        histograms[cmd].add((time.perf_counter() - due) * 1e6)
+        k += 1
+        due = start + k * interval
+
+
+def runLoadTest(engines=4, clients=4, rate=100, duration=5, script=DEFAULT_SCRIPT, pnames=("P1", "P2")):
+    """
+    Start engines with lib.monopoly.init() and drive them with scripted shell traffic from client threads
+
+    The engines are first watched for IDLE_WINDOW seconds without traffic, then every client sends its share of
+    rate commands per second, cycling through script and through the engines. What the engines print is discarded.
+
+    :param engines: An Integer. Number of engines
+    :param clients: An Integer. Number of client threads
+    :param rate: A Float. Target commands per second, over all clients
+    :param duration: A Float. Seconds of traffic
+    :param script: A Tuple of (command, args) pairs
+    :param pnames: An Array. Name of the players of every game
+    :return: A dict object. "commands": the count, p50, p99, p999 and max latency of each command in microseconds,
+    "throughput": commands per second, "cpuPerGame": the share of a core used per engine, "idleCpu" and
+    "switchesPerCommand": the same per engine thread where /proc is available, and "warnings": a List of Strings
+    describing what looks like a regression
+    """
+    histograms = [{cmd: LatencyHistogram() for cmd, _ in script} for _ in range(clients)]
+    warnings = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        shells = [monopoly.init(list(pnames)) for _ in range(engines)]
+        threads = [shell.__self__ for shell in shells]
+
+        # Idle engines must not use the CPU
+        before = sampleThreads(threads)
+        time.sleep(IDLE_WINDOW)
+        after = sampleThreads(threads)
+        idleCpu = [(a[0] - b[0]) / IDLE_WINDOW for a, b in zip(after, before)] if before and after else None
+
+        interval = clients / rate
+        start = time.perf_counter() + 0.01
+        end = start + duration
+        # Clients are staggered over an interval so that the commands are evenly spread
+        workers = [threading.Thread(target=runClient, daemon=True,
+                                    args=(i, shells, script, interval, start + i * interval / clients, end,
+                                          histograms[i]))
+                   for i in range(clients)]
+        before = sampleThreads(threads)
+        cpu = time.process_time()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+        after = sampleThreads(threads)
+
+        for shell in shells:
+            shell("QUIT")
+        for thread in threads:
+            thread.join(JOIN_TIMEOUT)
+
+    merged = {cmd: LatencyHistogram() for cmd, _ in script}
+    for client in histograms:
+        for cmd, histogram in client.items():
+            merged[cmd].merge(histogram)
+    count = sum(h.getCount() for h in merged.values())
+    switches = None
+    if before and after:
+        switches = [(a[1] - b[1]) / max(count, 1) for a, b in zip(after, before)]
+
+    if idleCpu and max(idleCpu) > IDLE_CPU_SHARE:
+        warnings.append("idle engines use up to %.0f%% of a core: busy wait" % (max(idleCpu) * 100))
+    if count / elapsed < MIN_THROUGHPUT * rate:
+        warnings.append("throughput is %.0f commands/s, against a target of %.0f" % (count / elapsed, rate))
+    if switches and max(switches) > MAX_SWITCHES:
+        warnings.append("engines switch context %.0f times per command: lock convoy" % max(switches))
+    if any(thread.is_alive() for thread in threads):
+        warnings.append("engines still running " + str(JOIN_TIMEOUT) + " s after QUIT")
+
+    return {
+        "commands": {cmd: {
+            "count": h.getCount(),
+            "p50": h.getQuantile(0.5),
+            "p99": h.getQuantile(0.99),
+            "p999": h.getQuantile(0.999),
+            "max": h.high
+        } for cmd, h in merged.items()},
+        "throughput": count / elapsed,
+        "cpuPerGame": cpu / elapsed / engines,
+        "idleCpu": idleCpu,
+        "switchesPerCommand": switches,
+        "warnings": warnings
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Load test of the Monopoly engine shell")
+    parser.add_argument("--engines", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=100, help="commands per second, over all clients")
+    parser.add_argument("--duration", type=float, default=5, help="seconds")
+    args = parser.parse_args()
+
+    memory = measureGameMemory()
+    print("memory: %.1f kB per game, budget %.1f kB" % (memory / 1024, GAME_MEMORY_BUDGET / 1024))
+    report = runLoadTest(args.engines, args.clients, args.rate, args.duration)
+    if memory > GAME_MEMORY_BUDGET:
+        report["warnings"].append("games take %.0f bytes each, over the budget of %d" % (memory, GAME_MEMORY_BUDGET))
+    for cmd, data in report["commands"].items():
+        print("%-7s %6d commands, latency p50 %8d us, p99 %8d us, p999 %8d us, max %8d us"
+              % (cmd, data["count"], data["p50"], data["p99"], data["p999"], data["max"]))
+    print("throughput %.1f commands/s, %.1f%% of a core per game" % (report["throughput"],
+                                                                    report["cpuPerGame"] * 100))
+    if report["idleCpu"]:
+        print("idle engines: " + ", ".join("%.0f%%" % (share * 100) for share in report["idleCpu"]) + " of a core")
+    for warning in report["warnings"]:
+        print("WARNING:", warning)
+    sys.exit(1 if report["warnings"] else 0)
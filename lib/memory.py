@@ -0,0 +1,53 @@
+import gc
+import tracemalloc
+
+from handlers import silent
+from lib.monopoly import Monopoly
+
+# Bytes a live game may take, as measured by measureGameMemory(): half of the 19.7 kB a 4-player game took before
+# its slots, decks, groups and dice were slimmed
+GAME_MEMORY_BUDGET = 9850
+
+
+def measureGameMemory(games=200, turns=50, pnames=("P1", "P2", "P3", "P4")):
+    """
+    Measure the memory a live game takes with tracemalloc
+
+    A first game is played to fill the caches every game shares, then games are created and played headless for
+    turns each. What is still allocated while they are alive is divided by their number.
+
+    :param games: An Integer. Number of games
+    :param turns: An Integer. Turns played in each game
+    :param pnames: An Array. Name of the players of every game
+    :return: A Float. Bytes per game
+    """
+    def play(seed):
+        game = Monopoly(list(pnames), silent, seed=seed)
+        for _ in range(turns):
+            if game.isOver():
+                break
+            game.turn()
+            game.check()
+            game.updateNextPlayer()
+        return game
+
+    play(-1)
+    gc.collect()
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        live = [play(seed) for seed in range(games)]
+        gc.collect()
+        ret = (tracemalloc.get_traced_memory()[0] - before) / len(live)
+    finally:
+        if started:
+            tracemalloc.stop()
+    return ret
+
+
+if __name__ == "__main__":
+    for turns in (0, 50, 1000):
+        memory = measureGameMemory(games=50, turns=turns)
+        print("after %4d turns: %6.0f B per game, budget %d B" % (turns, memory, GAME_MEMORY_BUDGET))
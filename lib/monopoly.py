@@ -1,31 +1,57 @@
-import random as rd
 import threading
 import inspect
+import time
 
 from lib.board import Board
 from lib.player import Player
+from lib.zobrist import Zobrist
+from lib.deadline import Decision, DECISION_TIMEOUT
+from lib.rng import getStream, BulkRandom, STREAM_DICE, STREAM_SEATS
+from lib.trace import EV_STATE, EV_LATENCY, SEAT_SHIFT, VALUE_SHIFT, LATENCY_SHIFT, DIE_BITS
 from common.errors import GameError
 from common.flags import *
-from lib.utils import pay, purchase, signal
+from lib.utils import pay, purchase
+from lib.trade import executeOffer
 from common.game_signals import *
-from data.slots import RAILROAD, UTILITY
-from config import SALARY, AUTH, BAIL
+from config import Rules
+from handlers import handlers as defaultHandlers
 
 BANK = None
 
 
 class Monopoly():
-    def __init__(self, pnames):
+    def __init__(self, pnames, handlers=None, rules=None, seed=None, layout=None):
         """
         :param pnames: An Array. Name of the players as Strings
-        """
-        self.board = Board()
-        self.players = tuple([Player(pn, self.board, self) for pn in pnames])
-        self.plookup = {p.getId(): p for p in self.players}
+        :param handlers: The signal handlers of this game. Defaults to the TUI handlers in handlers.py
+        :param rules: A Rules object. Default rules if None
+        :param seed: An Integer. If given, the dice, the card decks and the first player each come from their own
+        stream seeded by it (see lib/rng.py), so two games with the same seed get the same luck. The global random
+        stream is used if None
+        :param layout: The board layout, as taken by Board. The standard board if None
+        """
+        self.handlers = handlers if handlers else defaultHandlers
+        self.rules = rules if rules else Rules()
+        self.seed = seed
+        self.dice = BulkRandom(getStream(seed, STREAM_DICE, True))
+        self.board = Board(self.rules, seed, layout)
+        self.zobrist = Zobrist(len(self.board), len(pnames))
+        self.board.zobrist = self.zobrist
+        self.board.game = self
+        self.players = tuple([Player(pn, self.board, self, i) for i, pn in enumerate(pnames)])
         self.lastRoll = None
         self.p = None
         self.getFirstPlayer()
+        self.zobrist.reset(self)
         self.state = 0
+        # Optional statistics recorder with land(index) and rent(index, amount) methods. See lib/stats.py
+        self.recorder = None
+        # Number of each signal sent while fast-forwarding, by signal number. None when not fast-forwarding
+        self.fastForward = None
+        # The first decision signal sent while fast-forwarding, or None
+        self.firstDecision = None
+        # Optional FlightRecorder of the recent events, set with setTrace(). See lib/trace.py
+        self.trace = None
 
     def getFirstPlayer(self):
         """
@@ -33,7 +59,7 @@ class Monopoly():
 
         """
         if not self.p:
-            self.p = rd.randrange(0, len(self.players))
+            self.p = getStream(self.seed, STREAM_SEATS).randrange(0, len(self.players))
 
     def getCurPlayer(self):
         """
@@ -45,6 +71,22 @@ class Monopoly():
         """
         return self.players[self.p]
 
+    def getPlayer(self, seat):
+        """
+        Get player by seat method
+
+        :param seat: An Integer. Index of the player in the game's players
+        :return: A Player object
+        """
+        return self.players[seat]
+
+    @property
+    def plookup(self):
+        """
+        The players by id, built when asked for rather than kept by every game
+        """
+        return {p.getId(): p for p in self.players}
+
     def roll(self):
         """
         Dice roll method
@@ -53,12 +95,51 @@ class Monopoly():
 
         :return: A Tuple contains the sum of the dice and a subtuple containing the value of two dices
         """
-        d1 = rd.randint(1, 6)
-        d2 = rd.randint(1, 6)
+        d1, d2 = self.dice.roll()
         self.lastRoll = d1 + d2
-        signal(SIG_ROLL, (d1 + d2, (d1, d2)))
+        self.signal(SIG_ROLL, (d1 + d2, (d1, d2)), d1 << DIE_BITS | d2)
         return d1 + d2, (d1, d2)
 
+    def signal(self, signo, args=(), value=0):
+        """
+        Signal method
+
+        Send a signal to the current player's handlers, or to the game's handlers if the player has none. While
+        fast-forwarding, only decisions are sent and other signals are counted. Signals are recorded in the game's
+        trace, if any, with the time the handlers took to answer decisions if the trace is timed
+
+        :param signo: The signal number. Defined as macros in game_signals
+        :param args: Argument to be passed to handlers
+        :param value: An Integer. What the trace records of the arguments, see lib/trace.py
+        :return: The return value of the handler
+        """
+        trace = self.trace
+        if trace is not None and trace.on:
+            # FlightRecorder.add() inlined, as this runs for every signal
+            trace.push(signo | self.p << SEAT_SHIFT | value << VALUE_SHIFT)
+        counts = self.fastForward
+        if counts is not None:
+            counts[signo] = counts.get(signo, 0) + 1
+            if signo not in DECISION_SIGNALS:
+                return None
+            if self.firstDecision is None:
+                self.firstDecision = signo
+        handlers = self.players[self.p].handlers or self.handlers
+        if trace is None or not trace.timed or signo not in DECISION_SIGNALS:
+            return handlers(signo, args)
+        start = time.perf_counter_ns()
+        ret = handlers(signo, args)
+        trace.add(EV_LATENCY, self.p, (time.perf_counter_ns() - start) // 1000 << LATENCY_SHIFT | signo)
+        return ret
+
+    def setHandlers(self, handlers):
+        """
+        Set the signal handlers of this game
+
+        :param handlers: A function taking a signal number and a Tuple of arguments
+        """
+        self.handlers = handlers
+
     def getBoard(self):
         """
         Get board method
@@ -69,6 +150,24 @@ class Monopoly():
         """
         return self.board
 
+    def setTrace(self, trace):
+        """
+        Set the flight recorder of this game
+
+        :param trace: A FlightRecorder object, or None to stop tracing
+        """
+        self.trace = trace
+        self.board.trace = trace
+
+    def dumpTrace(self, out=None):
+        """
+        Write the recent events of this game, if it is traced
+
+        :param out: A file object. Defaults to sys.stderr
+        """
+        if self.trace is not None:
+            self.trace.write(out)
+
     def setState(self, new_state):
         """
         Set game state method
@@ -77,6 +176,8 @@ class Monopoly():
 
         :param new_state: An Integer. The new state value to be set as the game's state
         """
+        if self.trace is not None and self.trace.on:
+            self.trace.add(EV_STATE, self.p, self.state << 8 | new_state)
         self.state = new_state
 
     def isState(self, test):
@@ -114,15 +215,75 @@ class Monopoly():
             newIdx, oldIdx = board.moveTo(player, x)
         # Pay salary
         if newIdx < oldIdx:
-            pay(BANK, SALARY, player)
+            pay(BANK, self.rules.salary, player)
 
     def updateNextPlayer(self):
         """
         Player switching method
 
-        Update the next player on the list as the current player.
+        Update the next player on the list as the current player. Bankrupt players are skipped.
         """
+        if self.isOver():
+            return
+        old = self.p
         self.p = (self.p + 1) % self.getPlayerCount()
+        while self.getCurPlayer().isBankrupt():
+            self.p = (self.p + 1) % self.getPlayerCount()
+        self.zobrist.setCurrent(old, self.p)
+
+    def getHash(self):
+        """
+        Get hash method
+
+        Return the Zobrist hash of the game, e.g. to look the position up in a lib.zobrist.TranspositionTable
+
+        :return: An Integer. A 64-bit hash of the positions, owners, stages, mortgages, jail and bankruptcy flags,
+        balance buckets and current player
+        """
+        return self.zobrist.hash
+
+    def checkHash(self):
+        """
+        Check hash method
+
+        Check the incrementally updated hash against a full recompute. Raises a GameError if they differ
+
+        :return: True
+        """
+        return self.zobrist.check(self)
+
+    def isOver(self):
+        """
+        Check game over method
+
+        Return True if at most one player is not bankrupt
+
+        :return: A Boolean value
+        """
+        return sum(not p.isBankrupt() for p in self.players) <= 1
+
+    def getWinner(self):
+        """
+        Get winner method
+
+        Return the last player standing if the game is over
+
+        :return: A Player object, or None if the game is not over
+        """
+        if not self.isOver():
+            return None
+        return next((p for p in self.players if not p.isBankrupt()), None)
+
+    def getStandings(self):
+        """
+        Get standings method
+
+        Return the players ranked by net worth. Bankrupt players are ranked last.
+
+        :return: A List of Tuples containing the player's name and net worth
+        """
+        ranked = sorted(self.players, key=lambda p: (not p.isBankrupt(), p.getNetWorth()), reverse=True)
+        return [(p.getName(), p.getNetWorth()) for p in ranked]
 
     def sendToJail(self):
         """
@@ -131,7 +292,8 @@ class Monopoly():
         Send the current player to Jail, and set the status as "in jail".
         """
         player = self.getCurPlayer()
-        signal(SIG_GOTOJAIL, (player.hasJFC(),))
+        jailFree = player.hasJFC()
+        self.signal(SIG_GOTOJAIL, (jailFree,), 1 if jailFree else 0)
         self.board.moveTo(player, self.board.getJail())
         if not player.hasJFC():
             player.setInJail(True)
@@ -158,13 +320,9 @@ class Monopoly():
             intent, param = t
             if MOVE & intent:
                 if NEAREST_RAIL & intent or NEAREST_UTIL & intent:
-                    indices = [idx for _, idx in (RAILROAD if NEAREST_RAIL & intent else UTILITY)]
-                    indices.sort()
-                    curIdx = player.getSlot().getIndex()
-                    if curIdx > max(indices):
-                        self.move(indices[0], index=True)
-                    else:
-                        res = next(i for i in indices if i > curIdx)
+                    typeFlag = SLOT_PROP_RAIL if NEAREST_RAIL & intent else SLOT_PROP_UTIL
+                    res = board.getNextIndex(player.getSlot().getIndex(), typeFlag)
+                    if res is not None:
                         self.move(res, index=True)
                 elif BACK & intent:
                     self.move(-3)
@@ -191,6 +349,156 @@ class Monopoly():
                 else:
                     pay(player, param, BANK)
 
+    def turn(self, payBail=None):
+        """
+        Turn method
+
+        If a new turn begins, execute a dice roll and move the current player to the next slot.
+        If the current player is in Jail, either throw dice or pay bail. The player's choice is queried through
+        SIG_INJAIL unless given.
+
+        :param payBail: A Boolean value. True to pay the bail if the current player is in Jail
+        :return: An Integer. Return code. 0 if nothing illegal happened, 1 if otherwise
+        """
+        if self.trace is not None:
+            self.trace.beginTurn(self.p)
+        player = self.getCurPlayer()
+        if player.isInJail():
+            if payBail is None:
+                payBail = self.signal(SIG_INJAIL, (player.getJTL(), self.rules.bail), player.getJTL())
+            if payBail:
+                pay(player, self.rules.bail, BANK)
+                player.setInJail(False)
+                res, dice = self.roll()
+            else:
+                res, dices = self.roll()
+                d1, d2 = dices
+                if d1 == d2:
+                    player.setInJail(False)
+                    self.signal(SIG_OUTOFJAIL)
+                else:
+                    player.decrJTL()
+                    if player.getJTL():
+                        return 0
+                    else:
+                        pay(player, self.rules.bail, BANK)
+                        player.setInJail(False)
+        else:
+            res, dice = self.roll()
+        self.move(res)
+        return 0
+
+    def check(self, mult=1):
+        """
+        Check methods
+
+        If a move is completed, this method will examine the current slot
+        - If it's an unowned property slot, it will query the player for whether to buy that property
+        - If it's an owned property slot, it will charge the current player and deposit the rent to the owner
+        - If it's a card slot, it will draw and execute a card
+        - If it's a go to jail slot, it will send the player to jail and set the player's status as "in jail"
+        - If it's a charge slot (Income Tax and Luxury Tax) it will charge the current player the appropriate amount
+        - Otherwise, it will do nothing
+
+        :param mult: An integer. Multiplier for the rent if appropriate. Note: Will overwrite the utility's multiplier
+        :return: An Integer. Return code. 0 if successful, 1 if otherwise
+        """
+        player = self.getCurPlayer()
+        slot = player.getSlot()
+        if self.fastForward is None:
+            self.signal(SIG_LAND, (slot.getData(),), slot.index)
+        else:
+            # Fast-forwarding only counts SIG_LAND, so its data would be built for nobody
+            self.signal(SIG_LAND, (), slot.index)
+        if self.recorder:
+            self.recorder.land(slot.getIndex())
+        if slot.isType(SLOT_PROP):
+            if slot.isOwned() and not slot.isMortgage():
+                owner = slot.getOwner()
+                if slot.isType(SLOT_PROP_UTIL):
+                    rent = self.lastRoll * slot.getMultiplier() if not mult > 1 else self.lastRoll
+                else:
+                    rent = slot.getRent()
+                if owner != player:
+                    pay(player, rent * mult, owner)
+                    if self.recorder:
+                        self.recorder.rent(slot.getIndex(), rent * mult)
+            else:
+                if player.getBalance() >= slot.getPrice():
+                    if self.signal(SIG_BUY, (slot.getData(),), slot.index):
+                        purchase(player, slot)
+        elif slot.isType(SLOT_CARD):
+            card = slot.drawCard(player)
+            if self.trace is not None and self.trace.on and card:
+                self.trace.addCard(self.p, slot.deck.getPosition(card), card)
+            if card:
+                self.signal(SIG_CARD, (card.getDesc(),))
+                self.cardExec(card)
+            else:
+                self.signal(SIG_JAILFREE)
+        elif slot.isType(SLOT_CHARGE):
+            amount = slot.getAmount(player)
+            pay(player, amount, BANK)
+        elif slot.isType(SLOT_GOTOJAIL):
+            self.sendToJail()
+
+        return 0
+
+    def trade(self, offer):
+        """
+        Trade method
+
+        Execute a trade both players agreed to. Nothing changes if the offer is invalid, see lib/trade.py
+
+        :param offer: A TradeOffer object
+        :return: An Integer. Return code. 0 if successful, 1 if otherwise
+        """
+        try:
+            executeOffer(offer)
+        except GameError:
+            return 1
+        return 0
+
+    def advanceUntilDecision(self, maxTurns=None):
+        """
+        Fast-forward method
+
+        Play whole turns (turn(), check() and updateNextPlayer()) without dispatching signals, until a player has a
+        decision to make: one of DECISION_SIGNALS. Other signals are only counted. The decision itself goes to the
+        player's handlers, which answer it as usual, and the method returns once the turn it came up in is over. A
+        host can then send the summary and the new state in a single message instead of one per signal.
+
+        :param maxTurns: An Integer. Most turns to play, or None for no limit
+        :return: A dict object. "turns": the number of turns played, "signals": the number of each signal sent by
+        signal number, "decision": the signal number of the decision that stopped the advance or None,
+        "balances": the change of each player's balance by name, "bankrupt": the names of the players who went
+        bankrupt and "over": whether the game is over
+        """
+        balances = [p.getBalance() for p in self.players]
+        bankrupt = [p.isBankrupt() for p in self.players]
+        counts = {}
+        turns = 0
+        self.fastForward = counts
+        self.firstDecision = None
+        try:
+            while not self.isOver() and (maxTurns is None or turns < maxTurns):
+                self.turn()
+                self.check()
+                self.updateNextPlayer()
+                turns += 1
+                if self.firstDecision is not None:
+                    break
+        finally:
+            self.fastForward = None
+        return {
+            "turns": turns,
+            "signals": counts,
+            "decision": self.firstDecision,
+            "balances": {p.getName(): p.getBalance() - old for p, old in zip(self.players, balances)},
+            "bankrupt": [p.getName() for p, old in zip(self.players, bankrupt) if p.isBankrupt() and not old],
+            "over": self.isOver()
+        }
+
     def whoNext(self):
         """
         Get current player's name method
@@ -263,6 +571,31 @@ class Monopoly():
             ret["players"][p.getName()] = p.getData()
         return ret
 
+    def __reduce__(self):
+        """
+        Pickle method
+
+        Pickle the game as the arguments to build it again, with the board layout as Board.layoutId (None, the path
+        of a file layout, or the id of a prepared layout, which must be prepared again to unpickle in another process),
+        plus a compact record of its mutable state. Unpickling builds a new game from the arguments and restores the
+        record into it, so the object graph is never pickled. The handlers and the recorder are pickled as they are
+        """
+        return (Monopoly, (tuple(p.getName() for p in self.players), self.handlers, self.rules, self.seed,
+                           self.board.layoutId), self.__getstate__())
+
+    def __getstate__(self):
+        # Players are restored in the order they arrived on their slots, which keeps the order slots list them in
+        arrival = sorted(self.players, key=lambda p: list(p.getSlot().players).index(p))
+        return (self.p, self.lastRoll, self.state, self.dice, self.recorder, self.board.__getstate__(),
+                tuple(p.__getstate__() for p in self.players), bytes(p.seat for p in arrival))
+
+    def __setstate__(self, state):
+        self.p, self.lastRoll, self.state, self.dice, self.recorder, board, players, arrival = state
+        self.board.__setstate__(board)
+        for seat in arrival:
+            self.players[seat].__setstate__(players[seat])
+        self.zobrist.reset(self)
+
 
 # class MonopolyShell():
 #     def __init__(self, ready):
@@ -288,11 +621,14 @@ class Monopoly():
 #         pass
 
 class _MonopolyEngine(threading.Thread):
-    def __init__(self, game):
+    def __init__(self, game, timeout=DECISION_TIMEOUT):
         super().__init__()
         if not game:
             raise GameError("Engine requires a game")
         self.game = game
+        # Seconds the player has to answer a decision before its default action is taken, and the pending Decision
+        self.timeout = timeout
+        self.pending = None
 
         self.readInReady = threading.Event()
         self.writeInReady = threading.Event()
@@ -333,6 +669,8 @@ class _MonopolyEngine(threading.Thread):
 
         print("Pushing input...")
         self.inBuf.extend(args)
+        if self.pending and args:
+            self.pending.answer(args[0])
 
         self.writeInReady.set()
         self.readInReady.set()
@@ -370,6 +708,10 @@ class _MonopolyEngine(threading.Thread):
             self.pushIn(*args)
         elif cmd == "SITREP":
             return self.popOut(kwargs["timeout"] if "timeout" in kwargs else None)
+        elif cmd == "ADVANCE":
+            return self.advance(*args)
+        elif cmd == "TRADE":
+            return self.game.trade(*args)
         elif cmd == "QUIT":
             self.kill()
 
@@ -391,82 +733,53 @@ class _MonopolyEngine(threading.Thread):
         """
         Turn method
 
-        If a new turn begins, execute a dice roll and move the current player to the next slot.
-        If the current player is in Jail, query for player's choice of either throw dice or pay bail.
+        Query the player's choice of either throw dice or pay bail if the current player is in Jail, then play the
+        turn through Monopoly.turn(). The choice is the first input pushed with pushIn(), or rolling the dice if none
+        comes within the timeout. If the turn raises, the game's trace is dumped to stderr
 
         :param key: Not Implemented
         :return: An Integer. Return code. 0 if nothing illegal happened, 1 if otherwise
         """
+        payBail = None
         player = self.game.getCurPlayer()
         if player.isInJail():
-            userIn = self.popIn()
-            if type(userIn) == bool and userIn:
-                pay(player, BAIL, BANK)
-                player.setInJail(False)
-                res, dice = self.game.roll()
-            else:
-                res, dices = self.game.roll()
-                d1, d2 = dices
-                if d1 == d2:
-                    player.setInJail(False)
-                    signal(SIG_OUTOFJAIL)
-                else:
-                    player.decrJTL()
-                    if player.getJTL():
-                        return 0
-                    else:
-                        pay(player, BAIL, BANK)
-                        player.setInJail(False)
-        else:
-            res, dice = self.game.roll()
-        self.game.move(res)
-        return 0
+            self.pending = Decision(SIG_INJAIL, (player.getJTL(), self.game.rules.bail), self.timeout)
+            userIn = self.pending.wait()
+            self.pending = None
+            payBail = type(userIn) == bool and userIn
+        try:
+            return self.game.turn(payBail)
+        except Exception:
+            self.game.dumpTrace()
+            raise
 
     def check(self, mult=1):
         """
         Check methods
 
-        If a move is completed, this method will examine the current slot
-        - If it's an unowned property slot, it will query the player for whether to buy that property
-        - If it's an owned property slot, it will charge the current player and deposit the rent to the owner
-        - If it's a card slot, it will draw and execute a card
-        - If it's a go to jail slot, it will send the player to jail and set the player's status as "in jail"
-        - If it's a charge slot (Income Tax and Luxury Tax) it will charge the current player the appropriate amount
-        - Otherwise, it will do nothing
+        Examine the current slot through Monopoly.check(). If it raises, the game's trace is dumped to stderr
 
-        :param mult: An integer. Multiplier for the rent if appropriate. Note: Will overwrite the utility's multiplier
+        :param mult: An integer. Multiplier for the rent if appropriate
         :return: An Integer. Return code. 0 if successful, 1 if otherwise
         """
-        player = self.game.getCurPlayer()
-        slot = player.getSlot()
-        signal(SIG_LAND, (slot.getData(),))
-        if slot.isType(SLOT_PROP):
-            if slot.isOwned() and not slot.isMortgage():
-                owner = slot.getOwner()
-                if slot.isType(SLOT_PROP_UTIL):
-                    rent = self.game.lastRoll * slot.getMultiplier() if not mult > 1 else self.game.lastRoll
-                else:
-                    rent = slot.getRent()
-                if owner != player:
-                    pay(player, rent * mult, owner)
-            else:
-                if player.getBalance() >= slot.getPrice():
-                    if signal(SIG_BUY, (slot.getData(),)):
-                        purchase(player, slot)
-        elif slot.isType(SLOT_CARD):
-            card = slot.drawCard(player)
-            if card:
-                signal(SIG_CARD, (card.getDesc(),))
-                self.game.cardExec(card)
-            else:
-                signal(SIG_JAILFREE)
-        elif slot.isType(SLOT_CHARGE):
-            amount = slot.getAmount(player)
-            pay(player, amount, BANK)
-        elif slot.isType(SLOT_GOTOJAIL):
-            self.game.sendToJail()
+        try:
+            return self.game.check(mult)
+        except Exception:
+            self.game.dumpTrace()
+            raise
 
-        return 0
+    def advance(self, maxTurns=None):
+        """
+        Fast-forward method
+
+        Play the game up to the next decision with Monopoly.advanceUntilDecision() and push its summary out
+
+        :param maxTurns: An Integer. Most turns to play, or None for no limit
+        :return: A dict object. The summary of the turns played
+        """
+        summary = self.game.advanceUntilDecision(maxTurns)
+        self.pushOut(summary)
+        return summary
 
     def kill(self):
         self.ended = True
@@ -485,3 +798,103 @@ def init(pnames):
     e = _MonopolyEngine(Monopoly(pnames))
     e.start()
     return e.getShell()
+
+
+if __name__ == "__main__":
+    import copyreg
+    import io
+    import pickle
+    import time
+    from handlers import silent
+
+    def setState(obj, state):
+        if hasattr(obj, "__dict__"):
+            obj.__dict__.update(state)
+        else:
+            for key, val in state.items():
+                setattr(obj, key, val)
+
+    def defaultReduce(obj):
+        state = obj.__dict__ if hasattr(obj, "__dict__") else {
+            key: getattr(obj, key) for cls in type(obj).__mro__ for key in getattr(cls, "__slots__", ())}
+        return copyreg.__newobj__, (type(obj),), state, None, None, setState
+
+    class DefaultPickler(pickle.Pickler):
+        """
+        Pickles the whole object graph, as before the engine's classes had their own pickling
+        """
+        def reducer_override(self, obj):
+            if type(obj).__module__.startswith(("lib.", "config")) and not isinstance(obj, type):
+                return defaultReduce(obj)
+            return NotImplemented
+
+    def dumpDefault(obj):
+        buf = io.BytesIO()
+        DefaultPickler(buf, pickle.HIGHEST_PROTOCOL).dump(obj)
+        return buf.getvalue()
+
+    def play(game, turns):
+        for _ in range(turns):
+            if game.isOver():
+                break
+            game.turn()
+            game.check()
+            game.updateNextPlayer()
+
+    # Games at several stages, pickled both ways. A restored game must play on exactly like the original
+    n = 200
+    for turns in (0, 50, 200):
+        games = []
+        for seed in range(n):
+            game = Monopoly(["P1", "P2", "P3", "P4"], silent, seed=seed)
+            play(game, turns)
+            games.append(game)
+        report = []
+        for name, dump in (("default", dumpDefault), ("compact", lambda g: pickle.dumps(g, pickle.HIGHEST_PROTOCOL))):
+            # Best of three, the machine being shared
+            dumpTime = loadTime = float("inf")
+            for _ in range(3):
+                start = time.perf_counter()
+                payloads = [dump(game) for game in games]
+                dumpTime = min(dumpTime, (time.perf_counter() - start) / n)
+                start = time.perf_counter()
+                copies = [pickle.loads(payload) for payload in payloads]
+                loadTime = min(loadTime, (time.perf_counter() - start) / n)
+            report.append("%s %6d B, dump %7.1f us, load %7.1f us" % (name, sum(map(len, payloads)) // n,
+                                                                      dumpTime * 1e6, loadTime * 1e6))
+        for game, copy in zip(games, copies):
+            assert copy.getData() == game.getData() and copy.getHash() == game.getHash()
+            copy.checkHash()
+            for player in copy.players:
+                player.checkNetWorth()
+            play(game, 100)
+            play(copy, 100)
+            assert copy.getData() == game.getData()
+        print("after %3d turns: %s" % (turns, " | ".join(report)))
+
+    # Bot games played turn by turn, one engine round-trip per turn and a handler call per signal, against
+    # fast-forwarded to each decision
+    calls = [0]
+
+    def bot(signo, args=()):
+        calls[0] += 1
+        return silent(signo, args)
+
+    for mode in ("turn by turn", "fast-forward"):
+        trips = handled = 0
+        start = time.perf_counter()
+        for seed in range(n):
+            game = Monopoly(["P1", "P2", "P3", "P4"], bot, seed=seed)
+            calls[0] = turns = 0
+            while not game.isOver() and turns < 1000:
+                if mode == "turn by turn":
+                    game.turn()
+                    game.check()
+                    game.updateNextPlayer()
+                    turns += 1
+                else:
+                    turns += game.advanceUntilDecision(1000 - turns)["turns"]
+                trips += 1
+            handled += calls[0]
+        print("%s: %6.1f round-trips, %7.1f handler calls, %5.2f ms per game"
+              % (mode, trips / n, handled / n, (time.perf_counter() - start) / n * 1e3))
@@ -1,45 +1,66 @@
-from uuid import uuid1
+from uuid import uuid1, UUID
 
+from common.errors import GameError
 from common.flags import *
-from config import *
+
+# Position of the properties of each type in Player.properties
+PROP_KINDS = {flag: i for i, flag in enumerate(PROP_FLAGS)}
 
 class Player:
-    def __init__(self, name, board, game):
+    __slots__ = ("name", "seat", "rules", "money", "worth", "inJail", "bankrupt", "jailThrowLeft", "properties",
+                 "jailFreeCard", "curSlot", "board", "game", "handlers", "id")
+
+    def __init__(self, name, board, game, seat=0):
         self.name = name
-        self.money = 1500
+        # Index of the player in the game's players
+        self.seat = seat
+        self.rules = game.rules
+        self.money = self.rules.startingMoney
+        # Value of owned properties and buildings, kept up to date by own(), unown() and the properties
+        self.worth = 0
         self.inJail = False
+        self.bankrupt = False
         self.jailThrowLeft = 0
-        self.properties = {tf: [] for tf in PROP_FLAGS}
-        self.jailFreeCard = []
-        self.curSlot = board.slots[STARTING_SLOT]
+        # Owned properties in the order they were acquired, one Tuple per type in the order of PROP_FLAGS. A player
+        # owns a few properties and changes them rarely, and an empty Tuple takes no room
+        self.properties = [()] * len(PROP_FLAGS)
+        self.jailFreeCard = ()
+        self.curSlot = board.slots[self.rules.startingSlot]
         self.board = board
         self.game = game
-        self.handlers = lambda x, y: x
-        self.id = uuid1()
-        board[STARTING_SLOT].putPlayer(self)
+        # Signal handlers of this player. The game's handlers are used if None
+        self.handlers = None
+        # Drawn by getId() when first asked for, as headless games never need it
+        self.id = None
+        self.curSlot.putPlayer(self)
 
     # Monopoly properties methods
 
     def getOwned(self, typeFlag=None):
-        return self.properties[typeFlag] if typeFlag else self.properties[SLOT_PROP]
+        return self.properties[PROP_KINDS[typeFlag]] if typeFlag else self.properties[0]
 
     def getOwnedList(self):
         ret = []
-        for _, props in self.properties.items():
+        for props in self.properties:
             ret += props
         return ret
 
     def own(self, prop):
-        self.properties[prop.getType()].append(prop)
+        self.properties[PROP_KINDS[prop.getType()]] += (prop,)
+        self.worth += prop.getWorth()
 
     def unown(self, prop):
-        self.properties[prop.getType()].remove(prop)
+        props = self.properties
+        kind = PROP_KINDS[prop.getType()]
+        i = props[kind].index(prop)
+        props[kind] = props[kind][:i] + props[kind][i + 1:]
+        self.worth -= prop.getWorth()
 
     def isOwned(self, prop):
-        return prop in self.properties[prop.getTypeFlag()]
+        return prop in self.properties[PROP_KINDS[prop.getType()]]
 
     def getCount(self, typeFlag):
-        return len(self.properties[SLOT_PROP|typeFlag])
+        return len(self.properties[PROP_KINDS[SLOT_PROP|typeFlag]])
 
     # Jail methods
 
@@ -47,14 +68,24 @@ class Player:
         return self.inJail
 
     def setInJail(self, val):
+        if val != self.inJail:
+            self.board.zobrist.toggleJail(self.seat)
         self.inJail = val
 
     def pushJFC(self, card):
-        self.jailFreeCard.append(card)
+        self.jailFreeCard += (card,)
         return 0
 
+    def takeJFC(self):
+        """
+        Remove the last Get Out of Jail Free card the player got and return it
+        """
+        card = self.jailFreeCard[-1]
+        self.jailFreeCard = self.jailFreeCard[:-1]
+        return card
+
     def popJFC(self):
-        return self.jailFreeCard.pop().returnToDeck()
+        return self.takeJFC().returnToDeck()
 
     def hasJFC(self):
         return self.jailFreeCard and True
@@ -68,6 +99,33 @@ class Player:
     def decrJTL(self):
         self.jailThrowLeft -= 1
 
+    # Bankruptcy methods
+
+    def isBankrupt(self):
+        return self.bankrupt
+
+    def setBankrupt(self, val):
+        if val != self.bankrupt:
+            self.board.zobrist.toggleBankrupt(self.seat)
+        self.bankrupt = val
+
+    # Net worth methods
+
+    def getNetWorth(self):
+        return self.money + self.worth
+
+    def adjustWorth(self, amount):
+        self.worth += amount
+
+    def computeNetWorth(self):
+        return self.money + sum(prop.getWorth() for prop in self.getOwnedList())
+
+    def checkNetWorth(self):
+        expected = self.computeNetWorth()
+        if self.getNetWorth() != expected:
+            raise GameError(self.name + "'s net worth is " + str(self.getNetWorth()) + ", expected " + str(expected))
+        return True
+
     # Misc methods
 
     def getName(self):
@@ -80,15 +138,19 @@ class Player:
         return self.board
 
     def getId(self):
+        if self.id is None:
+            self.id = uuid1()
         return self.id
 
     def getData(self):
         ret = {
             "name": self.name,
-            "id": self.id,
+            "id": str(self.getId()),
             "balance": self.money,
+            "netWorth": self.getNetWorth(),
             "jailfree": len(self.jailFreeCard),
             "inJail": self.inJail,
+            "bankrupt": self.bankrupt,
             "slotName": self.curSlot.getName(),
             "ownedLookup": [s.getName() for s in self.getOwnedList()]
         }
@@ -96,6 +158,7 @@ class Player:
         return ret
 
     def adjustBalance(self, amount):
+        self.board.zobrist.setBalance(self.seat, self.money, self.money + amount)
         self.money += amount
 
     def getSlot(self):
@@ -110,11 +173,47 @@ class Player:
     def getGame(self):
         return self.game
 
+    def setHandlers(self, handlers):
+        self.handlers = handlers
+
+    # Pickling methods
+
+    def __reduce__(self):
+        # A player is pickled as a reference to its game, which carries the state of every player
+        return self.game.getPlayer, (self.seat,)
+
+    def __getstate__(self):
+        """
+        Return the mutable state of the player. Owned properties are listed by index in the order they were
+        acquired, which decides the order the player sells them off in
+        """
+        decks = (self.board.chance_deck, self.board.community_deck)
+        return (self.getId().bytes, self.money, self.inJail, self.bankrupt, self.jailThrowLeft, self.curSlot.getIndex(),
+                tuple(prop.getIndex() for prop in self.getOwnedList()),
+                bytes(decks.index(card.deck) for card in self.jailFreeCard), self.handlers)
+
+    def __setstate__(self, state):
+        """
+        Restore the state of a player who has just been created, on a board whose stages and mortgages are restored
+        """
+        (uid, self.money, self.inJail, self.bankrupt, self.jailThrowLeft, index, owned, jailFree,
+         self.handlers) = state
+        self.id = UUID(bytes=uid)
+        self.board.moveToIndex(self, index)
+        for index in owned:
+            prop = self.board.slots[index]
+            self.own(prop)
+            prop.setOwner(self)
+        decks = (self.board.chance_deck, self.board.community_deck)
+        for deck in jailFree:
+            decks[deck].jailFree.setOwner(self)
+
     def getBuildingCount(self):
         house = 0
         hotel = 0
+        buildingCount = self.rules.buildingCount
         for prop in self.getOwned():
-            hs, ht = BUILDING_COUNT[prop.getStage()]
+            hs, ht = buildingCount[prop.getStage()]
             house += hs
             hotel += ht
         return house, hotel
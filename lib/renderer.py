@@ -0,0 +1,312 @@
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+
+from common.flags import SLOT_PROP
+from common.game_signals import *
+from lib.deadline import getWheel
+
+# ANSI escape sequences
+CLEAR = "\x1b[2J\x1b[H"
+HIDE_CURSOR = "\x1b[?25l"
+SHOW_CURSOR = "\x1b[?25h"
+# Size of the tile of one game in a tiled view
+TILE_WIDTH = 44
+TILE_HEIGHT = 14
+# Events kept in the log of a game's tile
+LOG_LINES = 4
+# Unchanged cells between two changes that are rewritten rather than skipped with a cursor move, which costs about
+# as many bytes
+GAP = 6
+
+
+def moveTo(row, col):
+    """
+    Return the ANSI sequence moving the cursor to a row and column, both starting at 0
+    """
+    return "\x1b[%d;%dH" % (row + 1, col + 1)
+
+
+def diffRow(old, new):
+    """
+    Return the spans of new that differ from old, merging spans less than GAP cells apart
+
+    :param old: A String. The row on screen
+    :param new: A String of the same length. The row to draw
+    :return: A List of (column, text) Tuples
+    """
+    ret = []
+    start = None
+    end = 0
+    for i in range(len(new)):
+        if old[i] != new[i]:
+            if start is None:
+                start = i
+            elif i - end > GAP:
+                ret.append((start, new[start:end]))
+                start = i
+            end = i + 1
+    if start is not None:
+        ret.append((start, new[start:end]))
+    return ret
+
+
+class Screen:
+    """
+    Terminal screen that only rewrites the cells that changed since the last frame
+
+    Every frame is written with a single write() and flush(). The first frame clears the screen.
+    """
+    def __init__(self, out=None, width=None, height=None):
+        """
+        :param out: A text file to write to. Defaults to sys.stdout
+        :param width: An Integer. Columns of the screen. Defaults to the terminal's
+        :param height: An Integer. Rows of the screen. Defaults to the terminal's
+        """
+        self.out = out or sys.stdout
+        size = shutil.get_terminal_size()
+        self.width = width or size.columns
+        self.height = height or size.lines
+        self.rows = None
+        self.written = 0
+        self.frames = 0
+
+    def draw(self, lines):
+        """
+        Draw a frame
+        :param lines: A List of Strings. Lines longer than the screen are cut and missing lines are blank
+        """
+        lines = [line[:self.width].ljust(self.width) for line in lines[:self.height]]
+        lines += [" " * self.width] * (self.height - len(lines))
+        if self.rows is None:
+            buf = [CLEAR, HIDE_CURSOR] + [moveTo(r, 0) + line for r, line in enumerate(lines)]
+        else:
+            buf = []
+            for r, (old, new) in enumerate(zip(self.rows, lines)):
+                if old != new:
+                    for col, text in diffRow(old, new):
+                        buf.append(moveTo(r, col) + text)
+        self.rows = lines
+        if buf:
+            data = "".join(buf)
+            self.out.write(data)
+            self.out.flush()
+            self.written += len(data)
+        self.frames += 1
+
+    def invalidate(self):
+        """
+        Forget the last frame, so that the next one is drawn in full
+        """
+        self.rows = None
+
+    def close(self):
+        self.out.write(moveTo(self.height - 1, 0) + SHOW_CURSOR + "\n")
+        self.out.flush()
+
+
+def describe(game, signo, args):
+    """
+    Return a line describing a signal, or None for signals not worth logging
+    """
+    name = game.getCurPlayer().getName()
+    if signo == SIG_ROLL:
+        return name + " rolled " + str(args[0])
+    elif signo == SIG_LAND:
+        return name + " landed on " + args[0]["name"]
+    elif signo == SIG_BUY:
+        return name + " may buy " + args[0]["name"]
+    elif signo == SIG_PAY:
+        return str(args[0]) + " paid " + str(args[1]) + " to " + str(args[2])
+    elif signo == SIG_CARD:
+        return name + ": " + args[0]
+    elif signo == SIG_GOTOJAIL:
+        return name + " went to jail"
+    elif signo == SIG_OUTOFJAIL:
+        return name + " is out of jail"
+    elif signo == SIG_BANKRUPT:
+        return args[0] + " went bankrupt to " + args[1]
+    return None
+
+
+class GameView:
+    """
+    Tile showing one game: its players, who owns each slot and the last events of its signal stream
+    """
+    def __init__(self, game, title=None, width=TILE_WIDTH):
+        self.game = game
+        self.title = title or "Game"
+        self.width = width
+        self.signals = 0
+        self.log = deque(maxlen=LOG_LINES)
+
+    def onSignal(self, signo, args=()):
+        self.signals += 1
+        line = describe(self.game, signo, args)
+        if line:
+            self.log.append(line)
+
+    def getLines(self):
+        """
+        Render the tile
+        :return: A List of Strings, at most width long
+        """
+        game = self.game
+        ret = [(self.title + " | signals: " + str(self.signals)).ljust(self.width, "-")]
+        for seat, player in enumerate(game.players):
+            ret.append("%s%d %-8s $%-6d %-15s%s" % (">" if seat == game.p else " ", seat + 1, player.getName()[:8],
+                                                     player.getBalance(), player.getSlot().getName()[:15],
+                                                     " X" if player.isBankrupt() else " J" if player.isInJail()
+                                                     else ""))
+        # One cell per slot: the owner's seat, "." if unowned and " " if the slot can't be owned
+        owners = []
+        stages = []
+        for slot in game.getBoard().getSlots():
+            if slot.isType(SLOT_PROP):
+                owner = slot.getOwner()
+                owners.append(str(owner.seat + 1) if owner else ".")
+                stages.append(str(slot.getStage()) if slot.getStage() else ".")
+            else:
+                owners.append(" ")
+                stages.append(" ")
+        for cells in (owners, stages):
+            for i in range(0, len(cells), self.width):
+                ret.append("".join(cells[i:i + self.width]))
+        ret += list(self.log)
+        return [line[:self.width] for line in ret]
+
+
+class Renderer:
+    """
+    Tiled view of many games, redrawn at a capped frame rate
+
+    Wrap each game's signal handlers with wrap(): every signal updates the game's tile and the screen is redrawn if
+    the last frame is older than 1 / fps seconds. Otherwise a redraw is scheduled on the timer wheel for when the
+    interval is over, so that the last signals are drawn even if no other signal follows, e.g. while a game waits
+    for a player's decision. Only the cells that changed are written. Games may run in their own threads: frames
+    are drawn under a lock.
+    """
+    def __init__(self, fps=10, screen=None, tileWidth=TILE_WIDTH, tileHeight=TILE_HEIGHT, wheel=None):
+        """
+        :param fps: A Float. Maximum frames per second
+        :param screen: A Screen object. Defaults to a Screen on sys.stdout
+        :param wheel: A TimerWheel object scheduling the deferred redraws. Defaults to the process' wheel
+        """
+        self.interval = 1 / fps
+        self.screen = screen or Screen()
+        self.tileWidth = tileWidth
+        self.tileHeight = tileHeight
+        self.views = []
+        self.last = 0
+        self.wheel = wheel
+        # Timer of the deferred redraw, None if none is scheduled
+        self.pending = None
+        self.lock = threading.Lock()
+
+    def add(self, game, title=None):
+        """
+        Add a game to the view
+        :return: A GameView object
+        """
+        with self.lock:
+            view = GameView(game, title or "Game " + str(len(self.views) + 1), self.tileWidth - 1)
+            self.views.append(view)
+        return view
+
+    def wrap(self, handler, game, title=None):
+        """
+        Add a game and wrap its signal handler so that every signal goes through the view first
+        :param handler: A signal handler, such as handlers.silent
+        :param game: A Monopoly object
+        :return: A signal handler
+        """
+        view = self.add(game, title)
+
+        def wrapped(signo, args=()):
+            view.onSignal(signo, args)
+            self.update()
+            return handler(signo, args)
+        return wrapped
+
+    def getLines(self):
+        """
+        Lay the tiles out left to right, then top to bottom
+        """
+        columns = max(1, self.screen.width // self.tileWidth)
+        ret = []
+        for start in range(0, len(self.views), columns):
+            tiles = [view.getLines() for view in self.views[start:start + columns]]
+            for r in range(self.tileHeight):
+                ret.append(" ".join((tile[r] if r < len(tile) else "").ljust(self.tileWidth - 1) for tile in tiles))
+        return ret
+
+    def update(self, force=False):
+        """
+        Redraw the screen if the frame rate allows it, or schedule a redraw for when it does
+        :param force: A Boolean value. True to redraw whatever the frame rate
+        :return: A Boolean value. True if a frame was drawn
+        """
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.last < self.interval:
+                if self.pending is None:
+                    self.wheel = self.wheel or getWheel()
+                    self.pending = self.wheel.arm(self.last + self.interval - now, self.flush)
+                return False
+            if self.pending is not None:
+                self.wheel.cancel(self.pending)
+                self.pending = None
+            self.draw(now)
+            return True
+
+    def flush(self):
+        """
+        Draw the frame deferred by update(). Called by the timer wheel's thread
+        """
+        with self.lock:
+            if self.pending is not None:
+                self.pending = None
+                self.draw(time.monotonic())
+
+    def draw(self, now):
+        self.last = now
+        self.screen.draw(self.getLines())
+
+    def close(self):
+        self.update(force=True)
+        self.screen.close()
+
+
+if __name__ == "__main__":
+    import io
+    from handlers import silent
+    from lib.monopoly import Monopoly
+
+    def run(screen, fps, count=12, turns=300):
+        renderer = Renderer(fps, screen)
+        games = []
+        for i in range(count):
+            game = Monopoly(["P1", "P2", "P3", "P4"], silent, seed=i)
+            game.setHandlers(renderer.wrap(silent, game))
+            games.append(game)
+        start = time.time()
+        for _ in range(turns):
+            for game in games:
+                if not game.isOver():
+                    game.turn()
+                    game.check()
+                    game.updateNextPlayer()
+        renderer.close()
+        return time.time() - start, renderer
+
+    # Uncapped frame rate into a buffer, to compare the bytes written with a full redraw of every frame
+    elapsed, renderer = run(Screen(io.StringIO(), 180, 60), fps=1e9)
+    screen = renderer.screen
+    full = screen.frames * screen.width * screen.height
+    print(screen.frames, "frames:", screen.written, "bytes written, against", full, "for full redraws",
+          "(" + str(round(full / screen.written, 1)) + "x)")
+    if sys.stdout.isatty():
+        time.sleep(1)
+        run(Screen(), fps=30)
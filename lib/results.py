@@ -0,0 +1,294 @@
+import io
+import json
+import os
+
+import numpy as np
+
+# Rows added to every column each time the files grow
+CHUNK_ROWS = 1 << 20
+# Rows staged in memory by append() before they are copied to the columns in one go
+BATCH_ROWS = 4096
+# Layout of the per-game columns. Per-player columns have one value per seat
+COLUMNS = (
+    ("seed", np.uint64, False),
+    ("seats", np.int8, True),
+    ("winner", np.int8, False),
+    ("turns", np.int32, False),
+    ("balances", np.int32, True),
+    ("owned", np.int16, True),
+    ("rentPaid", np.int32, True),
+)
+META_FILE = "meta.json"
+
+
+def _colPath(path, name):
+    return os.path.join(path, name + ".npy")
+
+
+def _extendColumn(colPath, shape):
+    """
+    Resize a .npy file in place: rewrite the shape in its header and truncate the file to the new size. The rows
+    already written stay where they are, and the new ones read as zeros without being written
+
+    :param colPath: A String. Path of the .npy file
+    :param shape: A Tuple. The new shape
+    :return: A Boolean value. False if the file was left untouched because the new header doesn't fit in place of
+    the old one
+    """
+    fmt = np.lib.format
+    readers = {(1, 0): fmt.read_array_header_1_0, (2, 0): fmt.read_array_header_2_0}
+    writers = {(1, 0): fmt.write_array_header_1_0, (2, 0): fmt.write_array_header_2_0}
+    with open(colPath, "r+b") as f:
+        version = fmt.read_magic(f)
+        if version not in readers:
+            return False
+        _, fortran, dtype = readers[version](f)
+        offset = f.tell()
+        # numpy pads headers so that a longer shape fits, but files written by older versions may lack the room
+        header = io.BytesIO()
+        writers[version](header, {"descr": fmt.dtype_to_descr(dtype), "fortran_order": fortran, "shape": shape})
+        if header.tell() != offset:
+            return False
+        f.seek(0)
+        f.write(header.getvalue())
+        f.truncate(offset + dtype.itemsize * int(np.prod(shape)))
+    return True
+
+
+class ResultsWriter:
+    """
+    Append-only writer of per-game results
+
+    Each column is a memory-mapped .npy file in the results directory, preallocated and grown in place CHUNK_ROWS
+    rows at a time, so growing costs nothing for the rows already written. Single rows are staged and copied
+    BATCH_ROWS at a time, since writing a memory map element by element costs far more than the row itself. The
+    number of rows written is kept in meta.json and only committed by flush() or close().
+    """
+    def __init__(self, path, players, chunk=CHUNK_ROWS):
+        """
+        :param path: A String. The results directory. Existing results in it are appended to
+        :param players: An Integer. Number of seats per game
+        :param chunk: An Integer. Number of rows added when the columns grow
+        """
+        self.path = path
+        self.players = players
+        self.chunk = chunk
+        self.rows = 0
+        self.capacity = 0
+        self.cols = {}
+        self.pending = []
+        os.makedirs(path, exist_ok=True)
+        metaPath = os.path.join(path, META_FILE)
+        if os.path.exists(metaPath):
+            with open(metaPath) as f:
+                meta = json.load(f)
+            if meta["players"] != players:
+                raise ValueError("results in " + path + " have " + str(meta["players"]) + " players")
+            self.rows = meta["rows"]
+        self.grow(max(self.rows, 1))
+
+    def grow(self, rows):
+        """
+        Make sure the columns can hold at least rows rows
+        """
+        if rows <= self.capacity:
+            return
+        capacity = -(-rows // self.chunk) * self.chunk
+        self.cols = {}
+        for name, dtype, perPlayer in COLUMNS:
+            shape = (capacity, self.players) if perPlayer else (capacity,)
+            colPath = _colPath(self.path, name)
+            if not os.path.exists(colPath):
+                np.lib.format.open_memmap(colPath, mode="w+", dtype=dtype, shape=shape).flush()
+            elif not _extendColumn(colPath, shape):
+                old = np.load(colPath, mmap_mode="r")
+                oldRows = min(len(old), self.rows)
+                new = np.lib.format.open_memmap(colPath + ".tmp", mode="w+", dtype=dtype, shape=shape)
+                new[:oldRows] = old[:oldRows]
+                del old
+                new.flush()
+                del new
+                os.replace(colPath + ".tmp", colPath)
+            self.cols[name] = np.load(colPath, mmap_mode="r+")
+        self.capacity = capacity
+
+    def append(self, seed, seats, winner, turns, balances, owned, rentPaid):
+        """
+        Append the result of one game
+
+        :param seed: An Integer. The game's seed
+        :param seats: A Sequence of Integers. Player ids in turn order, the first player first
+        :param winner: An Integer. Seat of the winner, -1 if none
+        :param turns: An Integer. Number of turns played
+        :param balances: A Sequence of Integers. Final balance per seat
+        :param owned: A Sequence of Integers. Number of properties owned per seat
+        :param rentPaid: A Sequence of Integers. Rent paid per seat
+        """
+        self.pending.append((seed, seats, winner, turns, balances, owned, rentPaid))
+        if len(self.pending) >= BATCH_ROWS:
+            self.drain()
+
+    def drain(self):
+        """
+        Copy the staged rows to the columns
+        """
+        if self.pending:
+            rows = self.pending
+            self.pending = []
+            self.appendMany(*[np.array(col) for col in zip(*rows)])
+
+    def appendMany(self, seed, seats, winner, turns, balances, owned, rentPaid):
+        """
+        Append the results of many games at once. Takes the same arguments as append(), as Arrays with one row
+        per game. This is the fast path: the cost per game is a fraction of a single append().
+        """
+        n = len(seed)
+        i = self.rows
+        self.grow(i + n)
+        cols = self.cols
+        cols["seed"][i:i + n] = seed
+        cols["seats"][i:i + n] = seats
+        cols["winner"][i:i + n] = winner
+        cols["turns"][i:i + n] = turns
+        cols["balances"][i:i + n] = balances
+        cols["owned"][i:i + n] = owned
+        cols["rentPaid"][i:i + n] = rentPaid
+        self.rows = i + n
+
+    def appendGame(self, seed, game, turns, rentPaid, first):
+        """
+        Append a finished Monopoly game
+
+        :param seed: An Integer. The game's seed
+        :param game: A Monopoly object
+        :param turns: An Integer. Number of turns played
+        :param rentPaid: A Sequence of Integers. Rent paid per seat
+        :param first: An Integer. Seat of the player who played first
+        """
+        players = game.players
+        n = len(players)
+        winner = game.getWinner()
+        self.append(seed, tuple((first + i) % n for i in range(n)), players.index(winner) if winner else -1, turns,
+                    [p.getBalance() for p in players], [len(p.getOwnedList()) for p in players], rentPaid)
+
+    def newBatch(self, rows=BATCH_ROWS):
+        """
+        Return a ResultsBatch writing to this writer, to append many games faster than appendGame()
+        """
+        return ResultsBatch(self, rows)
+
+    def flush(self):
+        """
+        Write the columns to disk and commit the row count
+        """
+        self.drain()
+        for col in self.cols.values():
+            col.flush()
+        metaPath = os.path.join(self.path, META_FILE)
+        with open(metaPath + ".tmp", "w") as f:
+            json.dump({"players": self.players, "rows": self.rows}, f)
+        os.replace(metaPath + ".tmp", metaPath)
+
+    def close(self):
+        self.flush()
+        self.cols = {}
+        self.capacity = 0
+
+
+class ResultsBatch:
+    """
+    Stage of finished games for a ResultsWriter, written through appendMany() BATCH_ROWS games at a time
+
+    Each column is staged as a flat List, one value per game or per seat, which NumPy converts in one pass. This is
+    what simulate() writes through: it takes the place of the writer in playGame(), and costs less than
+    ResultsWriter.appendGame(), which stages every game as a row of nested sequences. Most of what is left is reading
+    the game itself.
+    """
+    def __init__(self, writer, rows=BATCH_ROWS):
+        """
+        :param writer: A ResultsWriter object
+        :param rows: An Integer. Number of games staged before they are written
+        """
+        self.writer = writer
+        self.rows = rows
+        self.count = 0
+        self.cols = {name: [] for name, _, _ in COLUMNS}
+        # Seats in turn order, by seat of the player who played first
+        players = writer.players
+        self.orders = [tuple((first + i) % players for i in range(players)) for first in range(players)]
+
+    def appendGame(self, seed, game, turns, rentPaid, first):
+        """
+        Stage a finished Monopoly game. Takes the same arguments as ResultsWriter.appendGame()
+        """
+        players = game.players
+        winner = game.getWinner()
+        cols = self.cols
+        cols["seed"].append(seed)
+        cols["seats"].extend(self.orders[first])
+        cols["winner"].append(players.index(winner) if winner else -1)
+        cols["turns"].append(turns)
+        cols["balances"].extend([p.getBalance() for p in players])
+        cols["owned"].extend([len(p.getOwnedList()) for p in players])
+        cols["rentPaid"].extend(rentPaid)
+        self.count += 1
+        if self.count >= self.rows:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the staged games to the writer. The writer still has to be flushed for them to be committed
+        """
+        if not self.count:
+            return
+        players = self.writer.players
+        arrays = []
+        for name, dtype, perPlayer in COLUMNS:
+            col = np.array(self.cols[name], dtype)
+            arrays.append(col.reshape(-1, players) if perPlayer else col)
+            self.cols[name] = []
+        self.count = 0
+        self.writer.appendMany(*arrays)
+
+
+class ResultsReader:
+    """
+    Read-only view of a results directory. Columns are memory-mapped, nothing is copied until filtered.
+    """
+    def __init__(self, path):
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        self.players = meta["players"]
+        self.rows = meta["rows"]
+        self.cols = {name: np.load(_colPath(path, name), mmap_mode="r")[:self.rows] for name, _, _ in COLUMNS}
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name):
+        return self.cols[name]
+
+    def getColumns(self):
+        return tuple(self.cols)
+
+    def where(self, **conds):
+        """
+        Return the rows matching every condition
+
+        A condition is either a value the column must equal or a function of the column returning a boolean mask,
+        e.g. reader.where(winner=0, turns=lambda t: t < 200). A per-player column matches if any seat matches.
+
+        :return: An Array of row indices
+        """
+        mask = np.ones(self.rows, dtype=bool)
+        for name, cond in conds.items():
+            col = self.cols[name]
+            match = cond(col) if callable(cond) else col == cond
+            mask &= match.any(axis=1) if match.ndim > 1 else match
+        return np.flatnonzero(mask)
+
+    def select(self, name, rows):
+        """
+        Return the values of a column at the given rows
+        """
+        return self.cols[name][rows]
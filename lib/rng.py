@@ -0,0 +1,178 @@
+import random as rd
+
+# Names of the random streams of a seeded game
+STREAM_DICE = "dice"
+STREAM_CHANCE = "chance"
+STREAM_COMMUNITY = "community"
+STREAM_SEATS = "seats"
+# Draws a stream makes parked, past which it is kept whole, as replaying it gets slow
+PARK_LIMIT = 64
+# Random bytes drawn at once by a BulkRandom. A block lasts about a hundred rolls and is the largest part of a
+# game's random state
+BLOCK_SIZE = 128
+# The roll of two dice for each byte value below 252. Bytes from 252 up are dropped
+DICE_PAIRS = tuple((b % 36 // 6 + 1, b % 6 + 1) for b in range(252))
+DICE_REJECT = bytes(range(252, 256))
+
+
+def getStream(seed, name, parked=False):
+    """
+    Return one of the random streams of a seeded game
+
+    Every stream is seeded from the game's seed and its name only, so the dice of game i are the same whatever the
+    players decide or how many cards they draw. Returns the random module itself if seed is None, so an unseeded
+    game shares the global stream as before.
+
+    :param seed: An Integer. The game's seed, or None
+    :param name: A String. The stream's name, e.g. STREAM_DICE
+    :param parked: A Boolean value. True to return the stream parked (see draw()), without building it
+    :return: A random.Random object, a Tuple if parked, or the random module
+    """
+    if seed is None:
+        return rd
+    if parked:
+        return name + ":" + str(seed), ()
+    return rd.Random(name + ":" + str(seed))
+
+
+def _shuffle(stream, x):
+    # Replaying a shuffle only needs the length of the list
+    stream.shuffle([None] * x if type(x) == int else x)
+
+
+def _randbytes(stream, n):
+    return stream.randbytes(n)
+
+
+def draw(rng, method, arg, size):
+    """
+    Make one draw from a random stream that may be parked
+
+    A parked stream is a Tuple of its key and the sizes of the draws made from it so far, about 100 bytes instead of
+    the 2.5 kB state of the Mersenne Twister. It is resumed by seeding a new stream from the key and making the
+    same draws again, through the same public methods of random.Random, so a parked stream and a live one always
+    give the same numbers, and nothing depends on how random.Random makes them. A stream must always be drawn from
+    with the same method. It is parked again after the draw, unless it made more than PARK_LIMIT draws.
+
+    :param rng: A random.Random object, the random module or a parked stream
+    :param method: A function of a random.Random object and arg making the draw, such as _shuffle or _randbytes.
+    It replays the draw when called with size instead of arg
+    :param arg: The argument of the draw
+    :param size: An Integer. What the draw is recorded as: the length of a list shuffled, or the number of bytes
+    drawn
+    :return: A Tuple of what method returned and the stream, parked again if it was parked
+    """
+    if type(rng) != tuple:
+        return method(rng, arg), rng
+    key, sizes = rng
+    stream = rd.Random(key)
+    for past in sizes:
+        method(stream, past)
+    ret = method(stream, arg)
+    if len(sizes) < PARK_LIMIT:
+        return ret, (key, sizes + (size,))
+    return ret, stream
+
+
+def shuffle(rng, x):
+    """
+    Shuffle a List in place with random.shuffle()
+
+    :param rng: A random.Random object, the random module or a parked stream (see draw())
+    :param x: A List
+    :return: rng, or the stream parked again
+    """
+    return draw(rng, _shuffle, x, len(x))[1]
+
+
+class BulkRandom:
+    """
+    Dice rolls drawn from a random stream in blocks
+
+    Random bytes are drawn BLOCK_SIZE at a time with randbytes() and handed out from a buffer, which refills itself
+    when empty. A byte below 252, the largest multiple of 36 that fits in a byte, maps to one of the 36 rolls of two
+    dice, and larger bytes are dropped, so every roll is equally likely. The output only depends on the stream, so
+    it is as reproducible as the stream's seed. The stream may be parked between blocks (see draw()).
+    """
+    def __init__(self, rng=rd, block=BLOCK_SIZE):
+        """
+        :param rng: A random.Random object, the random module or a parked stream. The stream the bytes are drawn
+        from
+        :param block: An Integer. Number of bytes drawn at once
+        """
+        self.rng = rng
+        self.block = block
+        # Buffered rolls as indices in DICE_PAIRS, and how many are left. They are handed out from the end
+        self.rolls = b""
+        self.left = 0
+
+    def roll(self):
+        """
+        Roll two dice
+        :return: A Tuple of two Integers between 1 and 6
+        """
+        left = self.left
+        while not left:
+            self.fill()
+            left = self.left
+        left -= 1
+        self.left = left
+        return DICE_PAIRS[self.rolls[left]]
+
+    def fill(self):
+        """
+        Draw a new block into the buffer
+        """
+        data, self.rng = draw(self.rng, _randbytes, self.block, self.block)
+        self.rolls = data.translate(None, DICE_REJECT)
+        self.left = len(self.rolls)
+
+    def __getstate__(self):
+        """
+        Return the state of the buffer. If its stream is parked, the buffered rolls are stored as their count since
+        they can be drawn again. Otherwise the stream is stored as it is, or as None for the random module which
+        can't be pickled, and the rolls one byte each as their index in DICE_PAIRS
+        """
+        rng = self.rng
+        if type(rng) == tuple:
+            return self.block, rng, self.left
+        return self.block, None if rng is rd else rng, self.rolls[:self.left]
+
+    def __setstate__(self, state):
+        self.block, rng, rolls = state
+        if type(rolls) == int:
+            self.rng = rng
+            self.rolls = b""
+            self.left = 0
+            if rolls:
+                # Draw the last block again
+                key, sizes = rng
+                self.rng = key, sizes[:-1]
+                self.fill()
+                self.left = rolls
+        else:
+            self.rng = rng or rd
+            self.rolls = rolls
+            self.left = len(rolls)
+
+
+if __name__ == "__main__":
+    import timeit
+
+    stream = rd.Random(0)
+    bulk = BulkRandom(rd.Random(0))
+    n = 1000000
+
+    def randintRoll():
+        return stream.randint(1, 6), stream.randint(1, 6)
+
+    for name, roll in (("randint", randintRoll), ("BulkRandom", bulk.roll)):
+        elapsed = min(timeit.repeat(roll, number=n, repeat=3))
+        print(name + ":", round(n / elapsed / 1e6, 2), "M rolls/s")
+
+    from handlers import silent
+    from lib.monopoly import Monopoly
+
+    game = Monopoly(["P1", "P2"], silent, seed=0)
+    elapsed = min(timeit.repeat(game.roll, number=n, repeat=3))
+    print("Monopoly.roll:", round(n / elapsed / 1e6, 2), "M rolls/s")
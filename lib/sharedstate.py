@@ -0,0 +1,281 @@
+import sys
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from common.flags import SLOT_PROP
+
+# Header of a block: sequence number, board size, seat count and current player
+HEADER_FIELDS = 4
+SEQ = 0
+BOARD_SIZE = 1
+SEATS = 2
+CURRENT = 3
+# Fields after the header, each an array of one value per seat or per slot. Slots that can't be owned always hold
+# -1 as owner and 0 as stage and mortgage
+FIELDS = (
+    ("positions", "i", False),
+    ("balances", "q", False),
+    ("jail", "b", False),
+    ("bankrupt", "b", False),
+    ("owners", "b", True),
+    ("stages", "b", True),
+    ("mortgages", "b", True),
+)
+# Attempts a reader makes before giving up on a block that is being written
+READ_RETRIES = 1000
+
+
+def getLayout(boardSize, seats):
+    """
+    Return the layout of a block
+    :return: A Tuple of the block size in bytes and a List of (name, format, offset, count) Tuples. Formats are
+    struct format characters, which NumPy also takes as dtypes
+    """
+    offset = HEADER_FIELDS * 8
+    ret = []
+    for name, fmt, perSlot in FIELDS:
+        count = boardSize if perSlot else seats
+        ret.append((name, fmt, offset, count))
+        # Keep every field 8 bytes aligned
+        offset += -(-count * np.dtype(fmt).itemsize // 8) * 8
+    return offset, ret
+
+
+def _views(buf, boardSize, seats):
+    return {name: np.ndarray((count,), fmt, buf, offset) for name, fmt, offset, count in
+            getLayout(boardSize, seats)[1]}
+
+
+def _attach(name):
+    """
+    Attach to an existing block without handing it to this process' resource tracker
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    # Before 3.13 attaching registers the block with the resource tracker, which then unlinks it when the reader
+    # exits, or unregisters the writer's own entry when the reader shares its tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedStateWriter:
+    """
+    Mirror of a game's mutable state in a shared memory block
+
+    publish() writes the state under a seqlock: the sequence number is odd while a write is in progress and is
+    incremented again once it is done. The writer never waits for readers.
+    """
+    def __init__(self, game, name=None):
+        """
+        :param game: A Monopoly object
+        :param name: A String. Name of the block, generated if None
+        """
+        self.game = game
+        self.players = game.players
+        self.props = [(slot.getIndex(), slot) for slot in game.getBoard().getSlots() if slot.isType(SLOT_PROP)]
+        boardSize = len(game.getBoard())
+        seats = len(self.players)
+        size, _ = getLayout(boardSize, seats)
+        self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        self.header = np.ndarray((HEADER_FIELDS,), np.int64, self.shm.buf)
+        self.header[:] = (0, boardSize, seats, 0)
+        self.views = _views(self.shm.buf, boardSize, seats)
+        self.views["owners"][:] = -1
+        self.publish()
+
+    def getName(self):
+        return self.shm.name
+
+    def publish(self):
+        """
+        Write the current state of the game
+        :return: An Integer. The sequence number of the state
+        """
+        header = self.header
+        views = self.views
+        players = self.players
+        header[SEQ] += 1
+        views["positions"][:] = [p.getSlotIdx() for p in players]
+        views["balances"][:] = [p.getBalance() for p in players]
+        views["jail"][:] = [p.isInJail() for p in players]
+        views["bankrupt"][:] = [p.isBankrupt() for p in players]
+        owners = views["owners"]
+        stages = views["stages"]
+        mortgages = views["mortgages"]
+        for index, slot in self.props:
+            owner = slot.owner
+            owners[index] = owner.seat if owner else -1
+            stages[index] = slot.stage
+            mortgages[index] = slot.mortgaged
+        header[CURRENT] = self.game.p
+        header[SEQ] += 1
+        return int(header[SEQ])
+
+    def wrap(self, handler):
+        """
+        Wrap a signal handler so that the state is published after every signal
+        """
+        def wrapped(signo, args=()):
+            ret = handler(signo, args)
+            self.publish()
+            return ret
+        return wrapped
+
+    def close(self):
+        """
+        Release the block. Readers that are still attached keep their mapping
+        """
+        self.views = None
+        self.header = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedStateReader:
+    """
+    Reader of a game's state from another process, without any copy through the engine or deserialization
+
+    The live fields are NumPy views on the shared block, which the writer may change at any time. snapshot() copies
+    the whole block into a private buffer with one memcpy and retries if a write was in progress, so the arrays it
+    returns are always consistent. The sequence number and single values are read through memoryviews, which return
+    Python ints faster than NumPy scalars.
+    """
+    def __init__(self, name):
+        """
+        :param name: A String. Name of the block, from SharedStateWriter.getName()
+        """
+        self.shm = _attach(name)
+        header = self.shm.buf[:HEADER_FIELDS * 8].cast("q")
+        self.boardSize = header[BOARD_SIZE]
+        self.seats = header[SEATS]
+        size, layout = getLayout(self.boardSize, self.seats)
+        self.header = header
+        self.block = self.shm.buf[:size]
+        self.fields = {name: self.shm.buf[offset:offset + count * np.dtype(fmt).itemsize].cast(fmt)
+                       for name, fmt, offset, count in layout}
+        self.live = _views(self.shm.buf, self.boardSize, self.seats)
+        self.buffer = bytearray(size)
+        self.local = memoryview(self.buffer)
+        self.snapHeader = self.local[:HEADER_FIELDS * 8].cast("q")
+        self.snap = _views(self.buffer, self.boardSize, self.seats)
+
+    def getSeq(self):
+        return self.header[SEQ]
+
+    def snapshot(self):
+        """
+        Copy a consistent state of the game
+        :return: A dict object of NumPy arrays with "seq" and "current" added, reused by the next call. None if
+        the writer kept writing for READ_RETRIES attempts
+        """
+        header = self.header
+        for _ in range(READ_RETRIES):
+            seq = header[SEQ]
+            if seq & 1:
+                continue
+            self.local[:] = self.block
+            if header[SEQ] == seq:
+                snap = self.snap
+                snap["seq"] = seq
+                snap["current"] = self.snapHeader[CURRENT]
+                return snap
+        return None
+
+    def read(self, field, index):
+        """
+        Read one value consistently
+        :param field: A String. Name of the field, e.g. "balances"
+        :param index: An Integer. The seat or slot index
+        :return: An Integer, or None if the writer kept writing for READ_RETRIES attempts
+        """
+        header = self.header
+        view = self.fields[field]
+        for _ in range(READ_RETRIES):
+            seq = header[SEQ]
+            if seq & 1:
+                continue
+            ret = view[index]
+            if header[SEQ] == seq:
+                return ret
+        return None
+
+    def close(self):
+        self.live = None
+        self.snap = None
+        for view in self.fields.values():
+            view.release()
+        self.snapHeader.release()
+        self.local.release()
+        self.header.release()
+        self.block.release()
+        self.shm.close()
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    import time
+    from handlers import silent
+    from lib.monopoly import Monopoly
+
+    def reader(name, ready, done, queue):
+        state = SharedStateReader(name)
+        ready.set()
+        # While the writer plays. A snapshot is None when the writer was preempted in the middle of a write
+        seen = set()
+        snapshots = 0
+        busy = 0
+        while not done.is_set():
+            snap = state.snapshot()
+            snapshots += 1
+            if snap is None:
+                busy += 1
+            else:
+                seen.add(snap["seq"])
+        # Once the writer is idle, time the reads alone
+        n = 200000
+        start = time.perf_counter()
+        for _ in range(n):
+            state.snapshot()
+        snapshot = (time.perf_counter() - start) / n
+        start = time.perf_counter()
+        for _ in range(n):
+            state.read("balances", 0)
+        read = (time.perf_counter() - start) / n
+        queue.put((snapshots, busy, len(seen), snapshot, read, state.snapshot()["balances"].tolist()))
+        state.close()
+
+    game = Monopoly(["P1", "P2", "P3", "P4"], silent, seed=0)
+    writer = SharedStateWriter(game)
+    ready = multiprocessing.Event()
+    done = multiprocessing.Event()
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=reader, args=(writer.getName(), ready, done, queue))
+    proc.start()
+    ready.wait()
+    turns = 0
+    start = time.perf_counter()
+    while not game.isOver() and turns < 20000:
+        game.turn()
+        game.check()
+        game.updateNextPlayer()
+        writer.publish()
+        turns += 1
+    elapsed = time.perf_counter() - start
+    done.set()
+    snapshots, busy, seen, snapshot, read, balances = queue.get()
+    proc.join()
+    assert balances == [p.getBalance() for p in game.players]
+    print("writer: %d turns at %.1f us per turn with publish; reader took %d snapshots of %d states meanwhile, "
+          "%d while a write was in progress" % (turns, elapsed / turns * 1e6, snapshots, seen, busy))
+    print("reader alone: snapshot %.3f us, single value %.3f us" % (snapshot * 1e6, read * 1e6))
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        writer.publish()
+    print("publish: %.2f us" % ((time.perf_counter() - start) / n * 1e6))
+    writer.close()
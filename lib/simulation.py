@@ -0,0 +1,118 @@
+import random as rd
+
+from handlers import silent
+from lib.build_planner import planBuild, applyBuildPlan
+from lib.monopoly import Monopoly
+from lib.stats import GameStats, bankruptcyCause
+
+# Turn limit of a headless game. Games still running at the limit end without a winner
+MAX_TURNS = 1000
+# Cash a headless player keeps when building
+BUILD_RESERVE = 200
+
+
+class GameRecorder:
+    """
+    Recorder of a single headless game. Forwards landings and rent to a GameStats and counts the rent paid by
+    each seat. The payer is always the current player. Must be created before the first turn, to note which seat
+    plays first.
+    """
+    def __init__(self, game, stats=None):
+        self.game = game
+        self.stats = stats
+        self.rentPaid = [0] * game.getPlayerCount()
+        # Seat of the player who played first, picked at random by the game
+        self.first = game.p
+        if stats:
+            stats.setBoardSize(len(game.getBoard()))
+
+    def land(self, index):
+        if self.stats:
+            self.stats.land(index)
+
+    def rent(self, index, amount):
+        self.rentPaid[self.game.p] += amount
+        if self.stats:
+            self.stats.rent(index, amount)
+
+
+def playGame(pnames, stats=None, maxTurns=MAX_TURNS, reserve=BUILD_RESERVE, results=None, seed=0, rules=None,
+             strategies=None, crn=False, layout=None):
+    """
+    Play a game without any user interaction
+
+    By default every player buys whatever it lands on and pays bail right away (handlers.silent). Players build
+    with planBuild() at the end of their turn, keeping reserve in cash.
+
+    :param pnames: An Array. Name of the players as Strings
+    :param stats: A GameStats object to record the game in, or None
+    :param maxTurns: An Integer. Number of turns after which the game ends without a winner
+    :param reserve: An Integer. Cash the players keep when building
+    :param results: A ResultsWriter or ResultsBatch to append the game to, or None
+    :param seed: An Integer. The game's seed, as recorded in results
+    :param rules: A Rules object. Default rules if None
+    :param strategies: A List of signal handlers, one per seat, or None
+    :param crn: A Boolean value. True to draw the dice, cards and first player from streams addressed by seed
+    (common random numbers), so that every game played with the same seed gets the same luck
+    :param layout: The board layout, as taken by Board. The standard board if None
+    :return: A Monopoly object. The finished game
+    """
+    game = Monopoly(pnames, silent, rules, seed if crn else None, layout)
+    if strategies:
+        for player, strategy in zip(game.players, strategies):
+            player.setHandlers(strategy)
+    recorder = GameRecorder(game, stats)
+    game.recorder = recorder
+    players = game.players
+    bankrupt = 0
+    turns = 0
+    while not game.isOver() and turns < maxTurns:
+        player = game.getCurPlayer()
+        game.turn()
+        game.check()
+        if not player.isBankrupt():
+            applyBuildPlan(player, planBuild(player, None, reserve))
+        if stats:
+            count = sum(p.isBankrupt() for p in players)
+            for _ in range(count - bankrupt):
+                stats.bankrupt(bankruptcyCause(player.getSlot()))
+            bankrupt = count
+        game.updateNextPlayer()
+        turns += 1
+
+    if stats:
+        winner = game.getWinner()
+        # Win rates are by position in the turn order, the first player being picked at random
+        stats.endGame(turns, (players.index(winner) - recorder.first) % len(players) if winner else None)
+    if results:
+        results.appendGame(seed, game, turns, recorder.rentPaid, recorder.first)
+    return game
+
+
+def simulate(n, pnames=("P1", "P2", "P3", "P4"), seed=None, stats=None, maxTurns=MAX_TURNS, results=None,
+             rules=None, layout=None):
+    """
+    Play n headless games and accumulate their statistics
+
+    :param n: An Integer. Number of games
+    :param pnames: An Array. Name of the players as Strings
+    :param seed: An Integer. Game i is seeded with seed + i. Games are not reseeded if None
+    :param stats: A GameStats object to add the games to. A new one is created if None
+    :param maxTurns: An Integer. Turn limit of each game
+    :param results: A ResultsWriter to append every game to, or None. Games are staged in a ResultsBatch and all
+    written before returning
+    :param rules: A Rules object. Default rules if None
+    :param layout: The board layout, as taken by Board. The standard board if None
+    :return: A GameStats object
+    """
+    if stats is None:
+        stats = GameStats(maxSeats=len(pnames), maxTurns=maxTurns)
+    batch = results.newBatch() if results else None
+    for i in range(n):
+        if seed is not None:
+            rd.seed(seed + i)
+        playGame(pnames, stats, maxTurns, results=batch, seed=seed + i if seed is not None else 0, rules=rules,
+                 layout=layout)
+    if batch:
+        batch.flush()
+    return stats
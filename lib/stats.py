@@ -0,0 +1,371 @@
+import math
+
+from common.flags import SLOT_PROP, SLOT_CHARGE, SLOT_CARD
+
+# Bankruptcy causes, by the slot the current player was on when it happened
+CAUSE_RENT = 0
+CAUSE_TAX = 1
+CAUSE_CARD = 2
+CAUSE_OTHER = 3
+CAUSE_COUNT = 4
+
+
+def bankruptcyCause(slot):
+    """
+    Return the bankruptcy cause for a player standing on slot
+    """
+    if slot.isType(SLOT_PROP):
+        return CAUSE_RENT
+    elif slot.isType(SLOT_CHARGE):
+        return CAUSE_TAX
+    elif slot.isType(SLOT_CARD):
+        return CAUSE_CARD
+    return CAUSE_OTHER
+
+
+class RunningStats:
+    """
+    Online count, mean, variance and range
+
+    Sums are kept instead of a running mean so that merging integer samples is exact and does not depend on the
+    merge order.
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.totalSq = 0
+        self.low = None
+        self.high = None
+
+    def add(self, x):
+        self.count += 1
+        self.total += x
+        self.totalSq += x * x
+        if self.low is None or x < self.low:
+            self.low = x
+        if self.high is None or x > self.high:
+            self.high = x
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.totalSq += other.totalSq
+        if other.count:
+            self.low = other.low if self.low is None else min(self.low, other.low)
+            self.high = other.high if self.high is None else max(self.high, other.high)
+
+    def getMean(self):
+        return self.total / self.count if self.count else 0
+
+    def getVariance(self):
+        """
+        Return the sample variance
+        """
+        if self.count < 2:
+            return 0
+        return (self.totalSq - self.total * self.total / self.count) / (self.count - 1)
+
+    def getState(self):
+        return [self.count, self.total, self.totalSq, self.low, self.high]
+
+    def setState(self, state):
+        self.count, self.total, self.totalSq, self.low, self.high = state
+
+    def getData(self):
+        return {
+            "count": self.count,
+            "mean": self.getMean(),
+            "variance": self.getVariance(),
+            "min": self.low,
+            "max": self.high
+        }
+
+
+class Histogram:
+    """
+    Histogram with fixed-width buckets. Values outside of [low, low + width * buckets) are counted in the
+    first or last bucket.
+    """
+    def __init__(self, low, width, buckets):
+        self.low = low
+        self.width = width
+        self.counts = [0] * buckets
+
+    def add(self, x):
+        i = (x - self.low) // self.width
+        if i < 0:
+            i = 0
+        elif i >= len(self.counts):
+            i = len(self.counts) - 1
+        self.counts[i] += 1
+
+    def merge(self, other):
+        if (self.low, self.width, len(self.counts)) != (other.low, other.width, len(other.counts)):
+            raise ValueError("cannot merge histograms with different buckets")
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+
+    def getState(self):
+        return list(self.counts)
+
+    def setState(self, state):
+        self.counts = list(state)
+
+    def getData(self):
+        return {
+            "low": self.low,
+            "width": self.width,
+            "counts": list(self.counts)
+        }
+
+
+class QuantileSketch:
+    """
+    Quantile sketch with a fixed relative error over non-negative values
+
+    Values are counted in logarithmic buckets, bucket i holding (gamma^(i-1), gamma^i]. The number of buckets is
+    fixed, so memory is constant and two sketches merge exactly by adding their counts. Values too large for the
+    last bucket are counted in it.
+    """
+    def __init__(self, accuracy=0.01, buckets=2048):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.logGamma = math.log(self.gamma)
+        self.zeros = 0
+        self.counts = [0] * buckets
+
+    def add(self, x):
+        if x <= 0:
+            self.zeros += 1
+            return
+        i = max(0, math.ceil(math.log(x) / self.logGamma))
+        self.counts[min(i, len(self.counts) - 1)] += 1
+
+    def merge(self, other):
+        if (self.gamma, len(self.counts)) != (other.gamma, len(other.counts)):
+            raise ValueError("cannot merge sketches with different accuracy")
+        self.zeros += other.zeros
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+
+    def getCount(self):
+        return self.zeros + sum(self.counts)
+
+    def getState(self):
+        return [self.zeros, list(self.counts)]
+
+    def setState(self, state):
+        self.zeros, counts = state
+        self.counts = list(counts)
+
+    def getQuantile(self, q):
+        """
+        Return an estimate of the q-quantile, within the sketch's relative accuracy
+        :param q: A Float between 0 and 1
+        """
+        rank = q * (self.getCount() - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if rank < seen:
+                return 2 * self.gamma ** i / (self.gamma + 1)
+        return 0
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of non-negative integers, such as latencies in microseconds
+
+    Values below 2 * SUB_BUCKETS are counted exactly. Above, every power of two is split into SUB_BUCKETS linear
+    buckets, so every value is counted within 1 / SUB_BUCKETS of itself whatever its magnitude. Finding the bucket
+    takes a bit_length() and a shift, which keeps add() cheap enough to call on every request. Buckets are added
+    as larger values come, and two histograms merge exactly by adding their counts.
+    """
+    SUB_BITS = 6
+    SUB_BUCKETS = 1 << SUB_BITS
+
+    def __init__(self):
+        self.counts = []
+        self.count = 0
+        self.high = 0
+
+    def add(self, x):
+        x = max(int(x), 0)
+        shift = max(x.bit_length() - self.SUB_BITS - 1, 0)
+        i = (shift << self.SUB_BITS) + (x >> shift)
+        if i >= len(self.counts):
+            self.counts += [0] * (i + 1 - len(self.counts))
+        self.counts[i] += 1
+        self.count += 1
+        if x > self.high:
+            self.high = x
+
+    def getValue(self, i):
+        """
+        Return the highest value counted in bucket i
+        """
+        shift = max((i >> self.SUB_BITS) - 1, 0)
+        return ((i - (shift << self.SUB_BITS) + 1) << shift) - 1
+
+    def merge(self, other):
+        if len(other.counts) > len(self.counts):
+            self.counts += [0] * (len(other.counts) - len(self.counts))
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.high = max(self.high, other.high)
+
+    def getCount(self):
+        return self.count
+
+    def getState(self):
+        return [self.count, self.high, list(self.counts)]
+
+    def setState(self, state):
+        self.count, self.high, counts = state
+        self.counts = list(counts)
+
+    def getQuantile(self, q):
+        """
+        Return the q-quantile, rounded up to the top of its bucket and never above the largest value
+        :param q: A Float between 0 and 1
+        """
+        if not self.count:
+            return 0
+        rank = max(math.ceil(q * self.count), 1)
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.getValue(i), self.high)
+        return self.high
+
+
+class GameStats:
+    """
+    Streaming accumulator for simulation results
+
+    Attach it to a game as Monopoly.recorder to count landings and rent, and report each finished game with
+    endGame(). Accumulators filled in different processes combine with merge().
+    """
+    def __init__(self, boardSize=None, maxSeats=8, maxTurns=1000):
+        """
+        :param boardSize: An Integer. Number of slots of the board. Set by setBoardSize() from the first game
+        recorded if None
+        :param maxSeats: An Integer. Number of players per game, at most
+        :param maxTurns: An Integer. Turn limit of the games
+        """
+        self.maxTurns = maxTurns
+        self.games = 0
+        self.draws = 0
+        self.landings = [0] * (boardSize or 0)
+        self.rents = [0] * (boardSize or 0)
+        self.wins = [0] * maxSeats
+        self.bankruptcies = [0] * CAUSE_COUNT
+        self.turns = RunningStats()
+        self.turnsHist = Histogram(0, max(1, maxTurns // 50), 51)
+        self.turnsSketch = QuantileSketch()
+
+    def setBoardSize(self, size):
+        """
+        Size the per-slot counts for a board of size slots, if not already. Games on boards of different sizes
+        can't be recorded together
+        """
+        if not self.landings:
+            self.landings = [0] * size
+            self.rents = [0] * size
+        elif len(self.landings) != size:
+            raise ValueError("cannot mix boards of %d and %d slots in the same stats" % (len(self.landings), size))
+
+    def land(self, index):
+        self.landings[index] += 1
+
+    def rent(self, index, amount):
+        self.rents[index] += amount
+
+    def bankrupt(self, cause):
+        self.bankruptcies[cause] += 1
+
+    def endGame(self, turns, winner=None):
+        """
+        Record a finished game
+        :param turns: An Integer. Number of turns played
+        :param winner: An Integer. Position of the winner in the turn order, 0 for the player who played first, or
+        None if the game ended without a winner
+        """
+        self.games += 1
+        if winner is None:
+            self.draws += 1
+        else:
+            self.wins[winner] += 1
+        self.turns.add(turns)
+        self.turnsHist.add(turns)
+        self.turnsSketch.add(turns)
+
+    def merge(self, other):
+        if len(self.wins) != len(other.wins):
+            raise ValueError("cannot merge stats of different seat count")
+        if other.landings:
+            self.setBoardSize(len(other.landings))
+        self.games += other.games
+        self.draws += other.draws
+        for mine, theirs in ((self.landings, other.landings), (self.rents, other.rents),
+                             (self.wins, other.wins), (self.bankruptcies, other.bankruptcies)):
+            for i, n in enumerate(theirs):
+                mine[i] += n
+        self.turns.merge(other.turns)
+        self.turnsHist.merge(other.turnsHist)
+        self.turnsSketch.merge(other.turnsSketch)
+
+    def getState(self):
+        """
+        Return the full state of the accumulator as JSON-ready data. loadStats() restores it exactly.
+        """
+        return {
+            "boardSize": len(self.landings),
+            "maxSeats": len(self.wins),
+            "maxTurns": self.maxTurns,
+            "games": self.games,
+            "draws": self.draws,
+            "landings": list(self.landings),
+            "rents": list(self.rents),
+            "wins": list(self.wins),
+            "bankruptcies": list(self.bankruptcies),
+            "turns": self.turns.getState(),
+            "turnsHist": self.turnsHist.getState(),
+            "turnsSketch": self.turnsSketch.getState()
+        }
+
+    def getWinRates(self):
+        return [w / self.games if self.games else 0 for w in self.wins]
+
+    def getData(self):
+        return {
+            "games": self.games,
+            "draws": self.draws,
+            "landings": list(self.landings),
+            "rents": list(self.rents),
+            "winRates": self.getWinRates(),
+            "bankruptcies": list(self.bankruptcies),
+            "turns": self.turns.getData(),
+            "turnsHistogram": self.turnsHist.getData(),
+            "turnsQuantiles": {q: self.turnsSketch.getQuantile(q) for q in (0.5, 0.9, 0.99)}
+        }
+
+
+def loadStats(state):
+    """
+    Rebuild a GameStats object from GameStats.getState()
+    """
+    ret = GameStats(state["boardSize"], state["maxSeats"], state["maxTurns"])
+    ret.games = state["games"]
+    ret.draws = state["draws"]
+    ret.landings = list(state["landings"])
+    ret.rents = list(state["rents"])
+    ret.wins = list(state["wins"])
+    ret.bankruptcies = list(state["bankruptcies"])
+    ret.turns.setState(state["turns"])
+    ret.turnsHist.setState(state["turnsHist"])
+    ret.turnsSketch.setState(state["turnsSketch"])
+    return ret
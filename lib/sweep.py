@@ -0,0 +1,138 @@
+import hashlib
+import itertools
+import json
+import os
+import random as rd
+
+from config import Rules, ENGINE_VERSION
+from lib.simulation import simulate, MAX_TURNS
+from lib.stats import GameStats, loadStats
+
+# Games simulated between two checkpoints of a sweep point
+CHECKPOINT_GAMES = 1000
+
+
+def expandGrid(grid):
+    """
+    Expand a grid of rule values into sweep points
+
+    :param grid: A dict object mapping rule names to Lists of values, e.g. {"salary": [150, 200], "bail": [50, 100]}
+    :return: A List of dict objects, one per combination
+    """
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def expandRandom(space, n, seed=0):
+    """
+    Draw random sweep points
+
+    :param space: A dict object mapping rule names to either a (low, high) Tuple of Integers, drawn uniformly with
+    both ends included, or a List of values to choose from
+    :param n: An Integer. Number of points
+    :param seed: Seed of the design, so the same call always returns the same points
+    :return: A List of dict objects
+    """
+    rng = rd.Random(seed)
+    ret = []
+    for _ in range(n):
+        point = {}
+        for name in sorted(space):
+            values = space[name]
+            point[name] = rng.randint(*values) if type(values) == tuple else rng.choice(values)
+        ret.append(point)
+    return ret
+
+
+class Sweep:
+    """
+    Parameter sweep over rules with a content-addressed result cache
+
+    Every point is played for the same number of games, game i being seeded with seed + i. Its results are stored in
+    the cache directory under a hash of the rules, the engine version and the seed scheme, so running a sweep again
+    only computes the points that are missing. Points are checkpointed every CHECKPOINT_GAMES games, and an
+    interrupted point resumes from its last checkpoint.
+    """
+    def __init__(self, cacheDir, games=10000, seed=0, pnames=("P1", "P2", "P3", "P4"), maxTurns=MAX_TURNS):
+        self.cacheDir = cacheDir
+        self.games = games
+        self.seed = seed
+        self.pnames = tuple(pnames)
+        self.maxTurns = maxTurns
+        os.makedirs(cacheDir, exist_ok=True)
+
+    def getKey(self, rules):
+        """
+        Return the cache key of a point
+        :param rules: A Rules object
+        :return: A String. Hex digest of the point's content
+        """
+        content = {
+            "engine": ENGINE_VERSION,
+            "rules": rules.getData(),
+            "seeds": {"scheme": "base+i", "base": self.seed, "games": self.games},
+            "players": self.pnames,
+            "maxTurns": self.maxTurns
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key, partial=False):
+        return os.path.join(self.cacheDir, key + (".partial.json" if partial else ".json"))
+
+    def _write(self, path, data):
+        with open(path + ".tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    def isCached(self, point):
+        return os.path.exists(self._path(self.getKey(Rules(**point))))
+
+    def runPoint(self, point):
+        """
+        Return the results of one point, simulating whatever is not cached yet
+
+        :param point: A dict object of rule overrides
+        :return: A GameStats object
+        """
+        rules = Rules(**point)
+        key = self.getKey(rules)
+        path = self._path(key)
+        if os.path.exists(path):
+            with open(path) as f:
+                return loadStats(json.load(f)["stats"])
+
+        partial = self._path(key, partial=True)
+        done = 0
+        stats = GameStats(maxSeats=len(self.pnames), maxTurns=self.maxTurns)
+        if os.path.exists(partial):
+            with open(partial) as f:
+                data = json.load(f)
+            done = data["done"]
+            stats = loadStats(data["stats"])
+
+        while done < self.games:
+            n = min(CHECKPOINT_GAMES, self.games - done)
+            simulate(n, self.pnames, self.seed + done, stats, self.maxTurns, rules=rules)
+            done += n
+            if done < self.games:
+                self._write(partial, {"point": point, "done": done, "stats": stats.getState()})
+
+        self._write(path, {"point": point, "stats": stats.getState()})
+        if os.path.exists(partial):
+            os.remove(partial)
+        return stats
+
+    def run(self, points):
+        """
+        Run every point of a sweep
+
+        :param points: A List of dict objects, e.g. from expandGrid() or expandRandom()
+        :return: A List of (point, GameStats) Tuples, in the order of points
+        """
+        return [(point, self.runPoint(point)) for point in points]
+
+    def getMissing(self, points):
+        """
+        Return the points that still have to be simulated
+        """
+        return [point for point in points if not self.isCached(point)]
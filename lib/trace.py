@@ -0,0 +1,229 @@
+import sys
+from collections import deque
+from time import perf_counter_ns
+
+import common.game_signals as game_signals
+from common.flags import STATE_BEGIN, STATE_CHECK, STATE_BUY, STATE_CARD, STATE_AUC
+from common.game_signals import SIG_ROLL, SIG_GOTOJAIL, SIG_INJAIL, SIG_LAND, SIG_BUY, SIG_CARD, SIG_PAY, SIG_AUC
+
+# Events recorded besides signals, whose kind is their signal number
+EV_TURN = 24
+EV_MOVE = 25
+EV_CARD = 26
+EV_STATE = 27
+EV_LATENCY = 28
+EV_CLOCK = 29
+# An event is one int: kind in the low KIND_BITS, then the seat in SEAT_BITS, then a value
+KIND_BITS = 5
+SEAT_BITS = 4
+SEAT_SHIFT = KIND_BITS
+VALUE_SHIFT = KIND_BITS + SEAT_BITS
+KIND_MASK = (1 << KIND_BITS) - 1
+SEAT_MASK = (1 << SEAT_BITS) - 1
+# Bits of the signal number in the value of a latency
+LATENCY_SHIFT = KIND_BITS
+# Bits of the destination in the value of a move, below its origin
+MOVE_BITS = 16
+# Bits of the second die in the value of a SIG_ROLL, below the first
+DIE_BITS = 3
+# Events kept per game
+DEFAULT_CAPACITY = 4096
+# Turns per recorded turn by default. Recording every turn costs about 20% of a headless turn, see FlightRecorder
+DEFAULT_EVERY = 50
+
+EVENT_NAMES = {value: key for key, value in vars(game_signals).items() if key.startswith("SIG_")}
+EVENT_NAMES.update({EV_TURN: "TURN", EV_MOVE: "MOVE", EV_CARD: "CARD", EV_STATE: "STATE", EV_LATENCY: "LATENCY"})
+# What the value of a signal is, for the signals that have one
+SIGNAL_VALUES = {SIG_GOTOJAIL: "jailFree", SIG_INJAIL: "jailTurnsLeft", SIG_LAND: "slot", SIG_BUY: "slot",
+                 SIG_PAY: "amount"}
+# The game state each event implies, for games whose host does not call Monopoly.setState()
+EVENT_STATES = {EV_TURN: STATE_BEGIN, SIG_LAND: STATE_CHECK, SIG_BUY: STATE_BUY, SIG_CARD: STATE_CARD,
+                SIG_AUC: STATE_AUC}
+
+
+class FlightRecorder:
+    """
+    Fixed-size ring buffer of the recent events of a game
+
+    Every event is one int packing its kind, the seat of the current player and a value: the index of the slot
+    landed on, the amount paid, the dice rolled and so on. Nothing else is kept, so recording an event allocates no
+    more than a small int and leaves the garbage collector nothing to track, except for cards, which already exist
+    and are kept by reference in a second deque. Both are bounded deques, which drop the oldest event as a new one
+    comes in. Signals, which make up most of the events, are appended inline by Monopoly.signal() rather than through
+    add(), to save a call.
+
+    Tracing is sampled by turn: one turn in every is recorded in full and the others not at all, so that the events
+    of a turn always come together. The sample is deterministic, so two runs of a seeded game trace the same turns.
+    The default records one turn in DEFAULT_EVERY, which costs about 2% (1 to 4% across runs) of the time of a
+    headless turn, mostly in
+    checking whether the turn is recorded. Recording every turn (every=1) costs about 20%: that is the interpreter
+    handling 5 to 6 more events per turn rather than the buffer, and no layout of the buffer removes it.
+    Timing is off by default, as reading the clock costs as much as recording the events it times.
+    """
+    __slots__ = ("capacity", "every", "timing", "codes", "cards", "push", "turns", "on", "timed", "origin")
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, every=DEFAULT_EVERY, timing=False):
+        """
+        :param capacity: An Integer. Number of events kept
+        :param every: An Integer. Record one turn in every, 1 to record them all
+        :param timing: A Boolean value. True to record when each turn started and how long the handlers took to
+        answer each decision
+        """
+        self.capacity = capacity
+        self.every = every
+        self.timing = timing
+        self.codes = deque(maxlen=capacity)
+        self.cards = deque(maxlen=capacity)
+        # Bound append method of the events, looked up once rather than for every event
+        self.push = self.codes.append
+        self.turns = 0
+        # Whether the current turn is recorded, and whether it is timed
+        self.on = True
+        self.timed = timing
+        # Clock reading the start of timed turns is measured from
+        self.origin = perf_counter_ns()
+
+    def add(self, kind, seat, value=0):
+        self.push(kind | seat << SEAT_SHIFT | value << VALUE_SHIFT)
+
+    def addCard(self, seat, position, card):
+        """
+        Record a card drawn
+        :param seat: An Integer. Seat of the player who drew it
+        :param position: An Integer. Position of the card in its deck
+        :param card: A Card object
+        """
+        self.push(EV_CARD | seat << SEAT_SHIFT | position << VALUE_SHIFT)
+        self.cards.append(card)
+
+    def beginTurn(self, seat):
+        """
+        Start a turn, and decide whether it is recorded
+        :param seat: An Integer. Seat of the player whose turn it is
+        """
+        turns = self.turns + 1
+        self.turns = turns
+        if turns % self.every:
+            self.on = self.timed = False
+            return
+        self.on = True
+        self.timed = self.timing
+        # add() inlined, with the turn number as value, then the time in microseconds if timed
+        self.push(EV_TURN | seat << SEAT_SHIFT | turns << VALUE_SHIFT)
+        if self.timing:
+            self.push(EV_CLOCK | (perf_counter_ns() - self.origin) // 1000 << VALUE_SHIFT)
+
+    def clear(self):
+        self.codes.clear()
+        self.cards.clear()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def dump(self):
+        """
+        Decode the events kept, oldest first
+        :return: A List of dict objects, with "turn": the turn number, "seat", "kind": the name of the event, "time":
+        the start of the turn in microseconds after the oldest turn kept, or None if not timed, "state": the game
+        state the event happened in, as a STATE_* flag or None if unknown, and "data": what the event carries as a
+        dict object, or None
+        """
+        codes = list(self.codes)
+        # The cards of the EV_CARD events kept are the newest ones: older cards may outlive their events
+        drawn = sum(1 for code in codes if code & KIND_MASK == EV_CARD)
+        cards = iter(list(self.cards)[len(self.cards) - drawn:])
+        ret = []
+        turn = None
+        start = None
+        origin = None
+        state = None
+        for code in codes:
+            kind = code & KIND_MASK
+            seat = code >> SEAT_SHIFT & SEAT_MASK
+            value = code >> VALUE_SHIFT
+            if kind == EV_CLOCK:
+                origin = value if origin is None else origin
+                start = value - origin
+                if ret and ret[-1]["kind"] == "TURN":
+                    ret[-1]["time"] = start
+                continue
+            if kind == EV_TURN:
+                turn = value
+                start = None
+                data = None
+            elif kind == EV_MOVE:
+                data = {"from": value >> MOVE_BITS, "to": value & (1 << MOVE_BITS) - 1}
+            elif kind == EV_CARD:
+                data = {"position": value, "card": next(cards).getDesc()}
+            elif kind == EV_STATE:
+                data = {"from": value >> 8, "to": value & 0xFF}
+                state = value & 0xFF
+            elif kind == EV_LATENCY:
+                data = {"signal": EVENT_NAMES.get(value & KIND_MASK), "us": value >> LATENCY_SHIFT}
+            elif kind == SIG_ROLL:
+                data = {"dice": (value >> DIE_BITS, value & (1 << DIE_BITS) - 1)}
+            elif kind in SIGNAL_VALUES:
+                data = {SIGNAL_VALUES[kind]: value}
+            else:
+                data = None
+            state = EVENT_STATES.get(kind, state)
+            ret.append({"turn": turn, "seat": seat, "kind": EVENT_NAMES.get(kind, kind), "time": start,
+                        "state": state, "data": data})
+        return ret
+
+    def write(self, out=None):
+        """
+        Write the events kept as text, one per line
+        :param out: A file object. Defaults to sys.stderr
+        """
+        out = out or sys.stderr
+        for event in self.dump():
+            data = "" if event["data"] is None else event["data"]
+            out.write("%10s us turn %s seat %d state %s %-12s %s\n" % (event["time"], event["turn"], event["seat"],
+                                                                      event["state"], event["kind"], data))
+        out.flush()
+
+
+if __name__ == "__main__":
+    import gc
+    import statistics
+    import time
+    from handlers import silent
+    from lib.monopoly import Monopoly
+
+    # Time headless turns without a recorder, then recording every turn, the default sample and every turn timed,
+    # interleaved over several repeats so that every configuration sees the same machine noise
+    configs = {"untraced": None, "every turn": (1, False), "default sample": (DEFAULT_EVERY, False),
+               "every turn timed": (1, True)}
+
+    def run(config, seeds=30, turns=300):
+        games = [Monopoly(["P1", "P2", "P3", "P4"], silent, seed=seed) for seed in range(seeds)]
+        for game in games:
+            if config:
+                game.setTrace(FlightRecorder(every=config[0], timing=config[1]))
+        gc.collect()
+        n = 0
+        start = time.perf_counter()
+        for game in games:
+            for _ in range(turns):
+                if game.isOver():
+                    break
+                game.turn()
+                game.check()
+                game.updateNextPlayer()
+                n += 1
+        return (time.perf_counter() - start) / n * 1e6, games
+
+    results = {name: [] for name in configs}
+    for _ in range(15):
+        for name, times in results.items():
+            times.append(run(configs[name])[0])
+    base = results["untraced"]
+    print("per turn untraced: %.2f us" % min(base))
+    for name, times in results.items():
+        if name != "untraced":
+            print("%s: %.2f us, overhead %.1f%% (min), %.1f%% (median)"
+                  % (name, min(times), (min(times) / min(base) - 1) * 100,
+                     (statistics.median(times) / statistics.median(base) - 1) * 100))
+    game = run((1, True), seeds=1, turns=3)[1][0]
+    game.trace.write(sys.stdout)
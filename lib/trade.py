@@ -0,0 +1,257 @@
+from common.errors import GameError
+from common.flags import SLOT_PROP, SLOT_PROP_RAIL
+from data.price import BUILDING_PRICE, AVG_ROLL
+from lib.utils import pay
+
+# Opponent turns over which a valuation counts the rent a property brings in
+DEFAULT_HORIZON = 30
+# Stage a complete color group is assumed to be built up to by its new owner
+MONOPOLY_STAGE = 3
+# Utility rent multipliers, with part and with all of the utilities owned
+UTIL_MULTIPLIERS = (4, 10)
+
+
+class TradeOffer:
+    """
+    An offer between two players. The proposer gives cash, properties and Get Out of Jail Free cards in exchange for
+    the partner's
+    """
+    __slots__ = ("proposer", "partner", "cash", "give", "take", "giveJailFree", "takeJailFree")
+
+    def __init__(self, proposer, partner, cash=0, give=(), take=(), giveJailFree=0, takeJailFree=0):
+        """
+        :param proposer: A Player object. The player making the offer
+        :param partner: A Player object. The player the offer is made to
+        :param cash: An Integer. Cash the proposer pays the partner, negative if the partner pays the proposer
+        :param give: A Tuple of the PropertySlots the proposer gives
+        :param take: A Tuple of the PropertySlots the partner gives
+        :param giveJailFree: An Integer. Number of Get Out of Jail Free cards the proposer gives
+        :param takeJailFree: An Integer. Number of Get Out of Jail Free cards the partner gives
+        """
+        self.proposer = proposer
+        self.partner = partner
+        self.cash = cash
+        self.give = give
+        self.take = take
+        self.giveJailFree = giveJailFree
+        self.takeJailFree = takeJailFree
+
+    def getData(self):
+        return {
+            "proposer": self.proposer.getName(),
+            "partner": self.partner.getName(),
+            "cash": self.cash,
+            "give": [prop.getName() for prop in self.give],
+            "take": [prop.getName() for prop in self.take],
+            "giveJailFree": self.giveJailFree,
+            "takeJailFree": self.takeJailFree
+        }
+
+
+def validateOffer(offer):
+    """
+    Check whether an offer can be executed
+
+    Both players must be in the same game and not bankrupt, have the cash and the Get Out of Jail Free cards they
+    give, and own the properties they give. A property can't be traded while its group has buildings. Only the
+    properties of the offer and their groups are looked at.
+
+    :param offer: A TradeOffer object
+    :return: A String describing why the offer is invalid, or None if it is valid
+    """
+    proposer = offer.proposer
+    partner = offer.partner
+    if proposer is partner or proposer.game is not partner.game:
+        return "the players can't trade with each other"
+    if proposer.bankrupt or partner.bankrupt:
+        return "bankrupt players can't trade"
+    cash = offer.cash
+    if cash > proposer.money or -cash > partner.money:
+        return "not enough cash"
+    if not 0 <= offer.giveJailFree <= len(proposer.jailFreeCard) or \
+            not 0 <= offer.takeJailFree <= len(partner.jailFreeCard):
+        return "not enough Get Out of Jail Free cards"
+    for props, owner in ((offer.give, proposer), (offer.take, partner)):
+        for prop in props:
+            if prop.owner is not owner:
+                return prop.getName() + " is not owned by " + owner.getName()
+            if prop.group is not None and prop.group.developed:
+                return prop.getName() + "'s group has buildings"
+        if len(props) > 1 and len(set(props)) != len(props):
+            return "a property is offered twice"
+    if not (cash or offer.give or offer.take or offer.giveJailFree or offer.takeJailFree):
+        return "the offer is empty"
+    return None
+
+
+def _transfer(prop, old_owner, new_owner):
+    old_owner.unown(prop)
+    new_owner.own(prop)
+    prop.setOwner(new_owner)
+
+
+def executeOffer(offer):
+    """
+    Execute an offer both players agreed to
+
+    The offer is validated first and nothing changes if it is invalid. Properties change hands as they are,
+    mortgaged or not, and railroads are restaged for both owners.
+
+    :param offer: A TradeOffer object
+    """
+    reason = validateOffer(offer)
+    if reason:
+        raise GameError("invalid trade: " + reason)
+    proposer = offer.proposer
+    partner = offer.partner
+    # Validation leaves nothing below that can fail: payments are covered, so no debt is settled midway
+    if offer.cash > 0:
+        pay(proposer, offer.cash, partner)
+    elif offer.cash < 0:
+        pay(partner, -offer.cash, proposer)
+    for prop in offer.give:
+        _transfer(prop, proposer, partner)
+    for prop in offer.take:
+        _transfer(prop, partner, proposer)
+    for _ in range(offer.giveJailFree):
+        proposer.takeJFC().setOwner(partner)
+    for _ in range(offer.takeJailFree):
+        partner.takeJFC().setOwner(proposer)
+
+
+class TradeValuator:
+    """
+    Scores offers for bots
+
+    The value of what a player holds is the sum of a value per property and a value per group. A property is worth
+    its worth to its owner (see PropertySlot.getWorth) plus its base rent expected over the horizon. A group adds a
+    value that only depends on how many of its properties the player holds: a complete color group adds the extra
+    rent of building it up to MONOPOLY_STAGE, net of the houses' price, and railroads and utilities add their
+    higher rent when several are held. Rents and group tables are computed once per board, so scoring an offer only
+    looks at the properties it trades and the groups they belong to.
+    """
+    def __init__(self, board, weights=None, horizon=DEFAULT_HORIZON, jailFreeValue=None):
+        """
+        :param board: A Board object
+        :param weights: A dict object mapping slot index to landing probability. Every slot is equally likely if
+        omitted
+        :param horizon: An Integer. Opponent turns over which rent is counted
+        :param jailFreeValue: An Integer. Value of a Get Out of Jail Free card. Defaults to the bail
+        """
+        size = len(board)
+
+        def expected(prop, rent):
+            return horizon * (weights.get(prop.getIndex(), 0) if weights else 1 / size) * rent
+
+        self.jailFreeValue = board.rules.bail if jailFreeValue is None else jailFreeValue
+        # Expected base rent of every property, by slot index, and extra value of a group by number of members held
+        self.rents = [0] * size
+        self.bonus = {}
+        groups = {}
+        for prop in board.props:
+            groups.setdefault(prop.getGroup(), []).append(prop)
+        for group, members in groups.items():
+            kind = members[0].getType()
+            n = len(members)
+            if kind == SLOT_PROP:
+                base = [prop.rents[0] for prop in members]
+                full = sum(expected(prop, prop.rents[MONOPOLY_STAGE] - prop.rents[0])
+                           - MONOPOLY_STAGE * BUILDING_PRICE[prop.getBlock()] for prop in members)
+                bonus = [0] * n + [full]
+            elif kind & SLOT_PROP_RAIL:
+                base = [prop.rents[0] for prop in members]
+                # Each of k railroads held collects the rent of stage k - 1
+                bonus = [sum(expected(prop, prop.rents[min(k, len(prop.rents)) - 1] - prop.rents[0])
+                             for prop in members) * k / n if k else 0 for k in range(n + 1)]
+            else:
+                low, high = UTIL_MULTIPLIERS
+                base = [AVG_ROLL * low] * n
+                bonus = [0] * n + [sum(expected(prop, AVG_ROLL * (high - low)) for prop in members)]
+            for prop, rent in zip(members, base):
+                self.rents[prop.getIndex()] = expected(prop, rent)
+            if group is not None:
+                self.bonus[group] = tuple(bonus)
+
+    def getValue(self, prop):
+        """
+        Return the value of a property alone, without its group's
+        """
+        return prop.getWorth() + self.rents[prop.index]
+
+    def evaluate(self, offer, player):
+        """
+        Score an offer for one of its players
+        :param offer: A TradeOffer object
+        :param player: A Player object. The proposer or the partner of the offer
+        :return: A Float. The change of the player's value if the offer is executed. The player gains from it if
+        positive
+        """
+        if player is offer.proposer:
+            received, given = offer.take, offer.give
+            ret = (offer.takeJailFree - offer.giveJailFree) * self.jailFreeValue - offer.cash
+        elif player is offer.partner:
+            received, given = offer.give, offer.take
+            ret = (offer.giveJailFree - offer.takeJailFree) * self.jailFreeValue + offer.cash
+        else:
+            raise GameError(player.getName() + " is not part of the offer")
+        rents = self.rents
+        # Change of the number of properties held in each group the offer touches
+        changes = {}
+        for prop in received:
+            ret += prop.getWorth() + rents[prop.index]
+            changes[prop.group] = changes.get(prop.group, 0) + 1
+        for prop in given:
+            ret -= prop.getWorth() + rents[prop.index]
+            changes[prop.group] = changes.get(prop.group, 0) - 1
+        bonus = self.bonus
+        for group, change in changes.items():
+            if change and group is not None:
+                held = group.count(player)
+                table = bonus[group]
+                ret += table[held + change] - table[held]
+        return ret
+
+
+if __name__ == "__main__":
+    import time
+    from handlers import silent
+    from lib.monopoly import Monopoly
+
+    # Deal the properties out, then score every one-for-one swap and every property-for-cash offer between two
+    # players, and execute the one the proposer likes best among those the partner accepts
+    game = Monopoly(["P1", "P2"], silent, seed=0)
+    p1, p2 = game.players
+    board = game.getBoard()
+    for i, prop in enumerate(board.props):
+        owner = (p1, p2)[i % 2]
+        owner.own(prop)
+        prop.setOwner(owner)
+    valuator = TradeValuator(board)
+    offers = [TradeOffer(p1, p2, 0, (mine,), (theirs,)) for mine in p1.getOwnedList() for theirs in p2.getOwnedList()]
+    offers += [TradeOffer(p1, p2, cash, (), (theirs,)) for theirs in p2.getOwnedList() for cash in (100, 200, 300)]
+
+    n = 20
+    start = time.perf_counter()
+    for _ in range(n):
+        for offer in offers:
+            validateOffer(offer)
+    validate = (time.perf_counter() - start) / n / len(offers)
+    start = time.perf_counter()
+    for _ in range(n):
+        for offer in offers:
+            valuator.evaluate(offer, p1)
+    evaluate = (time.perf_counter() - start) / n / len(offers)
+    print("%d offers: validate %.2f us, evaluate %.2f us per offer" % (len(offers), validate * 1e6, evaluate * 1e6))
+
+    accepted = [offer for offer in offers if valuator.evaluate(offer, p2) > 0]
+    best = max(accepted, key=lambda offer: valuator.evaluate(offer, p1))
+    print("best offer:", best.getData(), "worth %.0f to P1 and %.0f to P2"
+          % (valuator.evaluate(best, p1), valuator.evaluate(best, p2)))
+    balances = p1.getBalance() + p2.getBalance()
+    worth = p1.getNetWorth() + p2.getNetWorth()
+    executeOffer(best)
+    assert p1.getBalance() + p2.getBalance() == balances and p1.getNetWorth() + p2.getNetWorth() == worth
+    assert all(prop.getOwner() is p1 for prop in best.take) and all(prop.getOwner() is p2 for prop in best.give)
+    p1.checkNetWorth()
+    p2.checkNetWorth()
+    game.checkHash()
@@ -1,24 +1,40 @@
-from data.price import BUILDING_STAGE_VALUE
 from common.flags import *
 from common.game_signals import *
-from handlers import handlers
+from lib.liquidation import planLiquidation, applyLiquidation, declareBankruptcy
 
 def incomeTax(player):
-    total = player.getBalance()
-    for prop in player.getOwned():
-        total += prop.getPrice() if not prop.isMortgage() else (prop.getPrice() // 2)
-        if not (prop.isType(SLOT_PROP_RAIL) and prop.isType(SLOT_PROP_UTIL)):
-            total += BUILDING_STAGE_VALUE[prop.getBlock()][prop.getStage()]
-    return min(200, round(total / 10))
+    rules = player.rules
+    return min(rules.incomeTaxCap, round(player.getNetWorth() * rules.incomeTaxRate / 100))
+
+def settleDebt(player, amount, creditor):
+    """
+    Raise the cash a player is short of, or declare the player bankrupt if it can't be raised
+
+    :param player: A Player object. The player who owes the amount
+    :param amount: An Integer. The amount owed
+    :param creditor: A Player object, or None if the amount is owed to the Bank
+    :return: An Integer. The amount the player is able to pay
+    """
+    if player.isBankrupt():
+        return 0
+    plan = planLiquidation(player, amount - player.getBalance())
+    if plan:
+        applyLiquidation(player, plan)
+        return amount
+    declareBankruptcy(player, creditor)
+    signal(player.getGame(), SIG_BANKRUPT, (player.getName(), creditor.getName() if creditor else "Bank"))
+    return player.getBalance()
 
 def pay(p1, amount, p2):
+    if p1 and p1.getBalance() < amount:
+        amount = settleDebt(p1, amount, p2)
     if p1:
         p1.adjustBalance(-amount)
     if p2:
         p2.adjustBalance(amount)
-    signal(SIG_PAY, (p1.getName() if p1 else "Bank",
+    signal((p1 or p2).getGame(), SIG_PAY, (p1.getName() if p1 else "Bank",
                      amount,
-                     p2.getName() if p2 else "Bank"))
+                     p2.getName() if p2 else "Bank"), amount)
 
 def purchase(player, property):
     if not property.isOwned():
@@ -26,5 +42,5 @@ def purchase(player, property):
         player.own(property)
         property.setOwner(player)
 
-def signal(signo, args=()):
-    return handlers(signo, args)
+def signal(game, signo, args=(), value=0):
+    return game.signal(signo, args, value)
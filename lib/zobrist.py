@@ -0,0 +1,235 @@
+import random as rd
+from collections import OrderedDict
+from functools import lru_cache
+
+from common.errors import GameError
+from common.flags import SLOT_PROP
+
+# Seed of the Zobrist keys. Fixed so that hashes are comparable across processes
+ZOBRIST_SEED = 0x5A0B
+# Highest development stage a key is drawn for
+MAX_STAGE = 5
+# Balances are hashed by bucket: bucket i holds [i * BALANCE_BUCKET, (i + 1) * BALANCE_BUCKET). The last bucket
+# holds every larger balance and negative balances are counted in the first one
+BALANCE_BUCKET = 100
+BALANCE_BUCKETS = 64
+
+# Replacement policies of a TranspositionTable
+POLICY_LRU = 0
+POLICY_DEPTH = 1
+
+
+def balanceBucket(money):
+    return min(max(money, 0) // BALANCE_BUCKET, BALANCE_BUCKETS - 1)
+
+
+@lru_cache(maxsize=None)
+def _keys(boardSize, seats, seed):
+    """
+    Draw the keys of every feature once per board size and seat count. They are shared by all games
+    """
+    rng = rd.Random(seed)
+
+    def keys(n):
+        return [rng.getrandbits(64) for _ in range(n)]
+
+    return ([keys(boardSize) for _ in range(seats)], [keys(seats + 1) for _ in range(boardSize)],
+            [keys(MAX_STAGE + 1) for _ in range(boardSize)], keys(boardSize), keys(seats), keys(seats),
+            [keys(BALANCE_BUCKETS) for _ in range(seats)], keys(seats))
+
+
+class Zobrist:
+    """
+    Incremental 64-bit Zobrist hash of a game
+
+    Every feature of the state has a random 64-bit key, and the hash is the XOR of the keys of the features that
+    hold: where each player stands, who owns each property (0 being the Bank), its stage and mortgage, the jail and
+    bankruptcy flags and balance bucket of each player, and whose turn it is. Undoing a change XORs the same key
+    again, so the board, the properties and the players keep the hash up to date with a couple of XORs per change.
+    Card decks and Get Out of Jail Free cards are not part of the hash.
+    """
+    def __init__(self, boardSize, seats, seed=ZOBRIST_SEED):
+        """
+        :param boardSize: An Integer. Number of slots on the board
+        :param seats: An Integer. Number of players
+        :param seed: Seed of the keys
+        """
+        (self.position, self.owner, self.stage, self.mortgage, self.jail, self.bankrupt, self.balance,
+         self.current) = _keys(boardSize, seats, seed)
+        self.hash = 0
+
+    def move(self, seat, old, new):
+        keys = self.position[seat]
+        self.hash ^= keys[old] ^ keys[new]
+
+    def setOwner(self, index, old, new):
+        """
+        :param old: A Player object, or None for the Bank
+        :param new: A Player object, or None for the Bank
+        """
+        keys = self.owner[index]
+        self.hash ^= keys[old.seat + 1 if old else 0] ^ keys[new.seat + 1 if new else 0]
+
+    def setStage(self, index, old, new):
+        keys = self.stage[index]
+        self.hash ^= keys[old] ^ keys[new]
+
+    def toggleMortgage(self, index):
+        self.hash ^= self.mortgage[index]
+
+    def toggleJail(self, seat):
+        self.hash ^= self.jail[seat]
+
+    def toggleBankrupt(self, seat):
+        self.hash ^= self.bankrupt[seat]
+
+    def setBalance(self, seat, old, new):
+        old //= BALANCE_BUCKET
+        new //= BALANCE_BUCKET
+        if old != new:
+            keys = self.balance[seat]
+            self.hash ^= keys[min(max(old, 0), BALANCE_BUCKETS - 1)] ^ keys[min(max(new, 0), BALANCE_BUCKETS - 1)]
+
+    def setCurrent(self, old, new):
+        self.hash ^= self.current[old] ^ self.current[new]
+
+    def compute(self, game):
+        """
+        Compute the hash of a game from scratch
+        :param game: A Monopoly object
+        :return: An Integer
+        """
+        ret = self.current[game.p]
+        for player in game.players:
+            seat = player.seat
+            ret ^= self.position[seat][player.getSlotIdx()]
+            ret ^= self.balance[seat][balanceBucket(player.getBalance())]
+            if player.isInJail():
+                ret ^= self.jail[seat]
+            if player.isBankrupt():
+                ret ^= self.bankrupt[seat]
+        for slot in game.getBoard().getSlots():
+            if slot.isType(SLOT_PROP):
+                index = slot.getIndex()
+                owner = slot.getOwner()
+                ret ^= self.owner[index][owner.seat + 1 if owner else 0]
+                ret ^= self.stage[index][slot.getStage()]
+                if slot.isMortgage():
+                    ret ^= self.mortgage[index]
+        return ret
+
+    def reset(self, game):
+        self.hash = self.compute(game)
+
+    def check(self, game):
+        """
+        Check the incremental hash against a full recompute
+        :return: True. Raises a GameError if they differ
+        """
+        expected = self.compute(game)
+        if self.hash != expected:
+            raise GameError("Zobrist hash is " + hex(self.hash) + ", expected " + hex(expected))
+        return True
+
+
+class TranspositionTable:
+    """
+    Bounded table of evaluated positions, keyed by Zobrist hash
+
+    Every entry holds a value and the search depth it was computed at. With POLICY_LRU the least recently used
+    entry is evicted when the table is full. With POLICY_DEPTH every hash maps to one of capacity slots, and an
+    entry only replaces the one in its slot if it was searched at least as deep.
+    """
+    def __init__(self, capacity=1 << 16, policy=POLICY_LRU):
+        """
+        :param capacity: An Integer. Maximum number of entries
+        :param policy: POLICY_LRU or POLICY_DEPTH
+        """
+        self.capacity = capacity
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        if policy == POLICY_LRU:
+            self.entries = OrderedDict()
+        else:
+            self.entries = [None] * capacity
+
+    def get(self, key, depth=0):
+        """
+        Look a position up
+        :param key: An Integer. The position's hash
+        :param depth: An Integer. Minimum depth of a usable entry
+        :return: The stored value, or None if the position is unknown or was searched shallower than depth
+        """
+        if self.policy == POLICY_LRU:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+        else:
+            entry = self.entries[key % self.capacity]
+            if entry and entry[0] != key:
+                entry = None
+        if entry and entry[1] >= depth:
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        return None
+
+    def put(self, key, value, depth=0):
+        """
+        Store the value of a position
+        :param key: An Integer. The position's hash
+        :param value: The value to store
+        :param depth: An Integer. The depth the value was searched at
+        """
+        if self.policy == POLICY_LRU:
+            entry = self.entries.get(key)
+            if entry and entry[1] > depth:
+                self.entries.move_to_end(key)
+                return
+            self.entries[key] = (key, depth, value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        else:
+            i = key % self.capacity
+            entry = self.entries[i]
+            if not entry or entry[1] <= depth:
+                self.entries[i] = (key, depth, value)
+
+    def clear(self):
+        self.hits = 0
+        self.misses = 0
+        if self.policy == POLICY_LRU:
+            self.entries.clear()
+        else:
+            self.entries = [None] * self.capacity
+
+    def __len__(self):
+        if self.policy == POLICY_LRU:
+            return len(self.entries)
+        return sum(entry is not None for entry in self.entries)
+
+
+if __name__ == "__main__":
+    from handlers import silent
+    from lib.build_planner import planBuild, applyBuildPlan
+    from lib.monopoly import Monopoly
+
+    # Play random games and check the incremental hash against a full recompute after every step
+    checks = 0
+    for seed in range(200):
+        game = Monopoly(["P1", "P2", "P3", "P4"], silent, seed=seed)
+        for _ in range(300):
+            if game.isOver():
+                break
+            player = game.getCurPlayer()
+            game.turn()
+            game.check()
+            game.checkHash()
+            applyBuildPlan(player, planBuild(player, None, 200))
+            game.checkHash()
+            game.updateNextPlayer()
+            game.checkHash()
+            checks += 3
+    print(checks, "incremental hashes matched a full recompute")
@@ -1,11 +1,13 @@
+import sys
 import lib.monopoly as monopoly
-from os import system
 from config import AUTO
 from pprint import pprint
+from lib.renderer import CLEAR
 
 
 def clrscr():
-    system("clear")
+    sys.stdout.write(CLEAR)
+    sys.stdout.flush()
 
 
 def main():
@@ -29,7 +31,11 @@ def main():
     The handler must return the exact name of the property that the player wants build on.
 
     == TRADE ==
-    TBD
+    A TRADE exchanges cash, properties and Get Out of Jail Free cards between two players
+     - lib.trade.TradeOffer: what each player gives
+     - lib.trade.TradeValuator.evaluate(): score an offer for either player, e.g. to pick offers as a bot
+     - Monopoly.trade(): execute an offer both players agreed to. Invalid offers (see lib.trade.validateOffer) are
+       refused as a whole
 
     """
     shell = monopoly.init(["Foo", "Bar"])
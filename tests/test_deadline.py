@@ -0,0 +1,55 @@
+import random as rd
+import threading
+import time
+import unittest
+
+from lib.deadline import TimerWheel
+
+# Deadlines armed at once, and how late any of them may fire, in seconds
+DEADLINES = 50000
+MAX_LATE = 0.01
+
+
+class TimerWheelTest(unittest.TestCase):
+    def setUp(self):
+        self.wheel = TimerWheel()
+
+    def tearDown(self):
+        self.wheel.stop()
+
+    def testDeadlines(self):
+        # Due between 0.5 and 1.5 seconds from now, after arming is over, with as many cancelled on the way
+        late = []
+        done = threading.Event()
+
+        def fire(due):
+            late.append(time.monotonic() - due)
+            if len(late) == DEADLINES:
+                done.set()
+
+        rng = rd.Random(0)
+        for _ in range(DEADLINES):
+            delay = rng.uniform(0.5, 1.5)
+            due = time.monotonic() + delay
+            self.wheel.arm(delay, lambda due=due: fire(due))
+        cancelled = [self.wheel.arm(1, lambda: late.append(None)) for _ in range(DEADLINES)]
+        for timer in cancelled:
+            self.assertTrue(self.wheel.cancel(timer))
+        self.assertTrue(done.wait(5), "%d of %d deadlines fired" % (len(late), DEADLINES))
+        time.sleep(0.1)
+        self.assertNotIn(None, late)
+        self.assertEqual(len(late), DEADLINES)
+        self.assertGreaterEqual(min(late), 0)
+        self.assertLessEqual(max(late), MAX_LATE, "a deadline fired %.2f ms late" % (max(late) * 1e3))
+        self.assertEqual(len(self.wheel), 0)
+
+    def testCancel(self):
+        timer = self.wheel.arm(0.05, lambda: None)
+        self.assertTrue(timer.isArmed())
+        self.assertTrue(self.wheel.cancel(timer))
+        self.assertFalse(self.wheel.cancel(timer))
+        self.assertFalse(timer.isArmed())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,19 @@
+import unittest
+
+from lib.memory import measureGameMemory, GAME_MEMORY_BUDGET
+
+
+class GameMemoryTest(unittest.TestCase):
+    def testBudget(self):
+        # A 4-player game after 50 turns, as measured by tracemalloc
+        memory = measureGameMemory()
+        self.assertLessEqual(memory, GAME_MEMORY_BUDGET, "a live game takes %.0f bytes" % memory)
+
+    def testLongGames(self):
+        # The dice and deck streams stay parked, and the piles small, as a game goes on
+        memory = measureGameMemory(games=50, turns=1000)
+        self.assertLessEqual(memory, GAME_MEMORY_BUDGET, "a game takes %.0f bytes after 1000 turns" % memory)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import pickle
+import unittest
+
+from common.errors import GameError
+from handlers import silent
+from lib.build_planner import planBuild, applyBuildPlan
+from lib.monopoly import Monopoly
+from lib.trade import TradeOffer, executeOffer
+
+
+class IncrementalHashTest(unittest.TestCase):
+    def testGames(self):
+        # Random games with building, mortgages and bankruptcies, checked after every step
+        for seed in range(40):
+            game = Monopoly(["P1", "P2", "P3", "P4"], silent, seed=seed)
+            for _ in range(300):
+                if game.isOver():
+                    break
+                player = game.getCurPlayer()
+                game.turn()
+                game.check()
+                self.assertTrue(game.checkHash())
+                applyBuildPlan(player, planBuild(player, None, 200))
+                self.assertTrue(game.checkHash())
+                game.updateNextPlayer()
+                self.assertTrue(game.checkHash())
+
+    def testTrades(self):
+        game = Monopoly(["P1", "P2"], silent, seed=0)
+        p1, p2 = game.players
+        for i, prop in enumerate(game.getBoard().props):
+            owner = (p1, p2)[i % 2]
+            owner.own(prop)
+            prop.setOwner(owner)
+        self.assertTrue(game.checkHash())
+        for mine, theirs in zip(p1.getOwnedList(), p2.getOwnedList()):
+            executeOffer(TradeOffer(p1, p2, 10, (mine,), (theirs,)))
+            self.assertTrue(game.checkHash())
+
+    def testPickle(self):
+        game = Monopoly(["P1", "P2", "P3"], silent, seed=3)
+        for _ in range(100):
+            if game.isOver():
+                break
+            game.turn()
+            game.check()
+            game.updateNextPlayer()
+        copy = pickle.loads(pickle.dumps(game))
+        self.assertEqual(copy.getHash(), game.getHash())
+        self.assertTrue(copy.checkHash())
+
+    def testDrift(self):
+        game = Monopoly(["P1", "P2"], silent, seed=0)
+        game.zobrist.hash ^= 1
+        with self.assertRaises(GameError):
+            game.checkHash()
+
+
+if __name__ == "__main__":
+    unittest.main()